@@ -13,6 +13,8 @@ import plotly.graph_objects as go
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from services.flight_service import get_flights_with_additional_info
+from services.models import observations_to_frame
+from services.resilience import FlightFetchError
 from pprint import pformat
 from services.configuration_service import (
     create_flight_configurations,
@@ -21,8 +23,9 @@ from services.configuration_service import (
     FlightConfiguration
 )
 from services.batch_processor import process_configurations, filter_valid_configurations
-from services.analysis_views import get_analysis_data, refresh_analysis_views
-from services.flight_database import create_connection
+from services.refresh_coordinator import get_refresh_coordinator
+from services.analysis_views import PRICE_SUMMARY_VIEW
+from app.queries import load_analysis_frame, load_analysis_page, load_price_trends, invalidate_generations
 
 
 st.title("Reguler Flyer Buddy 😎")
@@ -37,6 +40,8 @@ def initialize_session_states():
         st.session_state.show_price_analysis = False
     if 'show_raw_data' not in st.session_state:
         st.session_state.show_raw_data = False
+    if 'show_competition' not in st.session_state:
+        st.session_state.show_competition = False
 
 # Add tabs to separate single search and batch processing
 tab1, tab2, tab3 = st.tabs(["Single Search", "Batch Processing", "Analysis"])
@@ -51,52 +56,71 @@ with tab1:
     max_stops = st.slider("Max Stops", 0, 2, 0)
     num_adults = st.number_input("Number of Adults", min_value=1, max_value=10, value=1)
     fetch_mode = st.selectbox("Fetch Mode", ["normal", "fallback"])
+    all_options = st.checkbox("Show all flight options", value=False)
+    bypass_cache = st.checkbox("Bypass cache", value=False)
 
-    def format_datetime(dt_str):
-        try:
-            dt = datetime.strptime(dt_str, '%I:%M %p on %a, %b %d, %Y')
+    def format_datetime(dt):
+        if isinstance(dt, datetime):
             return dt.strftime('%I:%M %p on %a, %b %d, %Y')
-        except ValueError:
-            return dt_str
+        return dt if dt is not None else ''
+
+    def format_duration(duration):
+        if isinstance(duration, timedelta):
+            hours, minutes = divmod(int(duration.total_seconds()) // 60, 60)
+            return f"{hours} hr {minutes} min" if hours else f"{minutes} min"
+        return duration if duration is not None else ''
+
+    def format_price(price):
+        return f"${price:,.0f}" if price is not None else ''
 
     # Search Button
     if st.button("Search Flights"):
         flight_data = [FlightData(date=date.strftime('%Y-%m-%d'), from_airport=departure_airport, to_airport=arrival_airport)]
         passengers = Passengers(adults=num_adults)
 
-        result = get_flights_with_additional_info(
-            flight_data=flight_data,
-            trip=trip_type,
-            seat=seat_class,
-            max_stops=max_stops,
-            passengers=passengers,
-            fetch_mode=fetch_mode
-        )
+        try:
+            result = get_flights_with_additional_info(
+                flight_data=flight_data,
+                trip=trip_type,
+                seat=seat_class,
+                max_stops=max_stops,
+                passengers=passengers,
+                fetch_mode=fetch_mode,
+                all_options=all_options,
+                use_cache=not bypass_cache
+            )
+        except FlightFetchError as e:
+            st.error(f"Flight search failed: {e}")
+            result = []
+
+        # Ensure result is a list of FlightObservation records
+        if not isinstance(result, list):
+            result = [result]
+        flights = [flight for flight in result if flight.has_itinerary]
 
         # Display results in card format
-        if result:
-            # Ensure result is a list of dictionaries
-            if isinstance(result, dict):
-                result = [result]
-            
-            for flight in result:
-                query_time = format_datetime(flight.get('query_time', 'N/A'))
-                departure = format_datetime(flight.get('departure', ''))
-                arrival = format_datetime(flight.get('arrival', ''))
+        if flights:
+            for flight in flights:
+                query_time = format_datetime(flight.query_time)
+                departure = format_datetime(flight.departure)
+                arrival = format_datetime(flight.arrival)
 
                 st.markdown(f"""
                     <div style="border: 1px solid #ddd; border-radius: 5px; padding: 10px; margin-bottom: 10px;">
-                        <h4>{flight.get('name', 'Unknown Airline')}</h4>
+                        <h4>{flight.airline_name or 'Unknown Airline'}</h4>
                         <p><strong>Query Time:</strong> {query_time}</p>
-                        <p><strong>From:</strong> {flight.get('from_airport', '')} <strong>To:</strong> {flight.get('to_airport', '')}</p>
+                        <p><strong>From:</strong> {flight.from_airport} <strong>To:</strong> {flight.to_airport}</p>
                         <p><strong>Departure:</strong> {departure}</p>
                         <p><strong>Arrival:</strong> {arrival}</p>
-                        <p><strong>Duration:</strong> {flight.get('duration', '')}</p>
-                        <p><strong>Stops:</strong> {flight.get('stops', '')}</p>
-                        <p><strong>Price:</strong> {flight.get('price', '')}</p>
-                        <p><strong>Best Option:</strong> {'Yes' if flight.get('is_best', False) else 'No'}</p>
+                        <p><strong>Duration:</strong> {format_duration(flight.duration)}</p>
+                        <p><strong>Stops:</strong> {'' if flight.stops is None else flight.stops}</p>
+                        <p><strong>Price:</strong> {format_price(flight.price)}</p>
+                        <p><strong>Best Option:</strong> {'Yes' if flight.is_best else 'No'}</p>
                     </div>
                 """, unsafe_allow_html=True)
+            if len(flights) > 1:
+                # Every option side by side, one column per observation field
+                st.dataframe(observations_to_frame(flights).drop(columns=['search_id']))
         else:
             st.write("No flights found.")
 
@@ -235,13 +259,20 @@ with tab3:
     
     initialize_session_states()
     
-    conn = create_connection()
-    
     # Add refresh button
     if st.button("🔄 Refresh Analysis Data"):
         try:
-            refresh_analysis_views(conn)
-            st.success("Analysis views refreshed successfully!")
+            failed = [
+                result for result in get_refresh_coordinator().refresh_if_needed()
+                if not result.success
+            ]
+            if failed:
+                st.error("Error refreshing views: " + "; ".join(
+                    f"{result.view}: {result.error}" for result in failed))
+            else:
+                st.success("Analysis views refreshed successfully!")
+            # Cached results of refreshed views go stale with their generation
+            invalidate_generations()
         except Exception as e:
             st.error(f"Error refreshing views: {str(e)}")
     
@@ -258,15 +289,15 @@ with tab3:
         st.session_state.show_route_analysis = not st.session_state.show_route_analysis
 
     if st.session_state.show_route_analysis:
-        route_data = get_analysis_data(
-            conn, 
-            'route_analysis',
+        df = load_analysis_frame(
+            'route_analysis_rollup',
             from_airport=from_airport,
             to_airport=to_airport
         )
         
-        if route_data:
-            df = pd.DataFrame(route_data)
+        # Rows without a departure have no day of week to chart
+        df = df.dropna(subset=['day_of_week'])
+        if not df.empty:
             day_names = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 
                        'Friday', 'Saturday']
             # Convert day_of_week to integer before indexing
@@ -324,16 +355,23 @@ with tab3:
         st.session_state.show_weekly_trends = not st.session_state.show_weekly_trends
 
     if st.session_state.show_weekly_trends:
-        trends_data = get_analysis_data(
-            conn, 
-            'price_trends',
-            from_airport=from_airport,
-            to_airport=to_airport
+        # Trends are bucketed and downsampled on the server, so the chart
+        # stays the same size however long the polling history
+        trend_buckets = {"Weekly": "week", "Monthly": "month", "Latest snapshots": "snapshot"}
+        trend_methods = {"Shape (LTTB)": "lttb", "Min/max envelope": "envelope"}
+        col1, col2 = st.columns(2)
+        with col1:
+            trend_bucket = st.selectbox("Group query dates", list(trend_buckets))
+        with col2:
+            trend_method = st.selectbox("Downsampling", list(trend_methods))
+        df = load_price_trends(
+            from_airport,
+            to_airport,
+            bucket=trend_buckets[trend_bucket],
+            method=trend_methods[trend_method]
         )
         
-        if trends_data:
-            df = pd.DataFrame(trends_data)
-            
+        if not df.empty:
             # Create the line plot
             fig = go.Figure()
             
@@ -348,7 +386,7 @@ with tab3:
                 fig.add_trace(go.Scatter(
                     x=df_filtered['departure_date'],
                     y=df_filtered['min_price'],
-                    name=f'Prices as of {query_date.strftime("%Y-%m-%d")}',
+                    name=f'Prices as of {pd.Timestamp(query_date).strftime("%Y-%m-%d")}',
                     mode='lines+markers'
                 ))
             
@@ -383,37 +421,13 @@ with tab3:
         st.session_state.show_price_analysis = not st.session_state.show_price_analysis
 
     if st.session_state.show_price_analysis:
-        # Fetch all necessary data
-        latest_data = get_analysis_data(conn, 'latest_prices',
-                                      from_airport=from_airport, to_airport=to_airport)
-        lowest_data = get_analysis_data(conn, 'lowest_prices',
-                                      from_airport=from_airport, to_airport=to_airport)
-        highest_data = get_analysis_data(conn, 'highest_prices',
-                                      from_airport=from_airport, to_airport=to_airport)
-        
-        if any([latest_data, lowest_data, highest_data]):
-            # Combine all data into a single DataFrame
-            dfs = []
-            merge_cols = ['departure', 'airline_name', 'from_airport', 'to_airport']
-            
-            if latest_data:
-                df_latest = pd.DataFrame(latest_data)
-                df_latest['departure'] = pd.to_datetime(df_latest['departure'])
-                dfs.append(df_latest)
-            if lowest_data:
-                df_lowest = pd.DataFrame(lowest_data)
-                df_lowest['departure'] = pd.to_datetime(df_lowest['departure'])
-                dfs.append(df_lowest)
-            if highest_data:
-                df_highest = pd.DataFrame(highest_data)
-                df_highest['departure'] = pd.to_datetime(df_highest['departure'])
-                dfs.append(df_highest)
-            
-            # Merge all DataFrames
-            df_combined = dfs[0]
-            for df in dfs[1:]:
-                df_combined = pd.merge(df_combined, df, on=merge_cols, how='outer')
-            
+        # Latest, lowest and highest prices come from one combined summary
+        df_combined = load_analysis_frame(PRICE_SUMMARY_VIEW,
+                                          from_airport=from_airport, to_airport=to_airport)
+
+        if not df_combined.empty:
+            df_combined = df_combined.sort_values(['departure', 'airline_name'])
+
             # Create comprehensive visualization
             fig = go.Figure()
             
@@ -453,6 +467,14 @@ with tab3:
                 name='Price Range'
             ))
             
+            # Add average price line (dotted grey)
+            fig.add_trace(go.Scatter(
+                x=df_combined['departure'],
+                y=df_combined['avg_price'],
+                line=dict(color='grey', width=1, dash='dot'),
+                name='Average Price'
+            ))
+
             # Add latest price as scatter points
             fig.add_trace(go.Scatter(
                 x=df_combined['departure'],
@@ -484,20 +506,81 @@ with tab3:
             
             Try performing some flight searches first or checking a different route.""")
 
-    # 4. Flight Searches Data
+    # 4. Competition (requires searches stored with all options)
+    st.subheader("🏁 Airline and Departure Time Competition")
+    if st.button("Show Competition"):
+        st.session_state.show_competition = not st.session_state.show_competition
+
+    if st.session_state.show_competition:
+        df_airline = load_analysis_frame('airline_competition_rollup',
+                                         from_airport=from_airport, to_airport=to_airport)
+        df_hour = load_analysis_frame('departure_time_competition_rollup',
+                                      from_airport=from_airport, to_airport=to_airport)
+
+        if not (df_airline.empty and df_hour.empty):
+            if not df_airline.empty:
+                df_airline = df_airline.groupby('airline_name', as_index=False).agg(
+                    options_offered=('options_offered', 'sum'),
+                    min_price=('min_price', 'min'),
+                    best_rank=('best_rank', 'min')
+                )
+                st.plotly_chart(px.bar(
+                    df_airline, x='airline_name', y='min_price',
+                    hover_data=['options_offered', 'best_rank'],
+                    title='Lowest Price by Airline',
+                    labels={'airline_name': 'Airline', 'min_price': 'Price ($)'}
+                ))
+                st.dataframe(df_airline)
+            if not df_hour.empty:
+                df_hour = df_hour.groupby('departure_hour', as_index=False).agg(
+                    airlines=('airlines', 'max'),
+                    options_offered=('options_offered', 'sum'),
+                    min_price=('min_price', 'min')
+                )
+                st.plotly_chart(px.bar(
+                    df_hour, x='departure_hour', y='min_price',
+                    hover_data=['airlines', 'options_offered'],
+                    title='Lowest Price by Departure Hour',
+                    labels={'departure_hour': 'Departure Hour', 'min_price': 'Price ($)'}
+                ))
+                st.dataframe(df_hour)
+        else:
+            st.warning("No competition data available. Run searches with all flight options enabled.")
+
+    # 5. Flight Searches Data
     st.subheader("🔍 Flight Searches Data")
     if st.button("Show Raw Data"):
         st.session_state.show_raw_data = not st.session_state.show_raw_data
 
     if st.session_state.show_raw_data:
-        flight_searches_data = get_analysis_data(conn, 'flight_searches', from_airport=from_airport, to_airport=to_airport)
+        # Keyset pages: raw_data_pages holds the key each visited page starts after
+        route = (from_airport, to_airport)
+        if st.session_state.get('raw_data_route') != route:
+            st.session_state.raw_data_route = route
+            st.session_state.raw_data_pages = [None]
+        page_size = st.selectbox("Rows per page", [100, 500, 2000], index=1)
+        flight_searches_data, next_after = load_analysis_page(
+            'flight_searches', page_size, st.session_state.raw_data_pages[-1],
+            from_airport=from_airport, to_airport=to_airport
+        )
         if flight_searches_data:
             flight_searches_df = pd.DataFrame(flight_searches_data)
             st.dataframe(flight_searches_df)
+
+            page_number = len(st.session_state.raw_data_pages)
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("Previous Page", disabled=page_number == 1):
+                    st.session_state.raw_data_pages.pop()
+                    st.rerun()
+            with col2:
+                st.write(f"Page {page_number}")
+            with col3:
+                if st.button("Next Page", disabled=next_after is None):
+                    st.session_state.raw_data_pages.append(next_after)
+                    st.rerun()
         else:
             st.warning("No flight searches data available.")
     else:
         st.write("Click the button above to view the raw flight searches data.")
 
-    conn.close()
-
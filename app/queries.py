@@ -0,0 +1,151 @@
+"""
+Cached reads for the dashboard.
+
+Query results are cached across reruns and sessions, keyed by view, filters
+and the view's refresh generation (when it was last refreshed, when the
+rollups were last updated for views over them, or the newest flight_searches
+id for raw data). A refresh therefore invalidates exactly
+the entries it made stale, without any explicit cache clearing, and the
+first rerun that sees a new generation pre-warms the popular routes.
+"""
+import threading
+import pandas as pd
+import streamlit as st
+from services.analysis_views import PRICE_SUMMARY_VIEW, get_analysis_page, get_price_trends
+from services.rollup_tables import ROLLUP_NAME, ROLLUP_VIEWS
+from services.columnar_fetch import fetch_analysis_frame
+from services.database_connection import get_connection, get_pool
+
+# Views the Analysis tab reads whole for a route (price trends are read
+# through load_price_trends)
+DASHBOARD_VIEWS = (
+    'route_analysis_rollup',
+    PRICE_SUMMARY_VIEW,
+    'airline_competition_rollup',
+    'departure_time_competition_rollup'
+)
+
+POPULAR_ROUTES = 5
+
+@st.cache_resource
+def shared_pool():
+    """The connection pool, created once per server process and shared by all sessions"""
+    return get_pool()
+
+@st.cache_resource
+def _prewarm_state():
+    return {'generations': None, 'lock': threading.Lock()}
+
+@st.cache_data(ttl=10, show_spinner=False)
+def view_generations() -> dict:
+    """
+    Refresh marker of every view, re-read at most every 10 seconds so
+    reruns do not each query Postgres for it.
+    """
+    shared_pool()
+    generations = {}
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('view_refresh_state') IS NOT NULL")
+            if cur.fetchone()[0]:
+                cur.execute("SELECT view_name, refreshed_at FROM view_refresh_state")
+                generations = {view: str(refreshed_at) for view, refreshed_at in cur.fetchall()}
+            # Views over the rollups change whenever the rollups are updated
+            cur.execute("SELECT to_regclass('rollup_state') IS NOT NULL")
+            if cur.fetchone()[0]:
+                cur.execute("SELECT updated_at FROM rollup_state WHERE name = %s", (ROLLUP_NAME,))
+                row = cur.fetchone()
+                generations.update(dict.fromkeys(ROLLUP_VIEWS, str(row[0] if row else None)))
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM flight_searches")
+            generations['flight_searches'] = str(cur.fetchone()[0])
+        conn.rollback()
+    return generations
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def _cached_analysis_frame(view_name: str, filters: tuple, generation: str):
+    with get_connection() as conn:
+        df = fetch_analysis_frame(conn, view_name, **dict(filters))
+        conn.rollback()
+    return df
+
+def load_analysis_frame(view_name: str, **filters):
+    """A view as a typed DataFrame, served from the cache until the view is refreshed again"""
+    generations = view_generations()
+    _prewarm_if_refreshed(generations)
+    return _cached_analysis_frame(
+        view_name, tuple(sorted(filters.items())), generations.get(view_name, '')
+    )
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _cached_analysis_page(view_name: str, page_size: int, after, filters: tuple, generation: str):
+    with get_connection() as conn:
+        page = get_analysis_page(conn, view_name, page_size, after, **dict(filters))
+        conn.rollback()
+    return page
+
+def load_analysis_page(view_name: str, page_size: int = 500, after=None, **filters):
+    """get_analysis_page through the same generation-keyed cache"""
+    generations = view_generations()
+    return _cached_analysis_page(
+        view_name, page_size, after, tuple(sorted(filters.items())),
+        generations.get(view_name, '')
+    )
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _cached_price_trends(from_airport: str, to_airport: str, bucket: str, method: str,
+                         generation: str):
+    with get_connection() as conn:
+        rows = get_price_trends(conn, from_airport, to_airport, bucket=bucket, method=method)
+        conn.rollback()
+    return pd.DataFrame(rows, columns=['query_date', 'departure_date', 'min_price'])
+
+def load_price_trends(from_airport: str, to_airport: str, bucket: str = 'week',
+                      method: str = 'lttb'):
+    """Bucketed, downsampled price trends of a route as a DataFrame"""
+    generations = view_generations()
+    return _cached_price_trends(from_airport, to_airport, bucket, method,
+                                generations.get('price_trends_rollup', ''))
+
+def invalidate_generations():
+    """Pick up a refresh made by this process right away instead of within 10 seconds"""
+    view_generations.clear()
+
+def popular_routes(limit: int = POPULAR_ROUTES):
+    """Routes searched most often over the last week"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT from_airport, to_airport
+                FROM flight_searches
+                WHERE query_time >= CURRENT_TIMESTAMP - INTERVAL '7 days'
+                GROUP BY from_airport, to_airport
+                ORDER BY COUNT(*) DESC
+                LIMIT %s
+            """, (limit,))
+            routes = cur.fetchall()
+        conn.rollback()
+    return routes
+
+def prewarm_popular_routes(limit: int = POPULAR_ROUTES):
+    """Load the dashboard views of the most searched routes into the cache"""
+    for from_airport, to_airport in popular_routes(limit):
+        for view_name in DASHBOARD_VIEWS:
+            load_analysis_frame(view_name, from_airport=from_airport, to_airport=to_airport)
+        load_price_trends(from_airport, to_airport)
+
+def _prewarm_if_refreshed(generations: dict):
+    """Pre-warm once per new set of generations, in whichever session notices first"""
+    state = _prewarm_state()
+    views_only = {view: gen for view, gen in generations.items() if view != 'flight_searches'}
+    if state['generations'] == views_only or not state['lock'].acquire(blocking=False):
+        return
+    try:
+        if state['generations'] != views_only:
+            first_run = state['generations'] is None
+            state['generations'] = views_only
+            if not first_run:
+                prewarm_popular_routes()
+    except Exception as e:
+        print(f"Error pre-warming dashboard cache: {e}")
+    finally:
+        state['lock'].release()
@@ -0,0 +1,89 @@
+"""
+Offline stand-in for fast_flights.get_flights, for benchmarks only.
+
+install() points services.flight_service at a StubGetFlights that sleeps
+for a configurable latency and answers with synthetic flights, failing a
+configurable share of calls the way Google Flights does (HTTP 429/5xx
+assertions and "No flights found"). When fast_flights is not installed a
+minimal module is registered first so services.flight_service imports.
+"""
+import random
+import sys
+import threading
+import time
+import types
+from types import SimpleNamespace
+
+from .parse_benchmark import make_flights
+
+class StubGetFlights:
+    """Callable with the get_flights signature; counts its calls"""
+
+    def __init__(self, latency=0.2, jitter=0.1, failure_rate=0.0, empty_rate=0.0,
+                 options=5, seed=7):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.empty_rate = empty_rate
+        self.options = options
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._flights = make_flights(1000, seed)
+        self.calls = 0
+        self.failures = 0
+
+    def __call__(self, flight_data, trip, seat, max_stops, passengers, fetch_mode='normal', **kwargs):
+        with self._lock:
+            self.calls += 1
+            roll = self._rng.random()
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            start = self._rng.randrange(len(self._flights) - self.options)
+        time.sleep(delay)
+        if roll < self.failure_rate:
+            with self._lock:
+                self.failures += 1
+            status = 429 if roll < self.failure_rate / 2 else 503
+            raise AssertionError(f"{status} Result: stub failure")
+        if roll < self.failure_rate + self.empty_rate:
+            raise RuntimeError("No flights found")
+        return SimpleNamespace(
+            current_price='typical',
+            flights=self._flights[start:start + self.options]
+        )
+
+def _register_module():
+    module = types.ModuleType('fast_flights')
+
+    class FlightData:
+        def __init__(self, date, from_airport, to_airport, max_stops=None):
+            self.date = date
+            self.from_airport = from_airport
+            self.to_airport = to_airport
+            self.max_stops = max_stops
+
+    class Passengers:
+        def __init__(self, adults=0, children=0, infants_in_seat=0, infants_on_lap=0):
+            self.adults = adults
+            self.children = children
+            self.infants_in_seat = infants_in_seat
+            self.infants_on_lap = infants_on_lap
+
+    def get_flights(**kwargs):
+        raise RuntimeError("fast_flights stub not installed")
+
+    module.FlightData = FlightData
+    module.Passengers = Passengers
+    module.get_flights = get_flights
+    sys.modules['fast_flights'] = module
+
+def install(**options) -> StubGetFlights:
+    """Route every fast_flights call made by services.flight_service to a new stub"""
+    try:
+        import fast_flights  # noqa: F401
+    except ImportError:
+        _register_module()
+    from services import flight_service
+
+    stub = StubGetFlights(**options)
+    flight_service.get_flights = stub
+    return stub
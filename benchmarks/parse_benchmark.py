@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Per-record cost of turning fast_flights results into typed values.
+
+Compares the old string round trip (strptime -> strftime -> strptime with a
+hard-coded year, float prices, split durations) against
+services.flight_parser.parse_flight.
+
+    python -m benchmarks.parse_benchmark
+    python -m benchmarks.parse_benchmark --records 50000 --json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.flight_parser import parse_flight
+
+AIRLINES = ['Alaska', 'Delta', 'United', 'American', 'Southwest', 'JetBlue']
+
+def make_flights(count, seed=7):
+    """Synthetic fast_flights Flight objects with realistic strings"""
+    rng = random.Random(seed)
+    today = datetime.now()
+    flights = []
+    for _ in range(count):
+        departure = today + timedelta(days=rng.randint(1, 180),
+                                      minutes=rng.choice(range(0, 24 * 60, 5)))
+        duration = timedelta(minutes=rng.randint(45, 9 * 60))
+        arrival = departure + duration
+        hours, minutes = divmod(int(duration.total_seconds()) // 60, 60)
+        flights.append(SimpleNamespace(
+            is_best=rng.random() < 0.2,
+            name=rng.choice(AIRLINES),
+            departure=departure.strftime('%-I:%M %p on %a, %b %-d'),
+            arrival=arrival.strftime('%-I:%M %p on %a, %b %-d'),
+            arrival_time_ahead='+1' if arrival.date() > departure.date() else '',
+            duration=f"{hours} hr {minutes} min" if minutes else f"{hours} hr",
+            stops=rng.choice([0, 0, 0, 1, 2]),
+            delay=None,
+            price=f"${rng.randint(89, 1400):,}"
+        ))
+    return flights
+
+def legacy_parse(flight, query_time):
+    """The pre-parser pipeline from flight_service and flight_database"""
+    fmt = '%I:%M %p on %a, %b %d, %Y'
+    query_time = datetime.strptime(query_time.strftime(fmt), fmt)
+    departure = datetime.strptime(
+        datetime.strptime(flight.departure + ', 2025', fmt).strftime(fmt), fmt
+    )
+    try:
+        arrival = datetime.strptime(flight.arrival, fmt)
+    except ValueError:
+        arrival = datetime.strptime(flight.arrival + ', 2025', fmt)
+    parts = flight.duration.split()
+    duration = f"{int(parts[0])} hours {int(parts[2]) if len(parts) > 2 else 0} minutes"
+    price = float(flight.price.replace('$', '').replace(',', ''))
+    return query_time, departure, arrival, duration, price
+
+def run(records, repeat):
+    flights = make_flights(records)
+    query_time = datetime.now()
+
+    def legacy():
+        for flight in flights:
+            legacy_parse(flight, query_time)
+
+    def parser():
+        for flight in flights:
+            parse_flight(flight, query_time)
+
+    results = {}
+    for name, func in (('legacy', legacy), ('flight_parser', parser)):
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        results[name] = {
+            'records': records,
+            'seconds': best,
+            'us_per_record': best / records * 1e6
+        }
+    results['speedup'] = results['legacy']['seconds'] / results['flight_parser']['seconds']
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.records, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name in ('legacy', 'flight_parser'):
+        print(f"{name:>14}: {results[name]['us_per_record']:.2f} us/record")
+    print(f"{'speedup':>14}: {results['speedup']:.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the hot paths.
+
+Measures per-record parse cost, insert throughput, the refresh time of
+every analysis view, get_analysis_data latency and end-to-end batch
+throughput against a fast_flights stub, and saves the results as JSON
+named after the current commit so runs can be compared. Everything but
+the parse benchmark writes to the configured database: point DB_NAME at a
+scratch database. The table is topped up with synthetic rows to --rows
+before the refresh and query benchmarks.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --rows 2000000 --only refresh,query
+    python -m benchmarks.suite --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Keep the end-to-end benchmark from answering searches out of a result cache
+os.environ.setdefault('RFB_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'rfb_benchmark_cache.sqlite3'))
+os.environ.setdefault('RFB_CACHE_TTL', '0')
+
+from benchmarks import fast_flights_stub, parse_benchmark, synthetic
+
+BENCHMARKS = ('parse', 'insert', 'refresh', 'query', 'end_to_end')
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# Marks the rows written by the insert benchmark so they can be removed again
+BENCHMARK_TRIP = 'benchmark'
+
+def bench_parse(args):
+    return parse_benchmark.run(args.records, args.repeat)
+
+def bench_insert(args):
+    """Rows per second through the batch writer's multi-row INSERT and through COPY"""
+    from services.database_connection import get_connection
+    from services.flight_database import insert_flight_rows
+
+    rows = [
+        observation._replace(trip=BENCHMARK_TRIP)
+        for observation in synthetic.generate_observations(args.insert_rows, seed=11)
+    ]
+    results = {'rows': len(rows)}
+    with get_connection() as conn:
+        try:
+            start = time.perf_counter()
+            for offset in range(0, len(rows), 500):  # FlightBatchWriter's batch size
+                insert_flight_rows(conn, rows[offset:offset + 500])
+            elapsed = time.perf_counter() - start
+            results['execute_values'] = {'seconds': elapsed, 'rows_per_second': len(rows) / elapsed}
+
+            start = time.perf_counter()
+            synthetic.copy_observations(conn, rows)
+            elapsed = time.perf_counter() - start
+            results['copy'] = {'seconds': elapsed, 'rows_per_second': len(rows) / elapsed}
+        finally:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM flight_searches WHERE trip = %s", (BENCHMARK_TRIP,))
+            conn.commit()
+    return results
+
+def ensure_rows(rows):
+    """Top flight_searches up to `rows` synthetic rows; returns the row count"""
+    from services.database_connection import get_connection
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM flight_searches")
+            existing = cur.fetchone()[0]
+        conn.rollback()
+        if existing < rows:
+            print(f"Loading {rows - existing:,} synthetic rows...")
+            synthetic.copy_observations(conn, synthetic.generate_observations(rows - existing))
+    return max(existing, rows)
+
+def bench_refresh(args):
+    """Seconds to rebuild the rollups and each view from scratch"""
+    from services.analysis_views import refresh_analysis_views
+    from services.database_connection import get_connection
+    from services.rollup_tables import rebuild_rollups
+
+    total_rows = ensure_rows(args.rows)
+    with get_connection() as conn:
+        start = time.perf_counter()
+        rebuild_rollups(conn)
+        rollups = time.perf_counter() - start
+    results = refresh_analysis_views(concurrently=False)
+    return {
+        'rows': total_rows,
+        'rebuild_rollups_seconds': rollups,
+        'views': {
+            result.view: {'seconds': result.duration, 'success': result.success}
+            for result in results
+        }
+    }
+
+def _latency(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'rows': len(result),
+        'p50_ms': statistics.median(timings),
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'max_ms': timings[-1]
+    }
+
+def bench_query(args):
+    """Latency of one route's rows from each view, as dicts and as a DataFrame"""
+    from services.analysis_views import QUERYABLE_VIEWS, get_analysis_data
+    from services.database_connection import get_connection
+
+    ensure_rows(args.rows)
+    results = {}
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT from_airport, to_airport FROM flight_searches
+                GROUP BY 1, 2 ORDER BY COUNT(*) DESC LIMIT 1
+            """)
+            from_airport, to_airport = cur.fetchone()
+        try:
+            from services.columnar_fetch import fetch_analysis_frame
+            import pandas  # noqa: F401
+        except ImportError:
+            fetch_analysis_frame = None
+        for view in QUERYABLE_VIEWS:
+            filters = {'from_airport': from_airport, 'to_airport': to_airport}
+            results[view] = {'get_analysis_data': _latency(
+                lambda: get_analysis_data(conn, view, **filters), args.repeat)}
+            if fetch_analysis_frame is not None:
+                results[view]['fetch_analysis_frame'] = _latency(
+                    lambda: fetch_analysis_frame(conn, view, **filters), args.repeat)
+            conn.rollback()
+    return {'route': f"{from_airport}-{to_airport}", 'views': results}
+
+def bench_end_to_end(args):
+    """Configurations per second through process_configurations with a stubbed fast_flights"""
+    stub = fast_flights_stub.install(latency=args.stub_latency, failure_rate=args.stub_failure_rate)
+    from services.batch_processor import process_configurations
+    from services.configuration_service import FlightSearchSpec
+    from services.refresh_coordinator import get_refresh_coordinator
+
+    tomorrow = date.today() + timedelta(days=1)
+    spec = FlightSearchSpec(
+        routes=synthetic.make_routes(4, seed=23),
+        start_date=tomorrow.isoformat(),
+        end_date=(tomorrow + timedelta(days=180)).isoformat(),
+        outbound_days=list(range(7)),
+        return_days=list(range(7))
+    )
+    configs = list(islice(spec.expand(), args.configs))
+
+    # The batch only requests a debounced refresh; run it straight away and
+    # time it on its own, so the fetch rate is not swamped by it on a large table
+    start = time.perf_counter()
+    process_configurations(configs, delay_between_requests=0, max_workers=args.workers,
+                           all_options=True)
+    fetch_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    get_refresh_coordinator().flush()
+    refresh_seconds = time.perf_counter() - start
+    elapsed = fetch_seconds + refresh_seconds
+    return {
+        'configurations': len(configs),
+        'workers': args.workers,
+        'stub_latency': args.stub_latency,
+        'stub_calls': stub.calls,
+        'stub_failures': stub.failures,
+        'seconds': elapsed,
+        'fetch_seconds': fetch_seconds,
+        'refresh_seconds': refresh_seconds,
+        'configurations_per_second': len(configs) / fetch_seconds
+    }
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def _flatten(results, prefix=''):
+    """Numeric leaves of a results tree keyed by their dotted path"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+def compare(previous, current):
+    """Print every timing or throughput that changed by more than 5%"""
+    before = _flatten(previous['benchmarks'])
+    after = _flatten(current['benchmarks'])
+    print(f"Compared with {previous['commit'][:8]} ({previous['timestamp']}):")
+    for path in sorted(before.keys() & after.keys()):
+        old, new = before[path], after[path]
+        if not old or abs(new - old) / old < 0.05:
+            continue
+        print(f"  {path}: {old:,.3f} -> {new:,.3f} ({(new - old) / old:+.0%})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--only', help=f"Comma separated subset of {', '.join(BENCHMARKS)}")
+    parser.add_argument('--rows', type=int, default=1_000_000,
+                        help='Minimum flight_searches rows for the refresh and query benchmarks')
+    parser.add_argument('--records', type=int, default=20000, help='Records for the parse benchmark')
+    parser.add_argument('--insert-rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--configs', type=int, default=200,
+                        help='Configurations for the end-to-end benchmark')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--stub-latency', type=float, default=0.2,
+                        help='Seconds each stubbed fast_flights call takes')
+    parser.add_argument('--stub-failure-rate', type=float, default=0.0)
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/<time>-<commit>.json)')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    selected = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    if set(selected) - {'parse'}:
+        from services.flight_database import initialize_database
+        initialize_database()
+
+    results = {
+        'commit': _commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'arguments': vars(args),
+        'benchmarks': {}
+    }
+    for name in BENCHMARKS:
+        if name in selected:
+            print(f"Running {name} benchmark...")
+            results['benchmarks'][name] = globals()[f"bench_{name}"](args)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{results['commit'][:8]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Synthetic flight_searches rows for benchmarks.
+
+Simulates daily polling of many routes: every query day each route is
+searched for every departure date in the horizon, and each search returns
+a handful of options whose prices drift with the days left to departure.
+Rows are written with COPY, so millions load in minutes. Point DB_NAME at
+a scratch database; the rows are indistinguishable from real searches.
+
+    python -m benchmarks.synthetic --rows 2000000
+    python -m benchmarks.synthetic --rows 500000 --routes 50 --refresh
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import islice
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.models import FlightObservation
+
+AIRPORTS = ['SEA', 'MKE', 'SFO', 'LAX', 'JFK', 'ORD', 'DFW', 'DEN', 'ATL', 'BOS',
+            'MIA', 'PHX', 'LAS', 'MSP', 'DTW', 'PDX', 'SAN', 'AUS', 'IAD', 'SLC']
+AIRLINES = ['Alaska', 'Delta', 'United', 'American', 'Southwest', 'JetBlue']
+
+def make_routes(count, seed=7):
+    """`count` distinct (from, to) pairs"""
+    rng = random.Random(seed)
+    pairs = [(a, b) for a in AIRPORTS for b in AIRPORTS if a != b]
+    rng.shuffle(pairs)
+    return pairs[:count]
+
+def generate_observations(rows, routes=20, horizon_days=180, options=5, seed=7,
+                          end=None):
+    """
+    Yield `rows` FlightObservations of daily polling that ends at `end`
+    (now by default), newest query day last.
+    """
+    rng = random.Random(seed)
+    route_list = make_routes(routes, seed)
+    base_prices = {route: rng.randint(120, 450) for route in route_list}
+    per_day = len(route_list) * horizon_days * options
+    query_days = max(1, -(-rows // per_day))
+    end = end or datetime.now().replace(minute=0, second=0, microsecond=0)
+    return islice(_observations(rng, route_list, base_prices, horizon_days, options,
+                                end - timedelta(days=query_days - 1), query_days), rows)
+
+def _observations(rng, routes, base_prices, horizon_days, options, first_day, query_days):
+    for day in range(query_days):
+        query_time = first_day + timedelta(days=day, minutes=rng.randint(0, 59))
+        for from_airport, to_airport in routes:
+            base = base_prices[(from_airport, to_airport)]
+            for days_ahead in range(1, horizon_days + 1):
+                search_id = str(uuid.uuid4())
+                # Prices climb as departure gets close
+                demand = 1.0 + max(0, 21 - days_ahead) * 0.04
+                for rank in range(options):
+                    departure = (query_time + timedelta(days=days_ahead)).replace(
+                        hour=rng.randint(5, 22), minute=rng.choice((0, 15, 30, 45)))
+                    duration = timedelta(minutes=rng.randint(60, 420))
+                    price = base * demand * rng.uniform(0.8, 1.4) + rank * 12
+                    yield FlightObservation(
+                        query_time=query_time,
+                        from_airport=from_airport,
+                        to_airport=to_airport,
+                        trip='one-way',
+                        seat='economy',
+                        airline_name=rng.choice(AIRLINES),
+                        departure=departure,
+                        arrival=departure + duration,
+                        duration=duration,
+                        stops=rng.choice((0, 0, 0, 1, 2)),
+                        price=Decimal(f"{price:.2f}"),
+                        is_best=rank == 0,
+                        search_id=search_id,
+                        option_rank=rank
+                    )
+
+def _csv_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, timedelta):
+        return f"{int(value.total_seconds())} seconds"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return str(value)
+
+def copy_observations(conn, observations, batch_rows=100_000):
+    """
+    COPY observations into flight_searches in batches, creating partitions
+    for their query times first. Returns the number of rows written.
+    """
+    from services.flight_database import FLIGHT_COLUMNS
+    from services.partitioning import ensure_partitions, is_partitioned
+
+    copy = (f"COPY flight_searches ({', '.join(FLIGHT_COLUMNS)}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '\\N')")
+    written = 0
+    observations = iter(observations)
+    while True:
+        batch = list(islice(observations, batch_rows))
+        if not batch:
+            return written
+        buffer = io.StringIO()
+        for observation in batch:
+            buffer.write(','.join(_csv_value(value) for value in observation))
+            buffer.write('\n')
+        buffer.seek(0)
+        with conn.cursor() as cur:
+            if is_partitioned(cur):
+                ensure_partitions(cur, batch[0].query_time, batch[-1].query_time)
+            cur.copy_expert(copy, buffer)
+        conn.commit()
+        written += len(batch)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--routes', type=int, default=20)
+    parser.add_argument('--horizon-days', type=int, default=180)
+    parser.add_argument('--options', type=int, default=5, help='Options stored per search')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--refresh', action='store_true',
+                        help='Refresh the analysis views after loading')
+    args = parser.parse_args()
+
+    from services.database_connection import get_connection
+    from services.flight_database import initialize_database
+
+    initialize_database()
+    start = time.perf_counter()
+    with get_connection() as conn:
+        written = copy_observations(conn, generate_observations(
+            args.rows, args.routes, args.horizon_days, args.options, args.seed))
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {written:,} rows in {elapsed:.1f}s ({written / elapsed:,.0f} rows/s)")
+
+    if args.refresh:
+        from services.analysis_views import refresh_analysis_views
+        for result in refresh_analysis_views(concurrently=False):
+            print(f"{result.view}: {'ok' if result.success else result.error} ({result.duration:.2f}s)")
+
+if __name__ == '__main__':
+    main()
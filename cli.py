@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import click
 from datetime import datetime
+from itertools import chain
 import sys
 import os
 from typing import List
@@ -10,15 +11,25 @@ import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__))))
 
 from services.flight_service import get_flights_with_additional_info
+from services.result_cache import get_result_cache
+from services.resilience import FlightFetchError
 from services.configuration_service import (
-    create_flight_configurations,
+    FlightSearchSpec,
     save_configurations,
-    load_configurations,
+    save_spec,
+    iter_configurations,
     FlightConfiguration
 )
 from services.batch_processor import process_configurations
-from services.analysis_views import refresh_analysis_views, create_analysis_views
-from services.flight_database import create_connection, create_flights_table
+from services.analysis_views import create_analysis_views
+from services.refresh_coordinator import RefreshCoordinator
+from services.flight_database import create_connection, create_flights_table, migrate_to_partitioned
+from services.partitioning import PARTITION_INTERVALS
+from services import rollup_tables
+from services.scheduler_daemon import SchedulerDaemon
+from services.run_journal import RunJournal
+from services.work_queue import QueueWorker, enqueue_configurations, queue_counts
+from services.database_connection import get_connection
 from fast_flights import FlightData, Passengers
 
 @click.group()
@@ -34,6 +45,13 @@ def cli():
     3. batch-process    - Process multiple flight searches from a config file
     4. refresh-views    - Refresh database materialized views for analysis
     5. init-db         - Initialize database tables and views
+    6. rebuild-rollups  - Recompute the incremental rollup tables from scratch
+    7. migrate-partitions - Convert flight_searches into a time-partitioned table
+    8. cache-stats      - Show (or clear) the flight result cache statistics
+    9. daemon           - Keep polling a set of watched routes until stopped
+    10. enqueue         - Add configurations to the shared job queue
+    11. worker          - Fetch queued jobs; run one per host to scale out
+    12. queue-status    - Show how many queued jobs are in each state
     """
     pass
 
@@ -54,7 +72,12 @@ def cli():
               help='Number of adult passengers (1-10) [default: 1]')
 @click.option('--fetch-mode', default='normal', type=click.Choice(['normal', 'fallback']),
               help='API fetch mode: normal or fallback [default: normal]')
-def search(from_airport, to_airport, date, trip_type, seat_class, max_stops, num_adults, fetch_mode):
+@click.option('--all-options', is_flag=True, default=False,
+              help='Store and show every flight option returned, not just the top one')
+@click.option('--no-cache', is_flag=True, default=False,
+              help='Bypass the result cache and always query fast_flights')
+def search(from_airport, to_airport, date, trip_type, seat_class, max_stops, num_adults, fetch_mode,
+           all_options, no_cache):
     """
     Perform a single flight search with specified parameters.
 
@@ -63,25 +86,34 @@ def search(from_airport, to_airport, date, trip_type, seat_class, max_stops, num
         ./cli.py search -f SEA -t MKE -d 2024-03-01
         ./cli.py search --from-airport SEA --to-airport MKE --date 2024-03-01 --seat-class business
         ./cli.py search -f SEA -t MKE -d 2024-03-01 --trip-type round-trip --max-stops 1
+        ./cli.py search -f SEA -t MKE -d 2024-03-01 --all-options
     """
     click.echo(f"Searching flights from {from_airport} to {to_airport} on {date}...")
     
     flight_data = [FlightData(date=date, from_airport=from_airport, to_airport=to_airport)]
     passengers = Passengers(adults=num_adults)
     
-    result = get_flights_with_additional_info(
-        flight_data=flight_data,
-        trip=trip_type,
-        seat=seat_class,
-        max_stops=max_stops,
-        passengers=passengers,
-        fetch_mode=fetch_mode
-    )
+    try:
+        result = get_flights_with_additional_info(
+            flight_data=flight_data,
+            trip=trip_type,
+            seat=seat_class,
+            max_stops=max_stops,
+            passengers=passengers,
+            fetch_mode=fetch_mode,
+            all_options=all_options,
+            use_cache=not no_cache
+        )
+    except FlightFetchError as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
     
-    if result:
-        click.echo("\nFlight Details:")
-        for key, value in result.items():
-            if value is not None:  # Only show non-None values
+    flights = [flight for flight in (result if isinstance(result, list) else [result])
+               if flight.has_itinerary]
+    if flights:
+        for flight in flights:
+            click.echo("\nFlight Details:")
+            for key, value in flight.to_display_dict().items():
                 click.echo(f"{key}: {value}")
     else:
         click.echo("No flights found.")
@@ -104,69 +136,109 @@ def search(from_airport, to_airport, date, trip_type, seat_class, max_stops, num
 @click.option('--max-stops', default=0, type=int,
               help='Maximum number of stops (0-2) [default: 0]')
 @click.option('--output', '-o', default='flight_configs.json',
-              help='Output configuration file path [default: flight_configs.json]')
+              help='Output configuration file path; use a .jsonl name for one '
+                   'configuration per line [default: flight_configs.json]')
+@click.option('--spec', 'as_spec', is_flag=True, default=False,
+              help='Save the compact search spec instead of every configuration')
 def generate_configs(from_airport, to_airport, start_date, end_date, 
-                    outbound_day, return_day, seat_class, max_stops, output):
+                    outbound_day, return_day, seat_class, max_stops, output, as_spec):
     """
     Generate flight search configurations for batch processing.
 
     Creates a JSON configuration file containing multiple flight search parameters
-    based on specified date ranges and weekdays.
+    based on specified date ranges and weekdays. With --spec only the route,
+    date range and weekdays are saved; batch-process expands them lazily.
 
     \b
     Examples:
         ./cli.py generate-configs -f SEA -t MKE --start-date 2024-03-01 --end-date 2024-09-01
         ./cli.py generate-configs -f SEA -t MKE --start-date 2024-03-01 --end-date 2024-09-01 
                                 --outbound-day 1 --return-day 4 --seat-class business
+        ./cli.py generate-configs -f SEA -t MKE --start-date 2024-03-01 --end-date 2025-03-01 
+                                --spec -o sea_mke_spec.json
     """
     click.echo("Generating flight configurations...")
     
     try:
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d')
-        
-        configs = create_flight_configurations(
-            from_airport=from_airport,
-            to_airport=to_airport,
-            start_date=start,
-            end_date=end,
-            outbound_day=outbound_day,
-            return_day=return_day,
-            seat_class=seat_class,
-            max_stops=max_stops
+        spec = FlightSearchSpec(
+            routes=[(from_airport, to_airport)],
+            start_date=datetime.strptime(start_date, '%Y-%m-%d').date().isoformat(),
+            end_date=datetime.strptime(end_date, '%Y-%m-%d').date().isoformat(),
+            outbound_days=[outbound_day],
+            return_days=[return_day],
+            seat_classes=[seat_class],
+            max_stops=[max_stops]
         )
         
-        save_path = save_configurations(configs, output)
-        click.echo(f"Successfully saved {len(configs)} configurations to {save_path}")
+        if as_spec:
+            save_path = save_spec(spec, output)
+        else:
+            save_path = save_configurations(spec.expand(), output)
+        click.echo(f"Successfully saved {spec.count()} configurations to {save_path}")
         
     except ValueError as e:
         click.echo(f"Error: {str(e)}", err=True)
         sys.exit(1)
 
 @cli.command()
-@click.argument('config_file', type=click.Path(exists=True))
+@click.argument('config_files', nargs=-1, type=click.Path(exists=True))
 @click.option('--delay', default=5, type=int,
               help='Delay between requests in seconds [default: 5]')
-def batch_process(config_file, delay):
+@click.option('--workers', default=1, type=click.IntRange(min=1),
+              help='Number of concurrent fetch workers [default: 1]')
+@click.option('--rate', default=None, type=click.FloatRange(min=0, min_open=True),
+              help='Global cap on requests per second across all workers '
+                   '[default: one request per --delay seconds]')
+@click.option('--all-options', is_flag=True, default=False,
+              help='Store every flight option returned per search, not just the top one')
+@click.option('--resume', 'resume_run', default=None, metavar='RUN_ID',
+              help='Continue an earlier run, skipping the configurations it already finished')
+def batch_process(config_files, delay, workers, rate, all_options, resume_run):
     """
-    Process multiple flight searches from a configuration file.
+    Process multiple flight searches from one or more configuration files.
 
     Arguments:
-        config_file: Path to the JSON configuration file containing flight search parameters
+        config_files: Paths to JSON, JSONL or spec files containing flight search parameters.
+                      Files are streamed, and searches repeated across files are only run once.
+                      Not needed with --resume, which re-reads the files of the original run.
+
+    Every run is journaled in the database and prints its run id; if it is
+    interrupted, --resume RUN_ID fetches only what it had not finished.
 
     \b
     Examples:
         ./cli.py batch-process flight_configs.json
         ./cli.py batch-process flight_configs.json --delay 10
+        ./cli.py batch-process flight_configs.json --workers 4 --rate 0.5
+        ./cli.py batch-process flight_configs_*.json
+        ./cli.py batch-process sea_mke_spec.json flight_configs.jsonl
+        ./cli.py batch-process --resume 3f2b9c4e-8d7a-4c51-9e0f-2a6b1d8c7e53
     """
     try:
-        configs = load_configurations(config_file)
-        click.echo(f"Loaded {len(configs)} configurations from {config_file}")
-        process_configurations(configs, delay_between_requests=delay)
+        if resume_run:
+            journal = RunJournal.resume(resume_run)
+            config_files = journal.sources
+        elif config_files:
+            journal = RunJournal.start([os.path.abspath(path) for path in config_files],
+                                       label='batch-process')
+        else:
+            raise click.UsageError("Give one or more CONFIG_FILES, or --resume RUN_ID")
+        click.echo(f"Run id: {journal.run_id} (continue it with --resume {journal.run_id})")
+
+        process_configurations(
+            chain.from_iterable(iter_configurations(config_file) for config_file in config_files),
+            delay_between_requests=delay,
+            max_workers=workers,
+            requests_per_second=rate,
+            all_options=all_options,
+            journal=journal
+        )
         click.echo("Batch processing completed successfully!")
         
-    except FileNotFoundError:
-        click.echo(f"Error: Configuration file '{config_file}' not found.", err=True)
+    except click.UsageError:
+        raise
+    except FileNotFoundError as e:
+        click.echo(f"Error: Configuration file '{e.filename}' not found.", err=True)
         sys.exit(1)
     except Exception as e:
         click.echo(f"Error during batch processing: {str(e)}", err=True)
@@ -190,42 +262,195 @@ def init_db():
         conn.close()
 
 @cli.command()
-def refresh_views():
-    """Refresh all materialized views with latest data."""
+@click.option('--concurrently/--blocking', default=True,
+              help='Use REFRESH ... CONCURRENTLY so readers are not blocked [default: concurrently]')
+@click.option('--force', is_flag=True, default=False,
+              help='Refresh every view even if it has no new rows')
+def refresh_views(concurrently, force):
+    """Refresh materialized views that have new data since their last refresh."""
     click.echo("Starting materialized views refresh...")
-    conn = create_connection()
     try:
-        views = [
-            'flight_daily_summary',
-            'route_analysis',
-            'price_trends',
-            'advance_purchase_analysis',
-            'latest_prices',
-            'lowest_prices',
-            'highest_prices',
-            'average_prices'
-        ]
-        
-        with click.progressbar(views, label='Refreshing views') as view_list:
-            for view in view_list:
-                try:
-                    start_time = time.time()
-                    with conn.cursor() as cur:
-                        cur.execute(f"REFRESH MATERIALIZED VIEW {view}")
-                        conn.commit()
-                    duration = time.time() - start_time
-                    click.echo(f"✓ {view}: {duration:.2f}s")
-                except Exception as e:
-                    click.secho(f"✗ Error refreshing {view}: {str(e)}", fg='red')
-                    continue
-        
-        click.secho("\nRefresh operation completed successfully!", fg='green')
+        coordinator = RefreshCoordinator(concurrently=concurrently)
+        results = coordinator.refresh_if_needed(force=force)
+        for result in results:
+            mode = " (concurrently)" if result.concurrently else ""
+            if result.skipped:
+                click.echo(f"- {result.view}: no new rows, skipped")
+            elif result.success:
+                click.echo(f"✓ {result.view}: {result.duration:.2f}s{mode}")
+            else:
+                click.secho(f"✗ Error refreshing {result.view}: {result.error}", fg='red')
+
+        total = sum(result.duration for result in results)
+        click.secho(f"\nRefresh operation completed ({total:.2f}s of view time)", fg='green')
         
     except Exception as e:
         click.secho(f"Critical error during refresh: {str(e)}", fg='red')
         sys.exit(1)
+
+@cli.command()
+def rebuild_rollups():
+    """Recompute the incremental rollup tables from the full search history."""
+    click.echo("Rebuilding rollup tables...")
+    conn = create_connection()
+    try:
+        rows = rollup_tables.rebuild_rollups(conn)
+        click.secho(f"Rolled up {rows} flight searches", fg='green')
+    except Exception as e:
+        click.secho(f"Error rebuilding rollups: {e}", fg='red')
+        sys.exit(1)
+    finally:
+        conn.close()
+
+@cli.command()
+@click.option('--interval', default=None, type=click.Choice(PARTITION_INTERVALS),
+              help='Partition width [default: FLIGHT_PARTITION_INTERVAL or month]')
+@click.option('--drop-legacy', is_flag=True, default=False,
+              help='Drop the old table after copying instead of keeping flight_searches_legacy')
+def migrate_partitions(interval, drop_legacy):
+    """
+    Convert an existing flight_searches table into a table range-partitioned
+    on query_time, copying every row and recreating the analysis views.
+
+    \b
+    Examples:
+        ./cli.py migrate-partitions
+        ./cli.py migrate-partitions --interval week --drop-legacy
+    """
+    click.echo("Migrating flight_searches to a partitioned table...")
+    conn = create_connection()
+    try:
+        migrated = migrate_to_partitioned(conn, partition_interval=interval, drop_legacy=drop_legacy)
+        if migrated is None:
+            click.echo("flight_searches is already partitioned (or does not exist); nothing to do.")
+        else:
+            click.secho(f"Migrated {migrated} rows into the partitioned table", fg='green')
+    except Exception as e:
+        conn.rollback()
+        click.secho(f"Error during migration: {e}", fg='red')
+        sys.exit(1)
     finally:
         conn.close()
 
+@cli.command()
+@click.option('--clear', is_flag=True, default=False, help='Remove every cached result')
+def cache_stats(clear):
+    """Show hit/miss statistics of the flight result cache."""
+    cache = get_result_cache()
+    if clear:
+        cache.clear()
+        click.echo("Flight result cache cleared.")
+        return
+    stats = cache.stats()
+    click.echo(f"Cache file: {os.path.abspath(cache.path)}")
+    click.echo(f"TTL: {cache.ttl_seconds:.0f}s, max entries: {cache.max_entries}")
+    click.echo(f"Entries: {stats['entries']}")
+    click.echo(f"Hits: {stats['hits']}  Misses: {stats['misses']}  "
+               f"Hit rate: {stats['hit_rate']:.1%}  Evictions: {stats['evictions']}")
+
+@cli.command()
+@click.argument('routes_file', type=click.Path(exists=True))
+@click.option('--budget', default=50, type=click.IntRange(min=1),
+              help='Searches per cycle, shared by all routes [default: 50]')
+@click.option('--cycle', 'cycle_seconds', default=900, type=click.FloatRange(min=1),
+              help='Seconds between fetch cycles [default: 900]')
+@click.option('--refresh-every', 'refresh_seconds', default=3600, type=click.FloatRange(min=0),
+              help='Minimum seconds between view refreshes [default: 3600]')
+@click.option('--rate', default=0.2, type=click.FloatRange(min=0, min_open=True),
+              help='Global cap on requests per second [default: 0.2]')
+@click.option('--workers', default=2, type=click.IntRange(min=1),
+              help='Number of concurrent fetch workers [default: 2]')
+@click.option('--all-options', is_flag=True, default=False,
+              help='Store every flight option returned per search')
+def daemon(routes_file, budget, cycle_seconds, refresh_seconds, rate, workers, all_options):
+    """
+    Poll every route in ROUTES_FILE on an internal schedule until stopped.
+
+    ROUTES_FILE is JSON listing the watched routes, e.g.
+    {"routes": [["SEA", "MKE"], ["SEA", "ORD"]], "horizon_days": 180,
+    "outbound_days": [3], "return_days": [6]}. Stop with SIGTERM or Ctrl-C;
+    searches in progress finish and buffered rows are written first.
+
+    \b
+    Examples:
+        ./cli.py daemon watched_routes.json
+        ./cli.py daemon watched_routes.json --budget 100 --cycle 600 --rate 0.5
+    """
+    SchedulerDaemon(
+        routes_file,
+        budget=budget,
+        cycle_seconds=cycle_seconds,
+        refresh_seconds=refresh_seconds,
+        requests_per_second=rate,
+        max_workers=workers,
+        all_options=all_options
+    ).run()
+
+@cli.command()
+@click.argument('config_files', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--priority', default=0, type=int,
+              help='Higher priority jobs are claimed first [default: 0]')
+@click.option('--max-attempts', default=3, type=click.IntRange(min=1),
+              help='Attempts before a job is marked failed [default: 3]')
+def enqueue(config_files, priority, max_attempts):
+    """
+    Add the searches in CONFIG_FILES to the shared job queue.
+
+    Searches already queued or running are not added again.
+
+    \b
+    Examples:
+        ./cli.py enqueue flight_configs.json
+        ./cli.py enqueue sea_mke_spec.json --priority 10
+    """
+    added = enqueue_configurations(
+        chain.from_iterable(iter_configurations(config_file) for config_file in config_files),
+        priority=priority,
+        max_attempts=max_attempts
+    )
+    click.echo(f"Queued {added} jobs")
+
+@cli.command()
+@click.option('--workers', default=2, type=click.IntRange(min=1),
+              help='Concurrent fetches on this host [default: 2]')
+@click.option('--rate', default=0.2, type=click.FloatRange(min=0, min_open=True),
+              help='Requests per second from this host [default: 0.2]')
+@click.option('--lease', 'lease_seconds', default=300, type=click.FloatRange(min=10),
+              help='Seconds a claimed job stays leased without a heartbeat [default: 300]')
+@click.option('--all-options', is_flag=True, default=False,
+              help='Store every flight option returned per search')
+@click.option('--coordinator', is_flag=True, default=False,
+              help='Refresh the analysis views whenever the queue drains')
+@click.option('--exit-when-empty', is_flag=True, default=False,
+              help='Stop once no jobs are queued or running')
+def worker(workers, rate, lease_seconds, all_options, coordinator, exit_when_empty):
+    """
+    Fetch jobs from the shared queue until stopped.
+
+    Run one worker per host; workers claim jobs with SKIP LOCKED, so adding
+    hosts adds throughput. Start exactly one of them with --coordinator.
+
+    \b
+    Examples:
+        ./cli.py worker --coordinator
+        ./cli.py worker --workers 4 --rate 0.5 --exit-when-empty
+    """
+    QueueWorker(
+        max_workers=workers,
+        requests_per_second=rate,
+        lease_seconds=lease_seconds,
+        all_options=all_options,
+        coordinator=coordinator,
+        exit_when_empty=exit_when_empty
+    ).run()
+
+@cli.command()
+def queue_status():
+    """Show the number of jobs in each state."""
+    with get_connection() as conn:
+        counts = queue_counts(conn)
+    for status in ('queued', 'running', 'done', 'failed'):
+        click.echo(f"{status:>8}: {counts.get(status, 0)}")
+
 if __name__ == '__main__':
     cli() 
\ No newline at end of file
@@ -9,13 +9,16 @@ import click
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__))))
 
 from services.configuration_service import (
-    create_flight_configurations,
-    save_configurations,
-    load_configurations
+    FlightSearchSpec,
+    save_spec,
+    iter_configurations
 )
 from services.batch_processor import process_configurations
-from services.analysis_views import refresh_analysis_views
-from services.flight_database import create_connection
+from services.polling_planner import plan_polls
+from services.run_journal import RunJournal
+from services.refresh_coordinator import get_refresh_coordinator
+from services.database_connection import close_pool
+from services import metrics
 
 # Set up logging
 logging.basicConfig(
@@ -36,72 +39,128 @@ def generate_configs(from_airport: str, to_airport: str) -> str:
         
         logger.info(f"Generating configurations from {start_date} to {end_date}")
         
-        configs = create_flight_configurations(
-            from_airport=from_airport,
-            to_airport=to_airport,
-            start_date=start_date,
-            end_date=end_date,
-            outbound_day=4,  # Thursday
-            return_day=0,    # Sunday
-            seat_class='economy',
-            max_stops=0
+        spec = FlightSearchSpec(
+            routes=[(from_airport, to_airport)],
+            start_date=start_date.isoformat(),
+            end_date=end_date.isoformat(),
+            outbound_days=[3],  # Thursday
+            return_days=[6],    # Sunday
+            seat_classes=['economy'],
+            max_stops=[0]
         )
         
-        # Create filename with timestamp
+        # Create filename with timestamp; the spec is expanded lazily when processed
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         config_file = f'flight_configs_{timestamp}.json'
         
-        save_configurations(configs, config_file)
-        logger.info(f"Saved {len(configs)} configurations to {config_file}")
+        save_spec(spec, config_file)
+        logger.info(f"Saved spec for {spec.count()} configurations to {config_file}")
         
         return config_file
         
     except Exception as e:
         logger.error(f"Error generating configurations: {str(e)}")
         raise
-def run_batch_process(config_file: str, delay: int = 5):
-    """Run batch processing on the configuration file"""
+def run_batch_process(config_file: str, delay: int = 5, workers: int = 1, rate: float = None,
+                      all_options: bool = False, budget: int = None,
+                      journal: RunJournal = None):
+    """
+    Run batch processing on the configuration file. With a budget only the
+    configurations the polling planner considers most due are fetched.
+    Progress is recorded in `journal` when one is given.
+    """
     try:
         logger.info(f"Starting batch processing of {config_file}")
-        # Load the configurations from the file
-        configs = load_configurations(config_file)
-        # Pass the loaded configurations to process_configurations
-        process_configurations(configs, delay_between_requests=delay)
+        # Stream the configurations from the file into process_configurations
+        configs = iter_configurations(config_file)
+        if budget is not None:
+            configs = plan_polls(configs, budget)
+            logger.info(f"Adaptive polling selected {len(configs)} due configurations "
+                        f"(budget {budget})")
+        process_configurations(
+            configs,
+            delay_between_requests=delay,
+            max_workers=workers,
+            requests_per_second=rate,
+            all_options=all_options,
+            journal=journal
+        )
         logger.info("Batch processing completed successfully")
         
     except Exception as e:
         logger.error(f"Error during batch processing: {str(e)}")
         raise
 
+def run_label(from_airport: str, to_airport: str) -> str:
+    return f"scheduler {from_airport}-{to_airport}"
+
+def resume_unfinished_run(from_airport: str, to_airport: str):
+    """Reopen the last run for this route if it was interrupted and its file still exists"""
+    run_id = RunJournal.latest_unfinished(run_label(from_airport, to_airport))
+    if run_id is None:
+        return None
+    journal = RunJournal.resume(run_id)
+    if not journal.sources or not os.path.exists(journal.sources[0]):
+        logger.warning(f"Cannot resume run {run_id}: its configuration file is gone")
+        journal.finish()
+        return None
+    logger.info(f"Resuming interrupted run {run_id} ({journal.done_count} configurations already done)")
+    return journal
+
 def refresh_materialized_views():
     """Refresh all materialized views"""
     try:
         logger.info("Starting view refresh")
-        conn = create_connection()
-        refresh_analysis_views(conn)
-        logger.info("Successfully refreshed all materialized views")
+        # Serve the refresh the batch requested now rather than at exit
+        coordinator = get_refresh_coordinator()
+        results = coordinator.flush() or coordinator.refresh_if_needed()
+        for result in results:
+            if result.skipped:
+                logger.info(f"Skipped {result.view}, no new rows since its last refresh")
+            elif result.success:
+                logger.info(f"Refreshed {result.view} in {result.duration:.2f}s")
+            else:
+                logger.error(f"Error refreshing {result.view}: {result.error}")
+        if all(result.success for result in results):
+            logger.info("Successfully refreshed all materialized views")
         
     except Exception as e:
         logger.error(f"Error refreshing views: {str(e)}")
         raise
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 @click.command()
 @click.option('--from-airport', '-f', required=True, help='Departure airport IATA code')
 @click.option('--to-airport', '-t', required=True, help='Arrival airport IATA code')
 @click.option('--delay', default=5, help='Delay between requests in seconds')
-def run_workflow(from_airport: str, to_airport: str, delay: int):
+@click.option('--workers', default=1, type=click.IntRange(min=1), help='Number of concurrent fetch workers')
+@click.option('--rate', default=None, type=click.FloatRange(min=0, min_open=True),
+              help='Global cap on requests per second across all workers')
+@click.option('--all-options', is_flag=True, default=False,
+              help='Store every flight option returned per search')
+@click.option('--adaptive', is_flag=True, default=False,
+              help='Only fetch departures that are due, based on price volatility '
+                   'and days to departure')
+@click.option('--budget', default=50, type=click.IntRange(min=1),
+              help='Maximum searches per run with --adaptive')
+def run_workflow(from_airport: str, to_airport: str, delay: int, workers: int, rate: float,
+                 all_options: bool, adaptive: bool, budget: int):
     """Run the complete workflow of generating configs, processing, and refreshing views"""
     try:
         logger.info("Starting automated workflow")
         
-        # Step 1: Generate configurations
-        config_file = generate_configs(from_airport, to_airport)
+        # Step 1: Resume an interrupted run for this route, or generate configurations
+        journal = resume_unfinished_run(from_airport, to_airport)
+        if journal is not None:
+            config_file = journal.sources[0]
+        else:
+            config_file = generate_configs(from_airport, to_airport)
+            journal = RunJournal.start([os.path.abspath(config_file)],
+                                       label=run_label(from_airport, to_airport))
+        logger.info(f"Batch run id: {journal.run_id}")
         
         # Step 2: Run batch processing
-        run_batch_process(config_file, delay)
+        run_batch_process(config_file, delay, workers, rate, all_options,
+                          budget if adaptive else None, journal)
         
         # Step 3: Refresh views
         refresh_materialized_views()
@@ -111,6 +170,16 @@ def run_workflow(from_airport: str, to_airport: str, delay: int):
     except Exception as e:
         logger.error(f"Workflow failed: {str(e)}")
         sys.exit(1)
+    finally:
+        write_metrics()
+        close_pool()
+
+def write_metrics():
+    """Save this run's metrics to RFB_METRICS_FILE (.prom for Prometheus text, JSON otherwise)"""
+    try:
+        logger.info(f"Metrics written to {metrics.write_snapshot()}")
+    except OSError as e:
+        logger.error(f"Could not write metrics: {str(e)}")
 
 if __name__ == "__main__":
     run_workflow() 
\ No newline at end of file
@@ -1,140 +1,89 @@
 from datetime import datetime, timedelta
+import time
+from dataclasses import dataclass
+import threading
+import uuid
+from itertools import groupby
+from typing import Iterator, List, Optional, Sequence
 import psycopg2
-from .database_connection import create_connection
+from psycopg2 import sql
+from .database_connection import create_connection, get_connection
+from .downsampling import downsample_indices
+from . import metrics
+from .rollup_tables import ROLLUP_VIEWS, create_rollup_tables, update_rollups
 
-def create_analysis_views(conn):
-    """Create all materialized views for flight analysis"""
-    with conn.cursor() as cur:
-        # 1. Daily Price Summary
-        cur.execute("""
-        CREATE MATERIALIZED VIEW IF NOT EXISTS flight_daily_summary AS
-        WITH latest_price AS (
-            SELECT 
-                from_airport,
-                to_airport,
-                DATE(departure) as departure_date,
-                airline_name,
-                price as current_price,
-                ROW_NUMBER() OVER (
-                    PARTITION BY from_airport, to_airport, DATE(departure), airline_name
-                    ORDER BY query_time DESC
-                ) as rn
-            FROM flight_searches
-        )
-        SELECT 
-            DATE(fs.query_time) as date,
-            fs.from_airport,
-            fs.to_airport,
-            DATE(fs.departure) as departure_date,
-            fs.airline_name,
-            MIN(fs.price) as min_daily_price,
-            MAX(fs.price) as max_daily_price,
-            AVG(fs.price) as avg_daily_price,
-            STDDEV(fs.price) as price_volatility,
-            COUNT(*) as daily_checks,
-            MAX(fs.price) - MIN(fs.price) as daily_price_swing,
-            lp.current_price as latest_price
-        FROM flight_searches fs
-        LEFT JOIN latest_price lp ON 
-            fs.from_airport = lp.from_airport 
-            AND fs.to_airport = lp.to_airport 
-            AND DATE(fs.departure) = lp.departure_date 
-            AND fs.airline_name = lp.airline_name 
-            AND lp.rn = 1
-        GROUP BY 
-            DATE(fs.query_time), fs.from_airport, fs.to_airport, 
-            DATE(fs.departure), fs.airline_name, lp.current_price;
-        """)
+# Materialized views, rebuilt in full on every refresh
+ANALYSIS_VIEWS = [
+    'advance_purchase_analysis'
+]
 
-        # Drop existing route_analysis view and its index
-        cur.execute("""
-        DROP MATERIALIZED VIEW IF EXISTS route_analysis CASCADE;
-        DROP INDEX IF EXISTS idx_route_analysis;
-        """)
+# Materialized views replaced by views over the rollup tables, which
+# update_rollups keeps current with only the new rows. create_analysis_views
+# drops them from existing databases, so readers must use the replacement
+# named here. The README lists the same mapping.
+RETIRED_VIEWS = {
+    'flight_daily_summary': 'daily_summary_rollup',
+    'route_analysis': 'route_analysis_rollup',
+    'price_trends': 'price_trends_rollup',
+    'latest_prices': 'price_history_rollup',
+    'lowest_prices': 'price_history_rollup',
+    'highest_prices': 'price_history_rollup',
+    'average_prices': 'price_history_rollup',
+    'airline_competition': 'airline_competition_rollup',
+    'departure_time_competition': 'departure_time_competition_rollup'
+}
 
-        # 2. Route Analysis
-        cur.execute("""
-        CREATE MATERIALIZED VIEW IF NOT EXISTS route_analysis AS
-        WITH latest_prices AS (
-            SELECT 
-                from_airport,
-                to_airport,
-                EXTRACT(DOW FROM departure) as day_of_week,
-                price as latest_price,
-                ROW_NUMBER() OVER (
-                    PARTITION BY from_airport, to_airport, EXTRACT(DOW FROM departure)
-                    ORDER BY query_time DESC
-                ) as rn
-            FROM flight_searches
-        )
-        SELECT 
-            fs.from_airport,
-            fs.to_airport,
-            fs.airline_name,
-            EXTRACT(DOW FROM fs.departure) as day_of_week,
-            MIN(fs.price) as historical_low,
-            MAX(fs.price) as historical_high,
-            lp.latest_price,
-            AVG(fs.stops) as avg_stops,
-            MODE() WITHIN GROUP (ORDER BY fs.duration) as typical_duration,
-            COUNT(DISTINCT DATE(fs.departure)) as days_tracked,
-            COUNT(*) as total_searches
-        FROM flight_searches fs
-        LEFT JOIN latest_prices lp ON 
-            fs.from_airport = lp.from_airport 
-            AND fs.to_airport = lp.to_airport 
-            AND EXTRACT(DOW FROM fs.departure) = lp.day_of_week
-            AND lp.rn = 1
-        GROUP BY 
-            fs.from_airport, fs.to_airport, fs.airline_name, 
-            EXTRACT(DOW FROM fs.departure), lp.latest_price;
-        """)
+# Columns identifying one row of each view; REFRESH ... CONCURRENTLY
+# needs a unique index on them
+VIEW_UNIQUE_KEYS = {
+    'advance_purchase_analysis': ['from_airport', 'to_airport', 'airline_name', 'days_before_flight']
+}
 
-        # Drop the old price_trends view and its index
-        cur.execute("""
-        DROP MATERIALIZED VIEW IF EXISTS price_trends CASCADE;
-        DROP INDEX IF EXISTS idx_price_trends;
-        """)
-        
-        # Create new price_trends view
-        cur.execute("""
-        CREATE MATERIALIZED VIEW IF NOT EXISTS price_trends AS
-        WITH daily_prices AS (
-            SELECT 
-                DATE(query_time) as query_date,
-                DATE(departure) as departure_date,
-                from_airport,
-                to_airport,
-                airline_name,
-                MIN(price) as min_price
-            FROM flight_searches
-            GROUP BY 
-                DATE(query_time),
-                DATE(departure),
-                from_airport,
-                to_airport,
-                airline_name
-        )
-        SELECT 
-            query_date,
-            departure_date,
-            from_airport,
-            to_airport,
-            airline_name,
-            min_price
-        FROM daily_prices
-        ORDER BY 
-            query_date,
-            departure_date;
-        """)
-        
-        # Create index for better performance
-        cur.execute("""
-        CREATE INDEX IF NOT EXISTS idx_price_trends 
-        ON price_trends (from_airport, to_airport, query_date, departure_date);
-        """)
+# Relations get_analysis_data may read: the materialized views, the views
+# over the rollup tables and the raw searches
+QUERYABLE_VIEWS = ANALYSIS_VIEWS + ROLLUP_VIEWS + ['flight_searches']
 
-        # 4. Advance Purchase Analysis
+# Latest, lowest, highest and average price with first/last seen per
+# (route, airline, departure), kept current by update_rollups
+PRICE_SUMMARY_VIEW = 'price_history_rollup'
+
+# Query date buckets of get_price_trends and their DATE_TRUNC unit
+TREND_BUCKETS = {'snapshot': 'day', 'week': 'week', 'month': 'month'}
+
+# Keyset order for get_analysis_page
+PAGINATION_KEYS = dict(
+    VIEW_UNIQUE_KEYS,
+    price_history_rollup=['from_airport', 'to_airport', 'airline_name', 'departure'],
+    daily_summary_rollup=['date', 'from_airport', 'to_airport', 'departure_date', 'airline_name'],
+    route_analysis_rollup=['from_airport', 'to_airport', 'airline_name', 'day_of_week'],
+    price_trends_rollup=['query_date', 'departure_date', 'from_airport', 'to_airport', 'airline_name'],
+    airline_competition_rollup=['from_airport', 'to_airport', 'departure_date', 'query_date',
+                                'airline_name'],
+    departure_time_competition_rollup=['from_airport', 'to_airport', 'departure_date',
+                                       'query_date', 'departure_hour'],
+    flight_searches=['id']
+)
+
+# Column names per queryable view, read from the catalog on first use
+_view_columns = {}
+_columns_lock = threading.Lock()
+
+@dataclass
+class ViewRefreshResult:
+    view: str
+    success: bool
+    duration: float  # seconds
+    concurrently: bool = False
+    error: Optional[str] = None
+    skipped: bool = False  # nothing new since the last refresh
+
+def create_analysis_views(conn):
+    """Create the materialized views, their refresh state and the rollup tables for flight analysis"""
+    with conn.cursor() as cur:
+        for view in RETIRED_VIEWS:
+            cur.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view} CASCADE")
+
+        # Advance Purchase Analysis
         cur.execute("""
         CREATE MATERIALIZED VIEW IF NOT EXISTS advance_purchase_analysis AS
         SELECT 
@@ -154,141 +103,303 @@ def create_analysis_views(conn):
         HAVING COUNT(*) > 5;
         """)
 
-        # 5. Latest Prices
         cur.execute("""
-        CREATE MATERIALIZED VIEW IF NOT EXISTS latest_prices AS
-        WITH ranked_prices AS (
-            SELECT 
-                from_airport,
-                to_airport,
-                airline_name,
-                departure,
-                price,
-                query_time,
-                ROW_NUMBER() OVER (
-                    PARTITION BY from_airport, to_airport, airline_name, departure
-                    ORDER BY query_time DESC
-                ) as rn
-            FROM flight_searches
-        )
-        SELECT 
-            from_airport,
-            to_airport,
-            airline_name,
-            departure,
-            price as latest_price,
-            query_time as last_updated
-        FROM ranked_prices
-        WHERE rn = 1;
+        CREATE INDEX IF NOT EXISTS idx_advance_purchase 
+        ON advance_purchase_analysis (from_airport, to_airport, days_before_flight);
         """)
 
-        # 6. Lowest Historical Prices
-        cur.execute("""
-        CREATE MATERIALIZED VIEW IF NOT EXISTS lowest_prices AS
-        SELECT 
-            from_airport,
-            to_airport,
-            airline_name,
-            departure,
-            MIN(price) as lowest_price,
-            MIN(query_time) as first_seen
-        FROM flight_searches
-        GROUP BY 
-            from_airport, to_airport, airline_name, departure;
-        """)
+        # Unique indexes required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+        for view, columns in VIEW_UNIQUE_KEYS.items():
+            cur.execute(f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_{view}
+            ON {view} ({', '.join(columns)});
+            """)
 
-        # 7. Highest Historical Prices
+        # Rollup generation each view was last refreshed at, read by
+        # RefreshCoordinator; high_water_id was its per-view MAX(id) before
         cur.execute("""
-        CREATE MATERIALIZED VIEW IF NOT EXISTS highest_prices AS
-        SELECT 
-            from_airport,
-            to_airport,
-            airline_name,
-            departure,
-            MAX(price) as highest_price,
-            MAX(query_time) as last_seen
-        FROM flight_searches
-        GROUP BY 
-            from_airport, to_airport, airline_name, departure;
-        """)
+        CREATE TABLE IF NOT EXISTS view_refresh_state (
+            view_name TEXT PRIMARY KEY,
+            rollup_generation BIGINT NOT NULL DEFAULT -1,
+            refreshed_at TIMESTAMP
+        );
 
-        # 8. Average Historical Prices
-        cur.execute("""
-        CREATE MATERIALIZED VIEW IF NOT EXISTS average_prices AS
-        SELECT 
-            from_airport,
-            to_airport,
-            airline_name,
-            departure,
-            AVG(price) as avg_price,
-            COUNT(*) as price_points,
-            MIN(query_time) as first_seen,
-            MAX(query_time) as last_seen
-        FROM flight_searches
-        GROUP BY 
-            from_airport, to_airport, airline_name, departure;
-        """)
-
-        # Create indexes for better performance
-        cur.execute("""
-        CREATE INDEX IF NOT EXISTS idx_daily_summary 
-        ON flight_daily_summary (from_airport, to_airport, departure_date);
-        
-        CREATE INDEX IF NOT EXISTS idx_route_analysis 
-        ON route_analysis (from_airport, to_airport, airline_name, day_of_week);
-        
-        CREATE INDEX IF NOT EXISTS idx_advance_purchase 
-        ON advance_purchase_analysis (from_airport, to_airport, days_before_flight);
-        
-        CREATE INDEX IF NOT EXISTS idx_latest_prices 
-        ON latest_prices (from_airport, to_airport, departure);
-        
-        CREATE INDEX IF NOT EXISTS idx_lowest_prices 
-        ON lowest_prices (from_airport, to_airport, departure);
-        
-        CREATE INDEX IF NOT EXISTS idx_highest_prices 
-        ON highest_prices (from_airport, to_airport, departure);
-        
-        CREATE INDEX IF NOT EXISTS idx_average_prices 
-        ON average_prices (from_airport, to_airport, departure);
+        ALTER TABLE view_refresh_state
+            ADD COLUMN IF NOT EXISTS rollup_generation BIGINT NOT NULL DEFAULT -1,
+            DROP COLUMN IF EXISTS high_water_id;
         """)
         
         conn.commit()
 
-def refresh_analysis_views(conn):
-    """Refresh all materialized views"""
-    with conn.cursor() as cur:
-        views = [
-            'flight_daily_summary',
-            'route_analysis',
-            'price_trends',
-            'advance_purchase_analysis',
-            'latest_prices',
-            'lowest_prices',
-            'highest_prices',
-            'average_prices'
-        ]
-        
-        for view in views:
-            try:
-                cur.execute(f"REFRESH MATERIALIZED VIEW {view}")
-                print(f"Successfully refreshed {view}")
-            except Exception as e:
-                print(f"Error refreshing {view}: {str(e)}")
-        
+    # Incrementally maintained rollups and the views that read them
+    create_rollup_tables(conn)
+
+def refresh_analysis_views(conn=None, concurrently: bool = True,
+                           views: Optional[List[str]] = None,
+                           rollups: bool = True) -> List[ViewRefreshResult]:
+    """
+    Fold new rows into the rollup tables, then refresh the materialized views.
+
+    Only advance_purchase_analysis is still a materialized view, so the
+    views are refreshed one after another, on `conn` or on a pooled
+    connection each when conn is None. With concurrently the views are
+    refreshed with REFRESH ... CONCURRENTLY so readers are not blocked,
+    falling back to a plain refresh when that is not possible (e.g. the
+    view has never been populated).
+
+    Returns one ViewRefreshResult for the rollups (unless `rollups` is
+    False) and one per view.
+    """
+    views = list(views) if views is not None else list(ANALYSIS_VIEWS)
+    results = [_run_on_connection(conn, _update_rollups)] if rollups else []
+    results.extend(_run_on_connection(conn, _refresh_view, view, concurrently) for view in views)
+
+    for result in results:
+        metrics.histogram('view_refresh_seconds', 'Refresh time per view',
+                          view=result.view).observe(result.duration)
+        metrics.counter('view_refreshes_total', 'View refreshes by outcome', view=result.view,
+                        result='success' if result.success else 'failure').inc()
+    return results
+
+def _run_on_connection(conn, func, *args):
+    """Run func on conn, or on a pooled connection when conn is None"""
+    if conn is not None:
+        return func(conn, *args)
+    with get_connection() as pooled_conn:
+        return func(pooled_conn, *args)
+
+def _update_rollups(conn) -> ViewRefreshResult:
+    start_time = time.time()
+    try:
+        update_rollups(conn)
+        return ViewRefreshResult('rollups', True, time.time() - start_time)
+    except Exception as e:
+        conn.rollback()
+        return ViewRefreshResult('rollups', False, time.time() - start_time, error=str(e))
+
+def _refresh_view(conn, view, concurrently) -> ViewRefreshResult:
+    start_time = time.time()
+    if concurrently:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
+            conn.commit()
+            return ViewRefreshResult(view, True, time.time() - start_time, concurrently=True)
+        except psycopg2.Error:
+            # Not populated yet or missing its unique index
+            conn.rollback()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"REFRESH MATERIALIZED VIEW {view}")
         conn.commit()
+        return ViewRefreshResult(view, True, time.time() - start_time)
+    except Exception as e:
+        conn.rollback()
+        return ViewRefreshResult(view, False, time.time() - start_time, error=str(e))
 
-def get_analysis_data(conn, view_name, **filters):
-    """Generic function to query analysis views"""
-    query = f"SELECT * FROM {view_name}"
-    
-    # Add WHERE clause if filters are provided
-    if filters:
-        conditions = [f"{k} = %s" for k in filters.keys()]
-        query += " WHERE " + " AND ".join(conditions)
-    
-    with conn.cursor() as cur:
-        cur.execute(query, list(filters.values()))
+def queryable_columns(conn, view_name: str, reload: bool = False) -> List[str]:
+    """Columns of a queryable view, read from the catalog once per process"""
+    if view_name not in QUERYABLE_VIEWS:
+        raise ValueError(f"Unknown analysis view: {view_name}")
+    with _columns_lock:
+        columns = _view_columns.get(view_name)
+    if columns is None or reload:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT attname FROM pg_attribute
+                WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+                ORDER BY attnum
+            """, (view_name,))
+            columns = [row[0] for row in cur.fetchall()]
+        if not columns:
+            raise ValueError(f"Analysis view {view_name} does not exist")
+        with _columns_lock:
+            _view_columns[view_name] = columns
+    return columns
+
+def _checked_columns(conn, view_name, names) -> List[str]:
+    """Return `names` if every one is a column of the view, else raise ValueError"""
+    names = list(names)
+    known = queryable_columns(conn, view_name)
+    if not set(names) <= set(known):
+        # The view may have been recreated with new columns since it was read
+        known = queryable_columns(conn, view_name, reload=True)
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown columns for {view_name}: {', '.join(unknown)}")
+    return names
+
+def build_analysis_query(conn, view_name: str, columns: Optional[Sequence[str]] = None,
+                         order_by: Optional[Sequence[str]] = None, descending: bool = False,
+                         limit: Optional[int] = None, after: Optional[Sequence] = None,
+                         **filters):
+    """
+    Compose the SELECT behind get_analysis_data, returning (query, params).
+
+    The view and every column name are checked against the whitelist and
+    the catalog and quoted as identifiers; values are always parameters.
+    `after` holds the order_by values of the last row already read, and
+    selects the rows that follow it (keyset pagination).
+    """
+    select_list = sql.SQL('*')
+    if columns:
+        select_list = sql.SQL(', ').join(
+            map(sql.Identifier, _checked_columns(conn, view_name, columns)))
+    query = sql.SQL("SELECT {} FROM {}").format(select_list, sql.Identifier(view_name))
+
+    conditions = [
+        sql.SQL("{} = %s").format(sql.Identifier(name))
+        for name in _checked_columns(conn, view_name, filters)
+    ]
+    params = list(filters.values())
+    order_columns = [sql.Identifier(name) for name in _checked_columns(conn, view_name, order_by or [])]
+    if after is not None:
+        if len(after) != len(order_columns):
+            raise ValueError("after needs one value per order_by column")
+        # Row comparison, so a multi-column key is matched by its index
+        conditions.append(sql.SQL("({}) {} ({})").format(
+            sql.SQL(', ').join(order_columns),
+            sql.SQL('<' if descending else '>'),
+            sql.SQL(', ').join(sql.Placeholder() * len(after))
+        ))
+        params.extend(after)
+    if conditions:
+        query += sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions)
+    if order_columns:
+        direction = sql.SQL(" DESC" if descending else "")
+        query += sql.SQL(" ORDER BY ") + sql.SQL(', ').join(
+            sql.SQL("{}{}").format(column, direction) for column in order_columns)
+    if limit is not None:
+        query += sql.SQL(" LIMIT %s")
+        params.append(int(limit))
+    return query, params
+
+def get_analysis_data(conn, view_name, columns=None, order_by=None, descending=False,
+                      limit=None, after=None, **filters):
+    """
+    Query an analysis view, returning one dict per row.
+
+    Keyword arguments other than the options below filter on equality.
+    `columns` projects the result, `order_by` sorts it (ascending unless
+    `descending`), `limit` caps it and `after` continues after a previous
+    page; see build_analysis_query.
+    """
+    query, params = build_analysis_query(
+        conn, view_name, columns, order_by, descending, limit, after, **filters)
+
+    with metrics.timer('analysis_query_seconds', 'get_analysis_data calls', view=view_name), \
+            conn.cursor() as cur:
+        cur.execute(query, params)
         columns = [desc[0] for desc in cur.description]
         results = cur.fetchall()
-        return [dict(zip(columns, row)) for row in results] 
\ No newline at end of file
+    metrics.counter('analysis_rows_total', 'Rows returned by get_analysis_data', view=view_name).inc(len(results))
+    return [dict(zip(columns, row)) for row in results]
+
+def get_price_summary(conn, **filters):
+    """
+    The combined price summary for the filtered routes, in departure order.
+
+    One query over the rollup that update_rollups maintains in a single
+    pass, instead of reading latest_prices, lowest_prices and
+    highest_prices separately and joining them.
+    """
+    return get_analysis_data(conn, PRICE_SUMMARY_VIEW,
+                             order_by=['departure', 'airline_name'], **filters)
+
+def get_price_trends(conn, from_airport, to_airport, bucket='week', max_series=12,
+                     max_points=120, method='lttb'):
+    """
+    A fixed-size version of price_trends_rollup for charting.
+
+    Query dates are grouped into buckets ('week', 'month', or 'snapshot'
+    for every query date on its own) and only the latest `max_series`
+    buckets are returned. Each bucket is one series of the lowest price by
+    departure date across airlines, reduced to at most `max_points` points
+    with LTTB or a min/max envelope (see services.downsampling). Rows have
+    the price_trends_rollup columns query_date (the bucket start), departure_date
+    and min_price, so the payload stays the same size however long the
+    history.
+    """
+    if bucket not in TREND_BUCKETS:
+        raise ValueError(f"Unknown trend bucket: {bucket}")
+    with conn.cursor() as cur:
+        cur.execute("""
+            WITH bucketed AS (
+                SELECT
+                    DATE_TRUNC(%(unit)s, query_date)::DATE as query_date,
+                    departure_date,
+                    MIN(min_price) as min_price
+                FROM price_trends_rollup
+                WHERE from_airport = %(from_airport)s AND to_airport = %(to_airport)s
+                GROUP BY 1, 2
+            ),
+            latest_buckets AS (
+                SELECT DISTINCT query_date FROM bucketed
+                ORDER BY query_date DESC
+                LIMIT %(max_series)s
+            )
+            SELECT query_date, departure_date, min_price
+            FROM bucketed
+            WHERE query_date IN (SELECT query_date FROM latest_buckets)
+            ORDER BY query_date, departure_date
+        """, {
+            'unit': TREND_BUCKETS[bucket],
+            'from_airport': from_airport,
+            'to_airport': to_airport,
+            'max_series': max_series
+        })
+        rows = cur.fetchall()
+
+    trends = []
+    for query_date, series in groupby(rows, key=lambda row: row[0]):
+        series = [row for row in series if row[2] is not None]
+        keep = downsample_indices(
+            [row[1] for row in series], [float(row[2]) for row in series], max_points, method)
+        trends.extend(
+            {'query_date': query_date, 'departure_date': series[i][1], 'min_price': series[i][2]}
+            for i in keep
+        )
+    return trends
+
+def get_analysis_page(conn, view_name, page_size=500, after=None, columns=None,
+                      order_by=None, descending=False, **filters):
+    """
+    One page of a view in keyset order, returned as (rows, next_after).
+
+    `order_by` defaults to the view's unique key (the id for raw
+    flight_searches), so pages never overlap or skip rows; keys with NULLs
+    can only be paged by a key without them. Pass next_after back as
+    `after` for the following page; it is None after the last page.
+    """
+    order_by = list(order_by or PAGINATION_KEYS[view_name])
+    if columns:
+        columns = list(columns) + [name for name in order_by if name not in columns]
+    rows = get_analysis_data(conn, view_name, columns=columns, order_by=order_by,
+                             descending=descending, limit=page_size, after=after, **filters)
+    next_after = None
+    if len(rows) == page_size:
+        next_after = tuple(rows[-1][name] for name in order_by)
+    return rows, next_after
+
+def iter_analysis_data(conn, view_name, columns=None, order_by=None, descending=False,
+                       batch_size=2000, **filters) -> Iterator[dict]:
+    """
+    Stream a view through a server-side (named) cursor, `batch_size` rows
+    per round trip, so memory stays flat however large the result.
+
+    Runs inside the connection's transaction, which is committed when the
+    iterator is exhausted or closed.
+    """
+    query, params = build_analysis_query(
+        conn, view_name, columns, order_by, descending, **filters)
+    try:
+        with conn.cursor(name=f"analysis_{view_name}_{uuid.uuid4().hex[:8]}") as cur:
+            cur.itersize = batch_size
+            cur.execute(query, params)
+            names = None
+            for row in cur:
+                if names is None:
+                    names = [desc[0] for desc in cur.description]
+                yield dict(zip(names, row))
+    finally:
+        conn.commit()
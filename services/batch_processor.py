@@ -1,63 +1,198 @@
-from typing import List, Tuple
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, date
-from .configuration_service import FlightConfiguration
+from .configuration_service import FlightConfiguration, iter_unique_configurations
 from .flight_service import get_flights_with_additional_info
 from fast_flights import FlightData, Passengers
-from .analysis_views import refresh_analysis_views
-from .flight_database import create_connection
+from .refresh_coordinator import get_refresh_coordinator
+from .rate_limiter import RateLimiter
+from .flight_writer import FlightBatchWriter
+from .run_journal import RunJournal
+from . import metrics
 
 __all__ = ['process_configurations', 'filter_valid_configurations']
 
 def process_configurations(
-    configs: List[FlightConfiguration],
-    delay_between_requests: int = 5  # seconds
+    configs: Iterable[FlightConfiguration],
+    delay_between_requests: int = 5,  # seconds
+    max_workers: int = 1,
+    requests_per_second: Optional[float] = None,
+    all_options: bool = False,
+    journal: Optional[RunJournal] = None
 ):
-    conn = create_connection()
+    """
+    Fetch every valid configuration and refresh the analysis views.
+
+    `configs` may be any iterable, including a lazily expanded spec or a
+    JSONL stream; it is consumed as the batch runs and never held in full.
+    With max_workers == 1 and no requests_per_second the configurations are
+    processed one at a time with `delay_between_requests` between them.
+    Otherwise they are fetched on a thread pool of `max_workers` threads,
+    sharing a global cap of `requests_per_second` (falling back to one
+    request per `delay_between_requests` seconds when no rate is given).
+    With all_options every itinerary of each search is stored.
+    With a RunJournal every configuration's progress is recorded, and
+    configurations the journal already has as done are skipped.
+    """
+    # Identical searches (e.g. from overlapping config files) run only once,
+    # and past dates are dropped as the stream goes by
+    counts = {}
+    valid_configs = _iter_valid_configurations(iter_unique_configurations(configs, counts), counts)
+    if journal is not None:
+        if journal.done_count:
+            print(f"Resuming run {journal.run_id}: {journal.done_count} configurations already done")
+        valid_configs = journal.skip_done(valid_configs)
+
+    # Results are buffered and written in bulk; leaving the block flushes
+    # whatever is left so the refresh below sees every row
+    with metrics.timer('batch_fetch_seconds', 'Fetching and writing a whole batch'), \
+            FlightBatchWriter() as writer:
+        if max_workers <= 1 and requests_per_second is None:
+            for config in valid_configs:
+                counts['processed'] = counts.get('processed', 0) + 1
+                if process_configuration(config, writer=writer, all_options=all_options,
+                                         journal=journal):
+                    # Add delay between requests
+                    time.sleep(delay_between_requests)
+        else:
+            if requests_per_second is None and delay_between_requests:
+                requests_per_second = 1.0 / delay_between_requests
+            rate_limiter = RateLimiter(requests_per_second)
+            counts['processed'] = _process_concurrently(
+                valid_configs, max(1, max_workers), rate_limiter, writer, all_options, journal
+            )
+        if journal is not None:
+            status = journal.finish(writer)
+            print(f"Run {journal.run_id} {status}")
+
+    if counts.get('duplicates'):
+        print(f"Skipped {counts['duplicates']} duplicate configurations")
+    if counts.get('past'):
+        print(f"Skipped {counts['past']} configurations with past dates")
+    if not counts.get('processed'):
+        print("No valid configurations to process (all dates are in the past)")
+        return
+
+    # Batches finishing close together share one refresh of the views with
+    # new rows; a refresh still pending runs at the latest when the process exits
+    get_refresh_coordinator().request_refresh()
+    print("Requested a refresh of the analysis views")
+
+def fetch_configuration(
+    config: FlightConfiguration,
+    rate_limiter: Optional[RateLimiter] = None,
+    writer: Optional[FlightBatchWriter] = None,
+    all_options: bool = False,
+    stop: Optional[threading.Event] = None,
+    use_cache: bool = True
+):
+    """
+    Fetch and store a single configuration, raising FlightFetchError on
+    failure. Setting `stop` cancels the fetch while it waits to call out;
+    use_cache=False skips the result cache lookup.
+    """
+    flight_data = [FlightData(
+        date=config.date,
+        from_airport=config.from_airport,
+        to_airport=config.to_airport
+    )]
+    passengers = Passengers(adults=config.num_adults)
+
+    print(f"Processing flight: {config.from_airport} -> {config.to_airport} on {config.date}")
+
+    return get_flights_with_additional_info(
+        flight_data=flight_data,
+        trip=config.trip_type,
+        seat=config.seat_class,
+        max_stops=config.max_stops,
+        passengers=passengers,
+        fetch_mode=config.fetch_mode,
+        writer=writer,
+        all_options=all_options,
+        rate_limiter=rate_limiter,
+        stop=stop,
+        use_cache=use_cache
+    )
+
+def process_configuration(
+    config: FlightConfiguration,
+    rate_limiter: Optional[RateLimiter] = None,
+    writer: Optional[FlightBatchWriter] = None,
+    all_options: bool = False,
+    journal: Optional[RunJournal] = None,
+    stop: Optional[threading.Event] = None
+) -> bool:
+    """
+    Fetch and store a single configuration.
+
+    Errors are reported and swallowed so one bad configuration never stops
+    the rest of the batch; transient ones have already been retried. Returns
+    True when the fetch succeeded.
+    """
     try:
-        # Filter out past dates
-        valid_configs, invalid_configs = filter_valid_configurations(configs)
-        
-        if invalid_configs:
-            print(f"Skipping {len(invalid_configs)} configurations with past dates:")
-            for config in invalid_configs:
-                print(f"- {config.from_airport} -> {config.to_airport} on {config.date}")
-        
-        if not valid_configs:
-            print("No valid configurations to process (all dates are in the past)")
-            return
-        
-        for config in valid_configs:
+        if journal is not None:
+            journal.record_pending(config)
+        with metrics.timer('batch_configuration_seconds', 'Fetching and storing one configuration'):
+            fetch_configuration(config, rate_limiter, writer, all_options, stop)
+        if journal is not None:
+            journal.record_fetched(config, writer)
+        metrics.counter('batch_configurations_total', 'Configurations by outcome', result='success').inc()
+        return True
+
+    except Exception as e:
+        metrics.counter('batch_configurations_total', result='failure').inc()
+        print(f"Error processing configuration: {e}")
+        if journal is not None:
             try:
-                flight_data = [FlightData(
-                    date=config.date,
-                    from_airport=config.from_airport,
-                    to_airport=config.to_airport
-                )]
-                passengers = Passengers(adults=config.num_adults)
-
-                print(f"Processing flight: {config.from_airport} -> {config.to_airport} on {config.date}")
-                
-                result = get_flights_with_additional_info(
-                    flight_data=flight_data,
-                    trip=config.trip_type,
-                    seat=config.seat_class,
-                    max_stops=config.max_stops,
-                    passengers=passengers,
-                    fetch_mode=config.fetch_mode
-                )
-                
-                # Add delay between requests
-                time.sleep(delay_between_requests)
-
-            except Exception as e:
-                print(f"Error processing configuration: {e}")
-                continue
-        
-        # After processing all configurations, refresh the views
-        refresh_analysis_views(conn)
-    finally:
-        conn.close()
+                journal.record_failed(config, str(e))
+            except Exception as journal_error:
+                print(f"Error journaling failed configuration: {journal_error}")
+        return False
+
+def _process_concurrently(
+    configs: Iterable[FlightConfiguration],
+    max_workers: int,
+    rate_limiter: RateLimiter,
+    writer: Optional[FlightBatchWriter] = None,
+    all_options: bool = False,
+    journal: Optional[RunJournal] = None
+) -> int:
+    """
+    Run process_configuration for every config on a thread pool. Only a
+    small window of configurations is submitted ahead of the workers, so
+    the input stream is never drained into memory. Returns how many ran.
+    """
+    submitted = 0
+    succeeded = 0
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for config in configs:
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                succeeded += sum(1 for future in done if future.result())
+            pending.add(executor.submit(
+                process_configuration, config, rate_limiter, writer, all_options, journal
+            ))
+            submitted += 1
+        succeeded += sum(1 for future in as_completed(pending) if future.result())
+    print(f"Processed {succeeded}/{submitted} configurations successfully")
+    return submitted
+
+def _iter_valid_configurations(
+    configs: Iterable[FlightConfiguration],
+    counts: Dict[str, int]
+) -> Iterator[FlightConfiguration]:
+    """Stream configurations dated today or later, counting the rest in counts['past']"""
+    today = date.today().isoformat()
+    for config in configs:
+        # Canonical dates are ISO formatted, so they compare as strings
+        if config.date >= today:
+            yield config
+        else:
+            print(f"Skipping past date: {config.from_airport} -> {config.to_airport} on {config.date}")
+            counts['past'] = counts.get('past', 0) + 1
 
 def filter_valid_configurations(configs: List[FlightConfiguration]) -> Tuple[List[FlightConfiguration], List[FlightConfiguration]]:
     """
@@ -67,12 +202,12 @@ def filter_valid_configurations(configs: List[FlightConfiguration]) -> Tuple[Lis
     today = date.today()
     valid_configs = []
     invalid_configs = []
-    
+
     for config in configs:
         config_date = datetime.strptime(config.date, '%Y-%m-%d').date()
         if config_date >= today:
             valid_configs.append(config)
         else:
             invalid_configs.append(config)
-            
-    return valid_configs, invalid_configs 
\ No newline at end of file
+
+    return valid_configs, invalid_configs
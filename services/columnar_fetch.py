@@ -0,0 +1,159 @@
+import os
+import threading
+from contextlib import contextmanager
+from psycopg2 import sql
+from .analysis_views import build_analysis_query
+
+__all__ = ['fetch_analysis_frame']
+
+# Postgres type OIDs grouped by the column type they load as
+_INTEGER_TYPES = {20, 21, 23}         # int8, int2, int4
+_FLOAT_TYPES = {700, 701, 1700}       # float4, float8, numeric
+_TIMESTAMP_TYPES = {1114, 1184}       # timestamp, timestamptz
+_TIMESTAMPTZ_TYPE = 1184
+_DATE_TYPE = 1082
+_BOOL_TYPE = 16
+_INTERVAL_TYPE = 1186
+
+_NULL = '\\N'
+
+def fetch_analysis_frame(conn, view_name, columns=None, order_by=None, descending=False,
+                         limit=None, **filters):
+    """
+    Load a view into a pandas DataFrame with typed columns.
+
+    Takes the same arguments as get_analysis_data, but the rows are
+    streamed with COPY ... TO STDOUT through a pipe straight into the CSV
+    parser and parsed column by column, instead of being built into Python
+    tuples and dicts first; the CSV text is never held as a whole. Numeric
+    columns load as float64 (integers as nullable Int64), timestamps and
+    dates as datetime64, intervals as timedelta64 and booleans as nullable
+    boolean. The CSV is parsed by pyarrow when it is installed (it ships
+    with streamlit), which is several times faster than pandas' own reader.
+    """
+    import pandas as pd
+
+    with _copy_view(conn, view_name, columns, order_by, descending, limit, filters) as (types, stream):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            return _read_frame(pd, types, stream)
+        table = _read_table(types, stream)
+    return table.to_pandas(
+        date_as_object=False,
+        types_mapper={pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype()}.get
+    )
+
+def _read_table(types, stream):
+    import pyarrow as pa
+    from pyarrow import csv
+
+    column_types = {}
+    for name, oid in types:
+        if oid in _INTEGER_TYPES or oid == _INTERVAL_TYPE:
+            column_types[name] = pa.int64()
+        elif oid in _FLOAT_TYPES:
+            column_types[name] = pa.float64()
+        elif oid == _BOOL_TYPE:
+            column_types[name] = pa.bool_()
+        elif oid in _TIMESTAMP_TYPES:
+            column_types[name] = pa.timestamp('us')
+        elif oid == _DATE_TYPE:
+            column_types[name] = pa.date32()
+        else:
+            column_types[name] = pa.string()
+    table = csv.read_csv(
+        stream,
+        convert_options=csv.ConvertOptions(
+            column_types=column_types, null_values=[_NULL], strings_can_be_null=True,
+            true_values=['t'], false_values=['f']
+        )
+    )
+    for index, (name, oid) in enumerate(types):
+        if oid == _INTERVAL_TYPE:
+            table = table.set_column(index, name, table.column(name).cast(pa.duration('us')))
+    return table
+
+def _read_frame(pd, types, stream):
+    """Parse the CSV with pandas alone, for installs without pyarrow"""
+    dtypes = {}
+    parse_dates = []
+    for name, oid in types:
+        if oid in _INTEGER_TYPES or oid == _INTERVAL_TYPE:
+            dtypes[name] = 'Int64'
+        elif oid in _FLOAT_TYPES:
+            dtypes[name] = 'float64'
+        elif oid == _BOOL_TYPE:
+            dtypes[name] = 'boolean'
+        elif oid in _TIMESTAMP_TYPES or oid == _DATE_TYPE:
+            parse_dates.append(name)
+        else:
+            dtypes[name] = 'object'
+    df = pd.read_csv(
+        stream, dtype=dtypes, parse_dates=parse_dates, date_format='ISO8601',
+        na_values=[_NULL], keep_default_na=False, true_values=['t'], false_values=['f']
+    )
+    for name, oid in types:
+        if oid == _INTERVAL_TYPE:
+            df[name] = pd.to_timedelta(df[name], unit='us')
+    return df
+
+def _column_types(conn, view_name, columns):
+    """(name, type OID) of every selected column, from an empty result"""
+    query, params = build_analysis_query(conn, view_name, columns, limit=0)
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+        return [(desc[0], desc[1]) for desc in cur.description]
+
+def _export_column(column):
+    name, oid = column
+    if oid == _INTERVAL_TYPE:
+        return sql.SQL("(EXTRACT(EPOCH FROM {0}) * 1000000)::BIGINT AS {0}").format(sql.Identifier(name))
+    if oid == _TIMESTAMPTZ_TYPE:
+        return sql.SQL("{0} AT TIME ZONE 'UTC' AS {0}").format(sql.Identifier(name))
+    return sql.Identifier(name)
+
+@contextmanager
+def _copy_view(conn, view_name, columns, order_by, descending, limit, filters):
+    """
+    COPY the selected rows out as CSV, yielding (column types, stream).
+
+    The COPY runs on a separate thread writing into a pipe that the caller
+    reads from, so only a pipe's worth of CSV is in memory at a time. An
+    error from the COPY is raised once the caller stops reading.
+
+    Intervals are exported as whole microseconds, which both loaders read
+    exactly, and timestamps with time zone as UTC wall-clock times.
+    """
+    types = _column_types(conn, view_name, columns)
+    query, params = build_analysis_query(
+        conn, view_name, [name for name, _ in types], order_by, descending, limit, **filters)
+    select_list = sql.SQL(', ').join(map(_export_column, types))
+    with conn.cursor() as cur:
+        copy = sql.SQL(
+            "COPY (SELECT {} FROM ({}) AS q) TO STDOUT WITH (FORMAT csv, HEADER true, NULL {})"
+        ).format(select_list, sql.SQL(cur.mogrify(query, params).decode()), sql.Literal(_NULL))
+
+    read_fd, write_fd = os.pipe()
+    errors = []
+
+    def produce():
+        try:
+            with os.fdopen(write_fd, 'wb') as sink, conn.cursor() as cur:
+                cur.execute("SET LOCAL DateStyle = 'ISO'")
+                cur.copy_expert(copy, sink)
+        except Exception as e:
+            errors.append(e)
+
+    producer = threading.Thread(target=produce, name='copy-view', daemon=True)
+    producer.start()
+    try:
+        # Closing the read end first stops a COPY the caller gave up on
+        with os.fdopen(read_fd, 'rb') as stream:
+            yield types, stream
+    finally:
+        producer.join()
+        # A failed COPY also explains any parse error on the cut-off stream;
+        # a broken pipe only means the caller stopped reading
+        if errors and not isinstance(errors[0], BrokenPipeError):
+            raise errors[0]
@@ -1,7 +1,7 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import json
-from typing import List, Dict
-from dataclasses import dataclass
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+from dataclasses import asdict, dataclass, field, replace
 from pathlib import Path
 import os
 
@@ -16,20 +16,98 @@ class FlightConfiguration:
     num_adults: int = 1
     fetch_mode: str = "normal"
 
+def iter_weekday_dates(
+    start_date: date,
+    end_date: date,
+    weekdays: Iterable[int]  # 0 = Monday, 6 = Sunday
+) -> Iterator[date]:
+    """Yield every date in [start_date, end_date] falling on one of `weekdays`, in order"""
+    offsets = sorted({(weekday - start_date.weekday()) % 7 for weekday in weekdays})
+    week = start_date
+    while week <= end_date:
+        for offset in offsets:
+            current = week + timedelta(days=offset)
+            if current > end_date:
+                return
+            yield current
+        week += timedelta(days=7)
+
+def count_weekday_dates(start_date: date, end_date: date, weekdays: Iterable[int]) -> int:
+    """Number of dates iter_weekday_dates would yield, without walking them"""
+    if end_date < start_date:
+        return 0
+    days = (end_date - start_date).days + 1
+    full_weeks, remainder = divmod(days, 7)
+    return sum(
+        full_weeks + (1 if (weekday - start_date.weekday()) % 7 < remainder else 0)
+        for weekday in set(weekdays)
+    )
+
 def generate_date_sequence(
     start_date: datetime,
     end_date: datetime,
-    weekday: int  # 0 = Sunday, 6 = Saturday
+    weekday: int  # 0 = Monday, 6 = Sunday
 ) -> List[datetime]:
-    dates = []
-    current = start_date
-    while current <= end_date:
-        if current.weekday() == weekday:
-            dates.append(current)
-        current += timedelta(days=1)
-    return dates
+    return list(iter_weekday_dates(start_date, end_date, [weekday]))
 
-def create_flight_configurations(
+@dataclass
+class FlightSearchSpec:
+    """
+    Compact description of a sweep: routes x dates x cabins x stop limits.
+
+    Each route is searched outbound on `outbound_days` and back on
+    `return_days` between start_date and end_date (ISO dates). Configurations
+    are generated lazily by expand(), so a year-long multi-route sweep is a
+    few lines of JSON instead of thousands of stored configurations.
+    """
+    routes: List[Tuple[str, str]]
+    start_date: str
+    end_date: str
+    outbound_days: List[int] = field(default_factory=list)
+    return_days: List[int] = field(default_factory=list)
+    seat_classes: List[str] = field(default_factory=lambda: ["economy"])
+    max_stops: List[int] = field(default_factory=lambda: [0])
+    trip_type: str = "one-way"
+    num_adults: int = 1
+    fetch_mode: str = "normal"
+
+    def expand(self) -> Iterator[FlightConfiguration]:
+        """Yield the configurations this spec describes, one at a time"""
+        start = date.fromisoformat(self.start_date)
+        end = date.fromisoformat(self.end_date)
+        for from_airport, to_airport in self.routes:
+            legs = ((from_airport, to_airport, self.outbound_days),
+                    (to_airport, from_airport, self.return_days))
+            for origin, destination, weekdays in legs:
+                for day in iter_weekday_dates(start, end, weekdays):
+                    for seat_class in self.seat_classes:
+                        for max_stops in self.max_stops:
+                            yield FlightConfiguration(
+                                from_airport=origin,
+                                to_airport=destination,
+                                date=day.isoformat(),
+                                trip_type=self.trip_type,
+                                seat_class=seat_class,
+                                max_stops=max_stops,
+                                num_adults=self.num_adults,
+                                fetch_mode=self.fetch_mode
+                            )
+
+    def count(self) -> int:
+        """Number of configurations expand() yields"""
+        start = date.fromisoformat(self.start_date)
+        end = date.fromisoformat(self.end_date)
+        dates = (count_weekday_dates(start, end, self.outbound_days)
+                 + count_weekday_dates(start, end, self.return_days))
+        return len(self.routes) * dates * len(self.seat_classes) * len(self.max_stops)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'FlightSearchSpec':
+        data = dict(data)
+        data['routes'] = [tuple(route) for route in data['routes']]
+        return cls(**data)
+
+def iter_flight_configurations(
     from_airport: str,
     to_airport: str,
     start_date: datetime,
@@ -37,44 +115,120 @@ def create_flight_configurations(
     outbound_day: int,  # weekday for outbound flight
     return_day: int,    # weekday for return flight
     **kwargs
-) -> List[FlightConfiguration]:
-    configs = []
-    
-    # Generate outbound flight dates (Thursdays)
-    outbound_dates = generate_date_sequence(start_date, end_date, outbound_day)
-    
-    # Generate return flight dates (Sundays)
-    return_dates = generate_date_sequence(start_date, end_date, return_day)
-    
-    # Create outbound flight configurations
-    for date in outbound_dates:
-        configs.append(FlightConfiguration(
+) -> Iterator[FlightConfiguration]:
+    """Lazily yield outbound configurations followed by return configurations"""
+    for day in iter_weekday_dates(start_date, end_date, [outbound_day]):
+        yield FlightConfiguration(
             from_airport=from_airport,
             to_airport=to_airport,
-            date=date.strftime('%Y-%m-%d'),
+            date=day.strftime('%Y-%m-%d'),
             **kwargs
-        ))
-    
-    # Create return flight configurations
-    for date in return_dates:
-        configs.append(FlightConfiguration(
+        )
+    for day in iter_weekday_dates(start_date, end_date, [return_day]):
+        yield FlightConfiguration(
             from_airport=to_airport,
             to_airport=from_airport,
-            date=date.strftime('%Y-%m-%d'),
+            date=day.strftime('%Y-%m-%d'),
             **kwargs
-        ))
-    
-    return configs
+        )
 
-def save_configurations(configs: List[FlightConfiguration], filename: str):
-    config_data = [vars(config) for config in configs]
+def create_flight_configurations(
+    from_airport: str,
+    to_airport: str,
+    start_date: datetime,
+    end_date: datetime,
+    outbound_day: int,  # weekday for outbound flight
+    return_day: int,    # weekday for return flight
+    **kwargs
+) -> List[FlightConfiguration]:
+    return list(iter_flight_configurations(
+        from_airport, to_airport, start_date, end_date, outbound_day, return_day, **kwargs
+    ))
+
+def canonicalize_configuration(config: FlightConfiguration) -> FlightConfiguration:
+    """Normalize case, whitespace and date format so equal searches compare equal"""
+    return replace(
+        config,
+        from_airport=config.from_airport.strip().upper(),
+        to_airport=config.to_airport.strip().upper(),
+        date=datetime.strptime(config.date.strip(), '%Y-%m-%d').strftime('%Y-%m-%d'),
+        trip_type=config.trip_type.strip().lower(),
+        seat_class=config.seat_class.strip().lower(),
+        max_stops=int(config.max_stops),
+        num_adults=int(config.num_adults),
+        fetch_mode=config.fetch_mode.strip().lower()
+    )
+
+def configuration_key(config: FlightConfiguration) -> Tuple:
+    """Hashable identity of the search a configuration describes"""
+    return (
+        config.from_airport, config.to_airport, config.date, config.trip_type,
+        config.seat_class, config.max_stops, config.num_adults, config.fetch_mode
+    )
+
+def iter_unique_configurations(
+    configs: Iterable[FlightConfiguration],
+    counts: Optional[Dict[str, int]] = None
+) -> Iterator[FlightConfiguration]:
+    """
+    Stream canonicalized configurations, skipping repeated searches and
+    keeping the first occurrence. Only the compact keys are remembered.
+    Skipped repeats are counted in counts['duplicates'] when given.
+    """
+    seen = set()
+    for config in configs:
+        config = canonicalize_configuration(config)
+        key = configuration_key(config)
+        if key in seen:
+            if counts is not None:
+                counts['duplicates'] = counts.get('duplicates', 0) + 1
+            continue
+        seen.add(key)
+        yield config
+
+def save_configurations(configs: Iterable[FlightConfiguration], filename: str):
+    """
+    Write configurations as they are generated. Files ending in .jsonl get
+    one configuration per line; anything else gets a JSON array.
+    """
     abs_path = os.path.abspath(filename)
     print(f"Saving configurations to: {abs_path}")  # Debug print
     with open(filename, 'w') as f:
-        json.dump(config_data, f, indent=2)
+        if filename.endswith('.jsonl'):
+            for config in configs:
+                f.write(json.dumps(asdict(config)) + '\n')
+        else:
+            f.write('[')
+            for index, config in enumerate(configs):
+                f.write(',\n  ' if index else '\n  ')
+                f.write(json.dumps(asdict(config), indent=2).replace('\n', '\n  '))
+            f.write('\n]\n')
     return abs_path
 
-def load_configurations(filename: str) -> List[FlightConfiguration]:
+def save_spec(spec: FlightSearchSpec, filename: str):
+    """Write a search spec; it is expanded again when the file is loaded"""
+    abs_path = os.path.abspath(filename)
+    with open(filename, 'w') as f:
+        json.dump({'spec': asdict(spec)}, f, indent=2)
+    return abs_path
+
+def iter_configurations(filename: str) -> Iterator[FlightConfiguration]:
+    """
+    Stream configurations from a file: JSONL line by line, a saved spec by
+    lazy expansion, or a JSON array of configurations.
+    """
     with open(filename, 'r') as f:
+        if filename.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield FlightConfiguration(**json.loads(line))
+            return
         config_data = json.load(f)
-    return [FlightConfiguration(**config) for config in config_data] 
\ No newline at end of file
+    if isinstance(config_data, dict) and 'spec' in config_data:
+        yield from FlightSearchSpec.from_dict(config_data['spec']).expand()
+    else:
+        for config in config_data:
+            yield FlightConfiguration(**config)
+
+def load_configurations(filename: str) -> List[FlightConfiguration]:
+    return list(iter_configurations(filename))
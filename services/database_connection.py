@@ -1,20 +1,122 @@
 import os
+import threading
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import pool, extensions
 from dotenv import load_dotenv
 
+_settings = None
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+# Pool and semaphore each borrowed connection came from, by id(conn)
+_borrowed = {}
+
+def get_db_settings():
+    """Read database settings from the environment once per process"""
+    global _settings
+    if _settings is None:
+        load_dotenv()  # Load environment variables from .env file
+        _settings = {
+            'dbname': os.getenv('DB_NAME'),
+            'user': os.getenv('DB_USER'),
+            'password': os.getenv('DB_PASSWORD'),
+            'host': os.getenv('DB_HOST'),
+            'port': os.getenv('DB_PORT'),
+        }
+    return _settings
+
 def create_connection():
     """Create a connection to the PostgreSQL database"""
-    load_dotenv()  # Load environment variables from .env file
-    
     try:
-        conn = psycopg2.connect(
-            dbname=os.getenv('DB_NAME'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            host=os.getenv('DB_HOST'),
-            port=os.getenv('DB_PORT')
-        )
+        conn = psycopg2.connect(**get_db_settings())
         return conn
     except psycopg2.Error as e:
         print(f"Error connecting to database: {e}")
-        raise
\ No newline at end of file
+        raise
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _pool, _pool_slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                maxconn = int(os.getenv('DB_POOL_MAX', '10'))
+                try:
+                    connection_pool = pool.ThreadedConnectionPool(
+                        minconn=int(os.getenv('DB_POOL_MIN', '1')),
+                        maxconn=maxconn,
+                        **get_db_settings()
+                    )
+                except psycopg2.Error as e:
+                    print(f"Error creating connection pool: {e}")
+                    raise
+                # psycopg2 raises instead of waiting when the pool is empty,
+                # so callers queue on a semaphore sized to the pool
+                _pool_slots = threading.BoundedSemaphore(maxconn)
+                _pool = connection_pool
+    return _pool
+
+def acquire_connection():
+    """Borrow a long-lived connection from the pool, waiting if all are in use"""
+    get_pool()
+    with _pool_lock:
+        connection_pool, slots = _pool, _pool_slots
+    if connection_pool is None:
+        raise psycopg2.InterfaceError("connection pool was closed")
+    slots.acquire()
+    try:
+        conn = connection_pool.getconn()
+    except Exception:
+        slots.release()
+        raise
+    with _pool_lock:
+        _borrowed[id(conn)] = (connection_pool, slots)
+    return conn
+
+def release_connection(conn):
+    """
+    Return a borrowed connection to the pool it came from, discarding it if
+    it is broken or that pool has been closed since (e.g. by close_pool()).
+    """
+    with _pool_lock:
+        connection_pool, slots = _borrowed.pop(id(conn), (None, None))
+    if connection_pool is None:
+        if not conn.closed:
+            conn.close()
+        return
+    try:
+        if connection_pool.closed:
+            if not conn.closed:
+                conn.close()
+            return
+        if conn.closed or conn.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN:
+            connection_pool.putconn(conn, close=True)
+            return
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        connection_pool.putconn(conn)
+    finally:
+        slots.release()
+
+@contextmanager
+def get_connection():
+    """Context manager that borrows a pooled connection and always returns it"""
+    conn = acquire_connection()
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
+
+def close_pool():
+    """Close every pooled connection, e.g. on shutdown"""
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _pool_slots = None
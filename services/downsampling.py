@@ -0,0 +1,78 @@
+from datetime import date, datetime
+from typing import List, Sequence
+
+__all__ = ['lttb_indices', 'envelope_indices', 'downsample_indices', 'DOWNSAMPLING_METHODS']
+
+DOWNSAMPLING_METHODS = ('lttb', 'envelope')
+
+def _as_number(x) -> float:
+    """x-axis value as a float; dates count days, datetimes seconds"""
+    if isinstance(x, datetime):
+        return x.timestamp()
+    if isinstance(x, date):
+        return float(x.toordinal())
+    return float(x)
+
+def lttb_indices(xs: Sequence, ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Indices of the points Largest-Triangle-Three-Buckets keeps.
+
+    The first and last points are always kept; the others are split into
+    threshold - 2 buckets and from each the point forming the largest
+    triangle with the previously kept point and the next bucket's average
+    is chosen, which preserves the visual shape of the series.
+    """
+    n = len(ys)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    xs = [_as_number(x) for x in xs]
+    every = (n - 2) / (threshold - 2)
+    kept = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if i == threshold - 3:
+            next_start, next_end = n - 1, n  # the last point
+        else:
+            next_start = end
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
+
+def envelope_indices(ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Indices of the lowest and highest point of each of threshold / 2
+    equal-width buckets, in order, so every price extreme stays visible.
+    """
+    n = len(ys)
+    if threshold >= n or threshold < 2:
+        return list(range(n))
+    buckets = threshold // 2
+    kept = []
+    for i in range(buckets):
+        start = i * n // buckets
+        end = (i + 1) * n // buckets
+        bucket = range(start, end)
+        low = min(bucket, key=ys.__getitem__)
+        high = max(bucket, key=ys.__getitem__)
+        kept.extend(sorted({low, high}))
+    return kept
+
+def downsample_indices(xs: Sequence, ys: Sequence[float], max_points: int,
+                       method: str = 'lttb') -> List[int]:
+    """Indices of at most max_points points of a series sorted by x"""
+    if method == 'lttb':
+        return lttb_indices(xs, ys, max_points)
+    if method == 'envelope':
+        return envelope_indices(ys, max_points)
+    raise ValueError(f"Unknown downsampling method: {method}")
@@ -1,113 +1,322 @@
 # services/flight_database.py
 
 import psycopg2
+from psycopg2.extras import execute_values
+import threading
 from datetime import datetime
 import os
-from collections import OrderedDict
-from .database_connection import create_connection
-from .analysis_views import create_analysis_views
+from .database_connection import create_connection, get_connection
+from .analysis_views import create_analysis_views, ANALYSIS_VIEWS
+from . import flight_parser
+from .flight_parser import parse_flight_time
+from . import metrics
+from .models import FlightObservation, SearchOutcome
+from .partitioning import (
+    ensure_partitions,
+    get_partition_interval,
+    is_partitioned,
+    next_partition_start,
+    partition_start
+)
 
-def parse_datetime(date_str):
+_flights_table_ready = False
+_flights_table_lock = threading.Lock()
+
+def parse_datetime(date_str, reference=None):
     """Convert date strings from flight data into proper datetime objects"""
-    try:
-        return datetime.strptime(date_str, '%I:%M %p on %a, %b %d, %Y')
-    except ValueError:
-        # Handle dates without year by assuming 2025
-        partial_date = datetime.strptime(date_str + ', 2025', '%I:%M %p on %a, %b %d, %Y')
-        return partial_date
+    return parse_flight_time(date_str, reference)
 
 def parse_price(price_str):
     """Convert price strings like '$284' into decimal numbers"""
-    if not price_str:
-        return 0.0
-    return float(price_str.replace('$', ''))
+    return flight_parser.parse_price(price_str)
 
 def parse_duration(duration_str):
-    """Convert duration strings like '3 hr 53 min' into PostgreSQL interval format"""
-    if not duration_str:
-        return '0 hours'
-    parts = duration_str.split()
-    hours = int(parts[0])
-    minutes = int(parts[2]) if len(parts) > 2 else 0
-    return f"{hours} hours {minutes} minutes"
-
-def create_flights_table(conn):
-    """Set up the database table structure for storing flight information"""
+    """Convert duration strings like '3 hr 53 min' into timedelta (stored as INTERVAL)"""
+    return flight_parser.parse_duration(duration_str)
+
+# Partitions are created this far ahead of the current one so new rows
+# rarely land in the default partition
+PARTITIONS_AHEAD = 2
+
+def create_flights_table(conn, partition_interval=None):
+    """
+    Set up the database table structure for storing flight information.
+
+    New tables are range partitioned on query_time (monthly by default, see
+    FLIGHT_PARTITION_INTERVAL) with a default partition as a catch-all.
+    Existing unpartitioned tables keep working and get the same indexes;
+    migrate_to_partitioned() converts them.
+    """
+    interval = partition_interval or get_partition_interval()
     with conn.cursor() as cur:
+        _create_flights_table(cur, interval)
+        _create_search_outcomes_table(cur)
+    conn.commit()
+
+def _create_flights_table(cur, interval):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS flight_searches (
+            id BIGSERIAL,
+            query_time TIMESTAMP NOT NULL,
+            from_airport VARCHAR(3) NOT NULL,
+            to_airport VARCHAR(3) NOT NULL,
+            trip VARCHAR(10) NOT NULL,
+            seat VARCHAR(20) NOT NULL,
+            airline_name VARCHAR(50),
+            departure TIMESTAMP,
+            arrival TIMESTAMP,
+            duration INTERVAL,
+            stops INTEGER,
+            price DECIMAL(10,2),
+            is_best BOOLEAN,
+            arrival_time_ahead VARCHAR(100),
+            delay INTEGER,
+            search_id UUID,
+            option_rank INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, query_time)
+        ) PARTITION BY RANGE (query_time)
+    """)
+    # Tables created before every option was stored lack these columns
+    cur.execute("""
+        ALTER TABLE flight_searches
+            ADD COLUMN IF NOT EXISTS search_id UUID,
+            ADD COLUMN IF NOT EXISTS option_rank INTEGER
+    """)
+
+    # Route lookups filter on the airports and departure or query time;
+    # query_time grows with insertion order, which suits a tiny BRIN index
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_flight_searches_search_id
+        ON flight_searches (search_id);
+
+        CREATE INDEX IF NOT EXISTS idx_flight_searches_route_departure
+        ON flight_searches (from_airport, to_airport, departure);
+
+        CREATE INDEX IF NOT EXISTS idx_flight_searches_route_query_time
+        ON flight_searches (from_airport, to_airport, query_time);
+
+        CREATE INDEX IF NOT EXISTS idx_flight_searches_query_time_brin
+        ON flight_searches USING BRIN (query_time);
+    """)
+
+    if is_partitioned(cur):
         cur.execute("""
-            CREATE TABLE IF NOT EXISTS flight_searches (
-                id SERIAL PRIMARY KEY,
-                query_time TIMESTAMP NOT NULL,
-                from_airport VARCHAR(3) NOT NULL,
-                to_airport VARCHAR(3) NOT NULL,
-                trip VARCHAR(10) NOT NULL,
-                seat VARCHAR(20) NOT NULL,
-                airline_name VARCHAR(50),
-                departure TIMESTAMP,
-                arrival TIMESTAMP,
-                duration INTERVAL,
-                stops INTEGER,
-                price DECIMAL(10,2),
-                is_best BOOLEAN,
-                arrival_time_ahead VARCHAR(100),
-                delay INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+            CREATE TABLE IF NOT EXISTS flight_searches_default
+            PARTITION OF flight_searches DEFAULT
         """)
-        conn.commit()
+        now = datetime.now()
+        last = now
+        for _ in range(PARTITIONS_AHEAD):
+            last = next_partition_start(partition_start(last, interval), interval)
+        ensure_partitions(cur, now, last, interval)
+
+def _create_search_outcomes_table(cur):
+    """
+    Create search_outcomes, which records every fetched search by the route
+    and departure date it asked for, including searches that found nothing.
+    When the table is first created it is backfilled from flight_searches,
+    and the placeholder rows older versions stored there for empty searches
+    are removed.
+    """
+    cur.execute("SELECT to_regclass('search_outcomes') IS NOT NULL")
+    if cur.fetchone()[0]:
+        return
+    cur.execute("LOCK TABLE flight_searches IN SHARE ROW EXCLUSIVE MODE")
+    cur.execute("SELECT to_regclass('search_outcomes') IS NOT NULL")
+    if cur.fetchone()[0]:
+        return
+    cur.execute("""
+        CREATE TABLE search_outcomes (
+            id BIGSERIAL PRIMARY KEY,
+            search_id UUID,
+            query_time TIMESTAMP NOT NULL,
+            from_airport VARCHAR(3) NOT NULL,
+            to_airport VARCHAR(3) NOT NULL,
+            departure_date DATE NOT NULL,
+            trip VARCHAR(10) NOT NULL,
+            seat VARCHAR(20) NOT NULL,
+            options_found INTEGER NOT NULL
+        );
+
+        CREATE INDEX idx_search_outcomes_route_date
+        ON search_outcomes (from_airport, to_airport, departure_date, query_time);
 
-def insert_flight_data(conn, flight_data):
-    """Insert a single flight search result into the database"""
+        INSERT INTO search_outcomes (
+            search_id, query_time, from_airport, to_airport, departure_date,
+            trip, seat, options_found
+        )
+        SELECT
+            search_id, query_time, from_airport, to_airport, DATE(MIN(departure)),
+            trip, seat, COUNT(*)
+        FROM flight_searches
+        WHERE departure IS NOT NULL
+        GROUP BY search_id, query_time, from_airport, to_airport, trip, seat;
+
+        DELETE FROM flight_searches
+        WHERE departure IS NULL AND airline_name IS NULL AND price IS NULL;
+    """)
+
+def migrate_to_partitioned(conn, partition_interval=None, drop_legacy=False):
+    """
+    Move an existing unpartitioned flight_searches table into a partitioned
+    one, keeping every row and id. The analysis views are dropped and
+    recreated on the new table. The old table is kept as
+    flight_searches_legacy unless drop_legacy is set.
+    Returns the number of rows migrated, or None if nothing needed migrating.
+    """
+    interval = partition_interval or get_partition_interval()
     with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('flight_searches') IS NOT NULL")
+        if not cur.fetchone()[0] or is_partitioned(cur):
+            return None
+
+        for view in ANALYSIS_VIEWS:
+            cur.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view} CASCADE")
+
+        # Move the old table and everything named after it out of the way
         cur.execute("""
-            INSERT INTO flight_searches (
-                query_time, from_airport, to_airport, trip, seat,
-                airline_name, departure, arrival, duration, stops,
-                price, is_best, arrival_time_ahead, delay
-            ) VALUES (
-                %(query_time)s, %(from_airport)s, %(to_airport)s, %(trip)s, %(seat)s,
-                %(airline_name)s, %(departure)s, %(arrival)s, %(duration)s, %(stops)s,
-                %(price)s, %(is_best)s, %(arrival_time_ahead)s, %(delay)s
-            ) RETURNING id
-        """, {
-            'query_time': parse_datetime(flight_data['query_time']),
-            'from_airport': flight_data['from_airport'],
-            'to_airport': flight_data['to_airport'],
-            'trip': flight_data['trip'],
-            'seat': flight_data['seat'],
-            'airline_name': flight_data.get('name'),
-            'departure': parse_datetime(flight_data['departure']) if flight_data.get('departure') else None,
-            'arrival': parse_datetime(flight_data['arrival']) if flight_data.get('arrival') else None,
-            'duration': parse_duration(flight_data.get('duration')),
-            'stops': flight_data.get('stops', 0),
-            'price': parse_price(flight_data.get('price')),
-            'is_best': flight_data.get('is_best', False),
-            'arrival_time_ahead': flight_data.get('arrival_time_ahead'),
-            'delay': flight_data.get('delay')
-        })
+            ALTER TABLE flight_searches
+                ADD COLUMN IF NOT EXISTS search_id UUID,
+                ADD COLUMN IF NOT EXISTS option_rank INTEGER;
+            ALTER TABLE flight_searches RENAME TO flight_searches_legacy;
+            ALTER TABLE flight_searches_legacy
+                RENAME CONSTRAINT flight_searches_pkey TO flight_searches_legacy_pkey;
+            ALTER SEQUENCE IF EXISTS flight_searches_id_seq
+                RENAME TO flight_searches_legacy_id_seq;
+            DROP INDEX IF EXISTS idx_flight_searches_search_id;
+            DROP INDEX IF EXISTS idx_flight_searches_route_departure;
+            DROP INDEX IF EXISTS idx_flight_searches_route_query_time;
+            DROP INDEX IF EXISTS idx_flight_searches_query_time_brin;
+        """)
+
+        _create_flights_table(cur, interval)
+
+        cur.execute("SELECT MIN(query_time), MAX(query_time), MAX(id) FROM flight_searches_legacy")
+        first, last, max_id = cur.fetchone()
+        if first is not None:
+            ensure_partitions(cur, first, last, interval)
+
+        columns = ', '.join(('id',) + FLIGHT_COLUMNS + ('created_at',))
+        cur.execute(f"""
+            INSERT INTO flight_searches ({columns})
+            SELECT {columns} FROM flight_searches_legacy
+        """)
+        migrated = cur.rowcount
+        if max_id is not None:
+            cur.execute(
+                "SELECT setval(pg_get_serial_sequence('flight_searches', 'id'), %s)",
+                (max_id,)
+            )
+        if drop_legacy:
+            cur.execute("DROP TABLE flight_searches_legacy")
+        _create_search_outcomes_table(cur)
+    conn.commit()
+
+    create_analysis_views(conn)
+    return migrated
+
+def ensure_flights_table(conn):
+    """Create the flight_searches table once per process"""
+    global _flights_table_ready
+    if _flights_table_ready:
+        return
+    with _flights_table_lock:
+        if not _flights_table_ready:
+            create_flights_table(conn)
+            _flights_table_ready = True
+
+FLIGHT_COLUMNS = FlightObservation._fields
+
+def build_flight_row(flight_data):
+    """
+    Convert a flight search result into its insert parameters.
+    FlightObservation records already are the parameter tuple and pass
+    straight through; dicts with raw fast_flights strings are parsed.
+    """
+    return FlightObservation.coerce(flight_data)
+
+OUTCOME_COLUMNS = SearchOutcome._fields
+
+_INSERT_FLIGHT = f"""
+    INSERT INTO flight_searches ({', '.join(FLIGHT_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(FLIGHT_COLUMNS))})
+    RETURNING id
+"""
+
+def _insert_outcomes(cur, outcomes):
+    if outcomes:
+        execute_values(
+            cur,
+            f"INSERT INTO search_outcomes ({', '.join(OUTCOME_COLUMNS)}) VALUES %s",
+            outcomes,
+            page_size=len(outcomes)
+        )
+
+@metrics.timer('db_insert_seconds', 'Inserts into flight_searches', mode='single')
+def insert_flight_data(conn, flight_data, outcome=None):
+    """Insert a single flight search result (and its search outcome) into the database"""
+    metrics.counter('db_rows_inserted_total', 'Rows inserted into flight_searches').inc()
+    with conn.cursor() as cur:
+        cur.execute(_INSERT_FLIGHT, build_flight_row(flight_data))
+        flight_id = cur.fetchone()[0]
+        _insert_outcomes(cur, [outcome] if outcome is not None else [])
         conn.commit()
-        return cur.fetchone()[0]
+        return flight_id
+
+def insert_flight_rows(conn, rows, outcomes=()):
+    """
+    Insert many prepared rows (see build_flight_row) with a single
+    multi-row INSERT, plus the SearchOutcome of every search they came from,
+    in one commit. Returns the number of rows written.
+    """
+    outcomes = list(outcomes)
+    if not rows and not outcomes:
+        return 0
+    with metrics.timer('db_insert_seconds', mode='batch'), conn.cursor() as cur:
+        if rows:
+            execute_values(
+                cur,
+                f"INSERT INTO flight_searches ({', '.join(FLIGHT_COLUMNS)}) VALUES %s",
+                rows,
+                page_size=len(rows)
+            )
+        _insert_outcomes(cur, outcomes)
+        conn.commit()
+    metrics.counter('db_rows_inserted_total').inc(len(rows))
+    return len(rows)
 
-def store_flight_search(flight_data):
+def store_flight_search(flight_data, outcome=None):
     """Main entry point for storing flight search results"""
     try:
-        conn = create_connection()
-        create_flights_table(conn)
-        flight_id = insert_flight_data(conn, flight_data)
+        with get_connection() as conn:
+            ensure_flights_table(conn)
+            flight_id = insert_flight_data(conn, flight_data, outcome)
         print(f"Successfully stored flight data with ID: {flight_id}")
         return flight_id
     except Exception as e:
         print(f"Error storing flight data: {e}")
         return None
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+def store_flight_options(flights, outcome=None):
+    """
+    Store every option of one search (and its outcome) with a single bulk
+    write. Returns the number of rows written, or None if the write failed.
+    """
+    try:
+        with get_connection() as conn:
+            ensure_flights_table(conn)
+            return insert_flight_rows(
+                conn,
+                [build_flight_row(flight) for flight in flights],
+                [outcome] if outcome is not None else []
+            )
+    except Exception as e:
+        print(f"Error storing flight options: {e}")
+        return None
 
 def initialize_database():
     """Initialize database tables and views"""
-    conn = create_connection()
-    try:
+    with get_connection() as conn:
         create_flights_table(conn)
-        create_analysis_views(conn)
-    finally:
-        conn.close()
\ No newline at end of file
+        create_analysis_views(conn)
\ No newline at end of file
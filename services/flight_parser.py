@@ -0,0 +1,135 @@
+import re
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Optional, Union
+
+__all__ = [
+    'parse_flight_time',
+    'parse_price',
+    'parse_duration',
+    'parse_stops',
+    'parse_flight'
+]
+
+# "10:30 AM on Thu, Mar 6" as returned by fast_flights, optionally with ", 2025"
+_FLIGHT_TIME = re.compile(
+    r'^\s*(\d{1,2}):(\d{2})\s*([AaPp][Mm])\s+on\s+([A-Za-z]{3})[a-z]*,\s+'
+    r'([A-Za-z]{3})[a-z]*\s+(\d{1,2})(?:,\s*(\d{4}))?\s*$'
+)
+_DURATION = re.compile(r'^\s*(?:(\d+)\s*hr?s?)?\s*(?:(\d+)\s*min)?\s*$')
+_MONTHS = {
+    name: number for number, name in enumerate(
+        ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1
+    )
+}
+_WEEKDAYS = {name: number for number, name in enumerate(['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun'])}
+
+def parse_flight_time(value, reference: Optional[Union[date, datetime]] = None) -> Optional[datetime]:
+    """
+    Parse a fast_flights time like '10:30 AM on Thu, Mar 6' into a datetime.
+
+    fast_flights omits the year, so it is inferred from `reference` (the
+    query date): the year, starting with the reference year, whose calendar
+    puts the date on the stated weekday and not in the past. Results are
+    cached, since the same strings repeat across rows and searches.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    if reference is None:
+        reference = date.today()
+    elif isinstance(reference, datetime):
+        reference = reference.date()
+    return _parse_flight_time(value, reference)
+
+@lru_cache(maxsize=8192)
+def _parse_flight_time(text: str, reference: date) -> datetime:
+    match = _FLIGHT_TIME.match(text)
+    if match is None:
+        raise ValueError(f"Unrecognized flight time: {text!r}")
+    hour, minute, meridiem, weekday, month, day, year = match.groups()
+    hour = int(hour) % 12 + (12 if meridiem.lower() == 'pm' else 0)
+    month = _MONTHS[month.lower()]
+    day = int(day)
+    if year is not None:
+        return datetime(int(year), month, day, hour, int(minute))
+    return datetime.combine(
+        _infer_date(month, day, _WEEKDAYS.get(weekday.lower()), reference),
+        datetime.min.time()
+    ).replace(hour=hour, minute=int(minute))
+
+def _infer_date(month: int, day: int, weekday: Optional[int], reference: date) -> date:
+    """Pick the year for a month/day seen on `reference`"""
+    candidates = []
+    # A day of slack covers time zones between the query and the airport
+    earliest = reference - timedelta(days=1)
+    for year in range(reference.year, reference.year + 2):
+        try:
+            candidate = date(year, month, day)
+        except ValueError:  # Feb 29 outside a leap year
+            continue
+        if candidate >= earliest:
+            candidates.append(candidate)
+    for candidate in candidates:
+        if weekday is None or candidate.weekday() == weekday:
+            return candidate
+    if candidates:
+        return candidates[0]
+    return date(reference.year, month, day)
+
+def parse_price(value) -> Optional[Decimal]:
+    """Convert price strings like '$1,284' into Decimal; None when unavailable"""
+    if value is None or isinstance(value, Decimal):
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    cleaned = value.replace('$', '').replace(',', '').strip()
+    if not cleaned:
+        return None
+    try:
+        return Decimal(cleaned)
+    except InvalidOperation:
+        return None
+
+def parse_duration(value) -> Optional[timedelta]:
+    """Convert duration strings like '3 hr 53 min' or '45 min' into timedelta"""
+    if value is None or isinstance(value, timedelta):
+        return value
+    return _parse_duration(value)
+
+@lru_cache(maxsize=4096)
+def _parse_duration(text: str) -> Optional[timedelta]:
+    match = _DURATION.match(text)
+    if match is None or not any(match.groups()):
+        return None
+    hours, minutes = match.groups()
+    return timedelta(hours=int(hours or 0), minutes=int(minutes or 0))
+
+def parse_stops(value) -> Optional[int]:
+    """fast_flights reports stops as an int, or 'Unknown' when it cannot tell"""
+    return _optional_int(value)
+
+def _optional_int(value) -> Optional[int]:
+    if value is None or isinstance(value, int):
+        return value
+    value = str(value).strip()
+    return int(value) if value.isdigit() else None
+
+def parse_flight(flight, query_time: datetime) -> dict:
+    """
+    Turn one fast_flights Flight into typed values, once, straight from
+    its attributes. Times are resolved against the query date.
+    """
+    return {
+        'airline_name': flight.name,
+        'departure': parse_flight_time(flight.departure, query_time),
+        'arrival': parse_flight_time(flight.arrival, query_time),
+        'duration': parse_duration(flight.duration),
+        'stops': parse_stops(flight.stops),
+        'price': parse_price(flight.price),
+        'is_best': bool(flight.is_best),
+        'arrival_time_ahead': flight.arrival_time_ahead or None,
+        'delay': _optional_int(getattr(flight, 'delay', None))
+    }
@@ -1,65 +1,184 @@
+import threading
+import uuid
+from concurrent.futures import Future
 from datetime import datetime
 from fast_flights import FlightData, Passengers, get_flights
-from collections import OrderedDict
-from .flight_database import store_flight_search  # Add this import
+from .flight_database import store_flight_search, store_flight_options
+from .models import FlightObservation, SearchOutcome
+from . import metrics
+from .resilience import FlightFetchError, NoFlightsFound, call_with_retry, get_circuit_breaker
+from .result_cache import FlightResultCache, get_result_cache
 
-def get_flights_with_additional_info(flight_data, trip, seat, max_stops, passengers, fetch_mode):
+# Fetches currently running in this process, keyed by cache key, so
+# concurrent identical requests share one call to fast_flights
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+@metrics.timer('flight_search_seconds', 'get_flights_with_additional_info calls')
+def get_flights_with_additional_info(flight_data, trip, seat, max_stops, passengers, fetch_mode,
+                                     writer=None, all_options=False, use_cache=True,
+                                     rate_limiter=None, stop=None):
     """
     Fetch flight information and augment it with additional details.
+
+    By default only the first (top ranked) flight is kept. With all_options
+    every itinerary returned by fast_flights is stored in one bulk write and
+    a list is returned; each FlightObservation carries its option_rank and
+    the search_id shared by all options of this search.
+
+    When a FlightBatchWriter is given the results are buffered for a bulk
+    write instead of being inserted (and committed) on their own.
+
+    Identical requests are answered from the result cache for its TTL;
+    cached answers are returned with their original query time and
+    search_id and are not stored again. A result only enters the cache once
+    its rows are durably written (committed, or flushed by `writer`), so a
+    retry after a failed store fetches and stores it again. use_cache=False
+    bypasses the lookup (the fresh result still refreshes the cache).
+    Identical requests made while one is already in flight wait for and
+    share its result instead of fetching again: in this process as soon as
+    it is fetched, in another process once it is stored. Requests only
+    count as identical when they also agree on all_options, so whoever
+    fetched stored what every sharer needs.
+
+    Transient upstream failures are retried with jittered backoff behind
+    the process-wide circuit breaker, each attempt taking a slot from
+    `rate_limiter` when one is given; cache hits take none. Failures are
+    raised as FlightFetchError subclasses; setting the `stop` event cancels
+    a fetch still waiting on the breaker, the rate limiter or a backoff
+    with FetchCancelled. A search without flights is returned as a single
+    observation without itinerary. Every fetched
+    search is also recorded in search_outcomes, the empty ones only there.
     """
-    try:
-        result = get_flights(
-            flight_data=flight_data,
-            trip=trip,
-            seat=seat,
-            max_stops=max_stops,
-            passengers=passengers,
-            fetch_mode=fetch_mode
+    cache = get_result_cache()
+    cache_key = cache.make_key(flight_data, trip, seat, max_stops, passengers, fetch_mode,
+                               all_options)
+    cached = cache.get(cache_key) if use_cache else None
+    if cached is not None:
+        observations, _ = cached
+        settle = None
+    else:
+        observations, settle = _fetch_coalesced(
+            cache,
+            cache_key,
+            lambda: _fetch_observations(flight_data, trip, seat, max_stops,
+                                        passengers, fetch_mode, rate_limiter, stop)
         )
-        
-        query_time = datetime.now().strftime('%I:%M %p on %a, %b %d, %Y')
-
-        if result.flights:
-            flight_info = vars(result.flights[0])
-            flight_info['departure'] = datetime.strptime(
-                flight_info['departure'] + ', 2025', 
-                '%I:%M %p on %a, %b %d, %Y'
-            ).strftime('%I:%M %p on %a, %b %d, %Y')
+
+    metrics.counter('flight_searches_total', 'Searches by where their answer came from',
+                    source='cache' if cached is not None else
+                    'fetched' if settle is not None else 'shared').inc()
+
+    # Store the flight data in the database; the placeholder for a search
+    # without flights is only recorded as its outcome. Cache hits and
+    # shared fetches were stored by whoever fetched them.
+    records = list(observations if all_options else observations[:1])
+    rows = [record for record in records if record.has_itinerary]
+    if settle is not None:
+        outcome = SearchOutcome.from_observations(observations, flight_data[0].date)
+        try:
+            if writer is not None:
+                writer.add_many(rows, outcome, on_done=settle)
+            elif all_options or not rows:
+                stored = store_flight_options(rows, outcome)
+                if stored:
+                    print(f"Stored {stored} flight options for search {outcome.search_id}")
+                settle(stored is not None)
+            else:
+                flight_id = store_flight_search(rows[0], outcome)
+                if flight_id:
+                    print(f"Flight data stored with ID: {flight_id}")
+                settle(flight_id is not None)
+        except BaseException:
+            settle(False)
+            raise
+
+    return records if all_options else records[0]
+
+def _fetch_coalesced(cache, cache_key, fetch):
+    """
+    Run `fetch` once for all concurrent callers with the same key.
+
+    Returns (result, settle). Only the caller that actually downloaded the
+    result gets a `settle` callable; it must store the result and then call
+    settle(stored), which caches the result if it was stored and releases
+    the claim other processes wait on. Everyone else gets settle=None.
+    """
+    with _inflight_lock:
+        future = _inflight.get(cache_key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[cache_key] = future
+
+    if not leader:
+        return future.result(), None
+
+    try:
+        if cache.claim(cache_key):
+            result = fetch()
         else:
-            flight_info = {}
-
-        additional_info = {
-            'query_time': query_time,
-            'from_airport': flight_data[0].from_airport,
-            'to_airport': flight_data[0].to_airport,
-            'seat': seat,
-            'trip': trip
-        }
-
-        # Create the flight data dictionary
-        flight_data_dict = OrderedDict([
-            ('query_time', additional_info['query_time']),
-            ('from_airport', additional_info['from_airport']),
-            ('to_airport', additional_info['to_airport']),
-            ('trip', additional_info['trip']),
-            ('seat', additional_info['seat']),
-            ('name', flight_info.get('name')),
-            ('departure', flight_info.get('departure')),
-            ('arrival', flight_info.get('arrival')),
-            ('duration', flight_info.get('duration')),
-            ('stops', flight_info.get('stops')),
-            ('price', flight_info.get('price')),
-            ('is_best', flight_info.get('is_best')),
-            ('arrival_time_ahead', flight_info.get('arrival_time_ahead')),
-            ('delay', flight_info.get('delay'))
-        ])
-
-        # Store the flight data in the database
-        flight_id = store_flight_search(flight_data_dict)
-        if flight_id:
-            print(f"Flight data stored with ID: {flight_id}")
-
-        return flight_data_dict
-
-    except AssertionError as e:
-        return {"error": f"No flights available: {str(e)}"}
\ No newline at end of file
+            # Another process is fetching the same request; its result
+            # only appears once stored, and if that fails we fetch it here
+            shared = cache.wait_for(cache_key)
+            if shared is not None:
+                future.set_result(shared[0])
+                return shared[0], None
+            cache.claim(cache_key)
+            result = fetch()
+        fetched_at = datetime.now()
+    except BaseException as e:
+        cache.release(cache_key)
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(cache_key, None)
+    future.set_result(result)
+
+    def settle(stored: bool):
+        try:
+            if stored:
+                cache.set(cache_key, result, fetched_at)
+        finally:
+            cache.release(cache_key)
+
+    return result, settle
+
+def _fetch_observations(flight_data, trip, seat, max_stops, passengers, fetch_mode,
+                        rate_limiter=None, stop=None):
+    """
+    Call fast_flights and parse every itinerary it returns, once. A search
+    without flights yields a single placeholder observation.
+    """
+    try:
+        with metrics.timer('flight_fetch_seconds', 'fast_flights calls, including retries'):
+            flights = call_with_retry(
+                lambda: get_flights(
+                    flight_data=flight_data,
+                    trip=trip,
+                    seat=seat,
+                    max_stops=max_stops,
+                    passengers=passengers,
+                    fetch_mode=fetch_mode
+                ).flights,
+                breaker=get_circuit_breaker(),
+                before_attempt=(lambda: rate_limiter.acquire(stop)) if rate_limiter is not None else None,
+                stop=stop
+            )
+    except NoFlightsFound:
+        flights = []
+    except FlightFetchError as e:
+        metrics.counter('flight_fetch_errors_total', 'Failed fast_flights calls',
+                        error=type(e).__name__).inc()
+        raise
+    query_time = datetime.now()
+    search = (query_time, flight_data[0].from_airport, flight_data[0].to_airport, trip, seat)
+    search_id = str(uuid.uuid4())
+    with metrics.timer('flight_parse_seconds', 'Parsing the itineraries of one search'):
+        observations = tuple(
+            FlightObservation.from_flight(flight, *search, search_id=search_id, rank=rank)
+            for rank, flight in enumerate(flights)
+        )
+    metrics.counter('flight_options_total', 'Itineraries parsed').inc(len(observations))
+    return observations or (FlightObservation(*search, search_id=search_id),)
@@ -0,0 +1,171 @@
+import atexit
+import threading
+import time
+from typing import Optional
+from .database_connection import get_connection
+from .flight_database import build_flight_row, ensure_flights_table, insert_flight_rows
+
+__all__ = ['FlightBatchWriter', 'get_flight_writer']
+
+class FlightBatchWriter:
+    """
+    Buffer flight search results and write them in bulk.
+
+    Rows, and the search outcomes that come with them, are flushed with one
+    multi-row INSERT each and one commit whenever the buffer reaches
+    `max_batch_size` rows or its oldest entry is older than
+    `max_age_seconds`, and once more when the writer is closed. A failed
+    flush keeps its rows buffered and leaves the error in `last_error`;
+    closing the writer with rows it still cannot write raises. Callbacks
+    given to add_many learn whether their rows were committed (True) or
+    dropped by discard() or a failed close (False).
+    """
+
+    def __init__(self, max_batch_size: int = 500, max_age_seconds: float = 5.0):
+        self.max_batch_size = max_batch_size
+        self.max_age_seconds = max_age_seconds
+        self._buffer = []
+        self._outcomes = []
+        self._callbacks = []
+        self._oldest = None
+        self.last_error: Optional[Exception] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._flush_aged, name='flight-writer', daemon=True
+        )
+        self._flusher.start()
+
+    def add(self, flight_data):
+        """Queue one flight search result, flushing if the batch is full"""
+        self.add_many([flight_data])
+
+    def add_many(self, flights, outcome=None, on_done=None):
+        """
+        Queue several flight search results, and optionally the SearchOutcome
+        of the search they came from, with a single size check. `on_done` is
+        called with True once they are committed, or with False if they are
+        dropped unwritten.
+        """
+        rows = [build_flight_row(flight_data) for flight_data in flights]
+        if not rows and outcome is None:
+            if on_done is not None:
+                on_done(True)
+            return
+        with self._lock:
+            if self._closed.is_set():
+                raise RuntimeError("FlightBatchWriter is closed")
+            if not self._buffer and not self._outcomes:
+                self._oldest = time.monotonic()
+            self._buffer.extend(rows)
+            if outcome is not None:
+                self._outcomes.append(outcome)
+            if on_done is not None:
+                self._callbacks.append(on_done)
+            full = len(self._buffer) >= self.max_batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write every buffered row now. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+                outcomes, self._outcomes = self._outcomes, []
+                callbacks, self._callbacks = self._callbacks, []
+                self._oldest = None
+            if not rows and not outcomes:
+                return 0
+            try:
+                with get_connection() as conn:
+                    ensure_flights_table(conn)
+                    written = insert_flight_rows(conn, rows, outcomes)
+                self.last_error = None
+                print(f"Flushed {written} flight rows")
+            except Exception as e:
+                self.last_error = e
+                print(f"Error flushing flight data: {e}")
+                # Keep the rows so the next flush can retry them
+                with self._lock:
+                    self._buffer[:0] = rows
+                    self._outcomes[:0] = outcomes
+                    self._callbacks[:0] = callbacks
+                    if self._oldest is None:
+                        self._oldest = time.monotonic()
+                return 0
+        _notify(callbacks, True)
+        return written
+
+    def discard(self) -> int:
+        """
+        Drop every buffered row and outcome without writing them, for
+        callers that will fetch those searches again. Returns the number of
+        rows dropped.
+        """
+        with self._flush_lock, self._lock:
+            dropped = len(self._buffer)
+            callbacks = self._callbacks
+            self._buffer, self._outcomes, self._callbacks = [], [], []
+            self._oldest = None
+            self.last_error = None
+        _notify(callbacks, False)
+        return dropped
+
+    def close(self):
+        """
+        Stop the age-based flusher and write whatever is still buffered.
+        Raises RuntimeError if the final flush fails, so callers never treat
+        the rows still in the buffer as stored.
+        """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+        with self._lock:
+            unwritten = len(self._buffer) + len(self._outcomes)
+            callbacks, self._callbacks = self._callbacks, []
+        _notify(callbacks, False)
+        if unwritten:
+            raise RuntimeError(
+                f"Could not write {unwritten} buffered flight rows and outcomes: {self.last_error}"
+            ) from self.last_error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _flush_aged(self):
+        """Background loop that flushes the buffer once it gets too old"""
+        interval = max(self.max_age_seconds / 2, 0.1)
+        while not self._closed.wait(interval):
+            with self._lock:
+                aged = (
+                    self._oldest is not None
+                    and time.monotonic() - self._oldest >= self.max_age_seconds
+                )
+            if aged:
+                self.flush()
+
+def _notify(callbacks, written: bool):
+    """Run add_many callbacks outside the writer's locks"""
+    for callback in callbacks:
+        try:
+            callback(written)
+        except Exception as e:
+            print(f"Error in flight writer callback: {e}")
+
+_writer: Optional[FlightBatchWriter] = None
+_writer_lock = threading.Lock()
+
+def get_flight_writer() -> FlightBatchWriter:
+    """Return the process-wide writer, flushed automatically at interpreter exit"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = FlightBatchWriter()
+            atexit.register(_writer.close)
+        return _writer
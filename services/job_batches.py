@@ -0,0 +1,43 @@
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+from .resilience import FlightFetchError, TransientFetchError, classify_error
+
+__all__ = ['collect_results', 'settle_batch', 'queue_drained', 'needs_refresh']
+
+JobFailure = Tuple[int, FlightFetchError]
+
+def collect_results(futures: Dict[int, Future]) -> Tuple[List[int], List[JobFailure]]:
+    """Wait for every job's fetch. Returns the succeeded job ids and the failures."""
+    succeeded, failed = [], []
+    for job_id, future in futures.items():
+        try:
+            future.result()
+            succeeded.append(job_id)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            failed.append((job_id, classify_error(e)))
+    return succeeded, failed
+
+def settle_batch(succeeded: List[int], failed: List[JobFailure],
+                 flush_error: Optional[Exception]) -> Tuple[List[int], List[JobFailure]]:
+    """
+    Jobs to mark done and jobs to fail or requeue once the batch's flush is
+    known. When the flush failed nothing is done: the rows of the succeeded
+    jobs were dropped, so they are requeued with a transient error.
+    """
+    if flush_error is None:
+        return list(succeeded), list(failed)
+    error = TransientFetchError(f"Could not write results: {flush_error}")
+    return [], list(failed) + [(job_id, error) for job_id in succeeded]
+
+def queue_drained(counts: Dict[str, int]) -> bool:
+    """Whether no job is waiting or running"""
+    return not counts.get('queued') and not counts.get('running')
+
+def needs_refresh(counts: Dict[str, int], refreshed_through: Optional[int]) -> bool:
+    """
+    Whether a drained queue has finished jobs the views have not seen yet.
+    Done is a final status, so the number of done jobs, from any worker,
+    only grows; `refreshed_through` is that number at the last refresh.
+    """
+    return queue_drained(counts) and counts.get('done', 0) != refreshed_through
@@ -0,0 +1,249 @@
+import functools
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+__all__ = [
+    'MetricsRegistry',
+    'Counter',
+    'Histogram',
+    'Timer',
+    'counter',
+    'histogram',
+    'timer',
+    'snapshot',
+    'to_prometheus',
+    'write_snapshot',
+    'get_registry'
+]
+
+PREFIX = 'rfb_'
+
+# Upper bounds in seconds, from a cached lookup to a slow view refresh
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Counter:
+    """A value that only goes up"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def sample(self) -> dict:
+        return {'value': self.value}
+
+class Histogram:
+    """Count, sum, min, max and bucket counts of observed values"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.bucket_counts[index] += 1
+                    break
+
+    def sample(self) -> dict:
+        with self._lock:
+            return {
+                'count': self.count,
+                'sum': self.sum,
+                'mean': self.sum / self.count if self.count else None,
+                'min': self.min if self.count else None,
+                'max': self.max if self.count else None,
+                'buckets': dict(zip(map(str, self.buckets), self.bucket_counts))
+            }
+
+    def cumulative_buckets(self):
+        """(upper bound, count of values <= bound) pairs, ending with +Inf"""
+        with self._lock:
+            total = 0
+            pairs = []
+            for bound, count in zip(self.buckets, self.bucket_counts):
+                total += count
+                pairs.append((bound, total))
+            pairs.append((math.inf, self.count))
+            return pairs
+
+class Timer:
+    """
+    Record elapsed seconds into a histogram, as a context manager
+
+        with metrics.timer('view_refresh_seconds', view=view):
+            ...
+
+    or as a decorator, which times every call separately.
+    """
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self._start: Optional[float] = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self._start)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Timer(self.histogram):
+                return func(*args, **kwargs)
+        return wrapper
+
+class MetricsRegistry:
+    """
+    Named counters and histograms, each split by label values.
+
+    Everything lives in process memory; snapshot() and to_prometheus()
+    export the current values, e.g. at the end of a scheduler run.
+    """
+
+    def __init__(self, prefix: str = PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._families: Dict[str, dict] = {}
+
+    def counter(self, name: str, help: str = '', **labels) -> Counter:
+        return self._metric(name, 'counter', help, labels, Counter)
+
+    def histogram(self, name: str, help: str = '', buckets: Sequence[float] = DEFAULT_BUCKETS,
+                  **labels) -> Histogram:
+        return self._metric(name, 'histogram', help, labels, lambda: Histogram(buckets))
+
+    def timer(self, name: str, help: str = '', **labels) -> Timer:
+        return Timer(self.histogram(name, help, **labels))
+
+    def _metric(self, name, kind, help, labels, factory):
+        key: Labels = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = {'type': kind, 'help': help, 'metrics': {}}
+            elif family['type'] != kind:
+                raise ValueError(f"Metric {name} is a {family['type']}, not a {kind}")
+            metric = family['metrics'].get(key)
+            if metric is None:
+                metric = family['metrics'][key] = factory()
+            return metric
+
+    def snapshot(self) -> dict:
+        """Every metric's current value as plain JSON-ready data"""
+        with self._lock:
+            families = {name: dict(family, metrics=dict(family['metrics']))
+                        for name, family in self._families.items()}
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'metrics': {
+                self.prefix + name: {
+                    'type': family['type'],
+                    'help': family['help'],
+                    'samples': [
+                        dict(metric.sample(), labels=dict(labels))
+                        for labels, metric in sorted(family['metrics'].items())
+                    ]
+                }
+                for name, family in sorted(families.items())
+            }
+        }
+
+    def to_prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format"""
+        with self._lock:
+            families = {name: dict(family, metrics=dict(family['metrics']))
+                        for name, family in self._families.items()}
+        lines = []
+        for name, family in sorted(families.items()):
+            full_name = self.prefix + name
+            if family['help']:
+                lines.append(f"# HELP {full_name} {family['help']}")
+            lines.append(f"# TYPE {full_name} {family['type']}")
+            for labels, metric in sorted(family['metrics'].items()):
+                if family['type'] == 'counter':
+                    lines.append(f"{full_name}{_format_labels(labels)} {_format_value(metric.value)}")
+                    continue
+                for bound, count in metric.cumulative_buckets():
+                    le = '+Inf' if bound == math.inf else _format_value(bound)
+                    lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', le),))} {count}")
+                lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(metric.sum)}")
+                lines.append(f"{full_name}_count{_format_labels(labels)} {metric.count}")
+        return '\n'.join(lines) + '\n'
+
+    def write_snapshot(self, path: str):
+        """Write the metrics to `path`: Prometheus text for .prom files, JSON otherwise"""
+        content = (self.to_prometheus() if path.endswith('.prom')
+                   else json.dumps(self.snapshot(), indent=2))
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Replace atomically so a scraper never reads a half-written file
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as f:
+            f.write(content)
+        os.replace(temporary, path)
+
+    def reset(self):
+        with self._lock:
+            self._families.clear()
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+_registry = MetricsRegistry()
+
+def get_registry() -> MetricsRegistry:
+    """Return the process-wide registry every service records into"""
+    return _registry
+
+def counter(name: str, help: str = '', **labels) -> Counter:
+    return _registry.counter(name, help, **labels)
+
+def histogram(name: str, help: str = '', **labels) -> Histogram:
+    return _registry.histogram(name, help, **labels)
+
+def timer(name: str, help: str = '', **labels) -> Timer:
+    return _registry.timer(name, help, **labels)
+
+def snapshot() -> dict:
+    return _registry.snapshot()
+
+def to_prometheus() -> str:
+    return _registry.to_prometheus()
+
+def write_snapshot(path: Optional[str] = None) -> str:
+    """Write the process-wide metrics to `path` (RFB_METRICS_FILE by default)"""
+    path = path or os.getenv('RFB_METRICS_FILE', 'rfb_metrics.json')
+    _registry.write_snapshot(path)
+    return path
@@ -0,0 +1,112 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Iterable, NamedTuple, Optional
+from . import flight_parser
+
+__all__ = ['FlightObservation', 'SearchOutcome']
+
+class FlightObservation(NamedTuple):
+    """
+    One itinerary seen by one search, already typed.
+
+    Fields are in flight_searches insert order, so an observation is its own
+    insert parameter tuple. As a tuple it carries no per-row dict, which
+    keeps memory flat when every option of thousands of searches is held.
+    """
+    query_time: datetime
+    from_airport: str
+    to_airport: str
+    trip: str
+    seat: str
+    airline_name: Optional[str] = None
+    departure: Optional[datetime] = None
+    arrival: Optional[datetime] = None
+    duration: Optional[timedelta] = None
+    stops: Optional[int] = None
+    price: Optional[Decimal] = None
+    is_best: bool = False
+    arrival_time_ahead: Optional[str] = None
+    delay: Optional[int] = None
+    search_id: Optional[str] = None
+    option_rank: Optional[int] = None
+
+    @classmethod
+    def from_flight(cls, flight, query_time: datetime, from_airport: str, to_airport: str,
+                    trip: str, seat: str, search_id: str, rank: int) -> 'FlightObservation':
+        """Parse one fast_flights Flight relative to the time it was fetched"""
+        return cls(query_time, from_airport, to_airport, trip, seat,
+                   **flight_parser.parse_flight(flight, query_time),
+                   search_id=search_id, option_rank=rank)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'FlightObservation':
+        """
+        Build an observation from a mapping, accepting the older 'name' key
+        and raw fast_flights strings, which are parsed relative to query_time.
+        """
+        query_time = data['query_time']
+        if not isinstance(query_time, datetime):
+            query_time = datetime.fromisoformat(str(query_time))
+        return cls(
+            query_time=query_time,
+            from_airport=data['from_airport'],
+            to_airport=data['to_airport'],
+            trip=data['trip'],
+            seat=data['seat'],
+            airline_name=data.get('airline_name', data.get('name')),
+            departure=flight_parser.parse_flight_time(data.get('departure'), query_time),
+            arrival=flight_parser.parse_flight_time(data.get('arrival'), query_time),
+            duration=flight_parser.parse_duration(data.get('duration')),
+            stops=flight_parser.parse_stops(data.get('stops')),
+            price=flight_parser.parse_price(data.get('price')),
+            is_best=bool(data.get('is_best')),
+            arrival_time_ahead=data.get('arrival_time_ahead') or None,
+            delay=data.get('delay'),
+            search_id=data.get('search_id'),
+            option_rank=data.get('option_rank')
+        )
+
+    @classmethod
+    def coerce(cls, value) -> 'FlightObservation':
+        """Return `value` unchanged if it is an observation, else convert it"""
+        return value if isinstance(value, cls) else cls.from_dict(value)
+
+    @property
+    def has_itinerary(self) -> bool:
+        """False for the placeholder returned when a search found no flights"""
+        return self.option_rank is not None or self.airline_name is not None
+
+    def to_display_dict(self) -> dict:
+        """Fields that have a value, for printing"""
+        return {key: value for key, value in zip(self._fields, self) if value is not None}
+
+class SearchOutcome(NamedTuple):
+    """
+    One fetched search, recorded in search_outcomes whether or not it found
+    flights. Fields are in insert order, like FlightObservation.
+    """
+    search_id: Optional[str]
+    query_time: datetime
+    from_airport: str
+    to_airport: str
+    departure_date: date
+    trip: str
+    seat: str
+    options_found: int
+
+    @classmethod
+    def from_observations(cls, observations: Iterable[FlightObservation],
+                          departure_date) -> 'SearchOutcome':
+        """Summarize the observations of one search for the requested departure date"""
+        observations = list(observations)
+        first = observations[0]
+        if not isinstance(departure_date, date):
+            departure_date = date.fromisoformat(str(departure_date))
+        return cls(first.search_id, first.query_time, first.from_airport, first.to_airport,
+                   departure_date, first.trip, first.seat,
+                   sum(1 for observation in observations if observation.has_itinerary))
+
+def observations_to_frame(observations: Iterable[FlightObservation]):
+    """Load observations into a pandas DataFrame with one column per field"""
+    import pandas as pd
+    return pd.DataFrame.from_records(list(observations), columns=FlightObservation._fields)
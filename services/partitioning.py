@@ -0,0 +1,99 @@
+import os
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Tuple
+
+PARTITION_INTERVALS = ('week', 'month', 'year')
+DEFAULT_PARTITION_INTERVAL = 'month'
+
+def get_partition_interval() -> str:
+    """Partition width for flight_searches, from FLIGHT_PARTITION_INTERVAL"""
+    interval = os.getenv('FLIGHT_PARTITION_INTERVAL', DEFAULT_PARTITION_INTERVAL).lower()
+    if interval not in PARTITION_INTERVALS:
+        raise ValueError(
+            f"FLIGHT_PARTITION_INTERVAL must be one of {', '.join(PARTITION_INTERVALS)}, got {interval!r}"
+        )
+    return interval
+
+def partition_start(moment: datetime, interval: str) -> datetime:
+    """Start of the partition containing `moment`"""
+    day = datetime(moment.year, moment.month, moment.day)
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+def next_partition_start(start: datetime, interval: str) -> datetime:
+    """Start of the partition following the one starting at `start`"""
+    if interval == 'week':
+        return start + timedelta(days=7)
+    if interval == 'month':
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+    return start.replace(year=start.year + 1)
+
+def partition_name(table: str, start: datetime, interval: str) -> str:
+    """Name of the partition starting at `start`, e.g. flight_searches_p2025_03"""
+    if interval == 'week':
+        iso_year, iso_week, _ = start.isocalendar()
+        return f"{table}_p{iso_year}w{iso_week:02d}"
+    if interval == 'month':
+        return f"{table}_p{start.year}_{start.month:02d}"
+    return f"{table}_p{start.year}"
+
+def partition_ranges(first: datetime, last: datetime,
+                     interval: str) -> Iterator[Tuple[datetime, datetime]]:
+    """Yield the (start, end) bounds of every partition overlapping [first, last]"""
+    start = partition_start(first, interval)
+    while start <= last:
+        end = next_partition_start(start, interval)
+        yield start, end
+        start = end
+
+def is_partitioned(cur, table: str = 'flight_searches') -> bool:
+    """Whether `table` is a declaratively partitioned table"""
+    cur.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = %s
+        )
+    """, (table,))
+    return cur.fetchone()[0]
+
+def ensure_partitions(cur, first: datetime, last: datetime,
+                      interval: Optional[str] = None, table: str = 'flight_searches') -> int:
+    """
+    Create any missing range partitions of `table` covering [first, last].
+
+    Rows that already landed in the default partition for a new range are
+    moved into the new partition before it is attached, since Postgres
+    refuses to attach a range the default partition already holds rows for.
+    Returns the number of partitions created.
+    """
+    interval = interval or get_partition_interval()
+    created = 0
+    for start, end in partition_ranges(first, last, interval):
+        name = partition_name(table, start, interval)
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+        if cur.fetchone()[0]:
+            continue
+        cur.execute(f"""
+            CREATE TABLE {name}
+            (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        """)
+        cur.execute(f"""
+            WITH moved AS (
+                DELETE FROM {table}_default
+                WHERE query_time >= %(start)s AND query_time < %(end)s
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, {'start': start, 'end': end})
+        cur.execute(f"""
+            ALTER TABLE {table} ATTACH PARTITION {name}
+            FOR VALUES FROM (%(start)s) TO (%(end)s)
+        """, {'start': start, 'end': end})
+        created += 1
+    return created
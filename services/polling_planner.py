@@ -0,0 +1,148 @@
+import heapq
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from .configuration_service import FlightConfiguration
+
+__all__ = ['PollStats', 'poll_interval', 'plan_polls']
+
+# Polling interval bounds: a departure next week that keeps moving is
+# re-checked every MIN_INTERVAL, a quiet one six months out every MAX_INTERVAL
+MIN_INTERVAL = timedelta(hours=6)
+MAX_INTERVAL = timedelta(days=7)
+HORIZON_DAYS = 180
+
+# How strongly price movement shortens the interval: a combined relative
+# movement of 10% halves it
+MOVEMENT_SENSITIVITY = 10.0
+
+# Days of search history used to judge how much a price moves
+STATS_WINDOW_DAYS = 14
+
+RouteDay = Tuple[str, str, date]
+
+@dataclass
+class PollStats:
+    """Observed behaviour of one (route, departure date)"""
+    volatility: float = 0.0  # relative spread of the best price, intraday and day to day
+    swing: float = 0.0       # relative daily swing of the best price
+    last_polled: Optional[datetime] = None
+
+def poll_interval(days_to_departure: int, volatility: float = 0.0, swing: float = 0.0) -> timedelta:
+    """
+    Time to wait before polling a departure again.
+
+    The base interval grows linearly from MIN_INTERVAL for imminent
+    departures to MAX_INTERVAL at HORIZON_DAYS out, and is divided by
+    1 + MOVEMENT_SENSITIVITY * (volatility + swing), so prices that move
+    are checked more often.
+    """
+    proximity = min(max(days_to_departure, 0), HORIZON_DAYS) / HORIZON_DAYS
+    base = MIN_INTERVAL + (MAX_INTERVAL - MIN_INTERVAL) * proximity
+    movement = max(volatility, 0.0) + max(swing, 0.0)
+    return max(MIN_INTERVAL, base / (1 + MOVEMENT_SENSITIVITY * movement))
+
+def load_poll_stats(conn, route_days: Iterable[RouteDay]) -> Dict[RouteDay, PollStats]:
+    """
+    Read price movement and the last poll time for the given (route,
+    departure date) pairs.
+
+    Movement is measured on the best price of each search (its cheapest
+    option), so storing every itinerary does not count the spread between
+    itineraries as movement: volatility is the average intraday standard
+    deviation plus the day-to-day variation of the daily average, swing the
+    average intraday range, both relative to the price. The last poll time
+    comes from search_outcomes and is keyed by the requested departure
+    date, so searches that found nothing count as polls too.
+    """
+    route_days = set(route_days)
+    if not route_days:
+        return {}
+    routes = tuple({(origin, destination) for origin, destination, _ in route_days})
+    first = min(day for _, _, day in route_days)
+    last = max(day for _, _, day in route_days)
+    params = {'routes': routes, 'first': first, 'last': last,
+              'end': last + timedelta(days=1), 'window': STATS_WINDOW_DAYS}
+    stats: Dict[RouteDay, PollStats] = {}
+    with conn.cursor() as cur:
+        cur.execute("""
+            WITH best AS (
+                SELECT from_airport, to_airport, DATE(departure) AS departure_date,
+                       DATE(query_time) AS day, MIN(price) AS price
+                FROM flight_searches
+                WHERE (from_airport, to_airport) IN %(routes)s
+                  AND departure >= %(first)s AND departure < %(end)s
+                  AND query_time >= CURRENT_DATE - %(window)s
+                  AND price IS NOT NULL
+                GROUP BY from_airport, to_airport, DATE(departure), query_time
+            ), daily AS (
+                SELECT from_airport, to_airport, departure_date,
+                       AVG(price) AS avg_price,
+                       STDDEV(price) AS volatility,
+                       MAX(price) - MIN(price) AS swing
+                FROM best
+                GROUP BY from_airport, to_airport, departure_date, day
+            )
+            SELECT
+                from_airport, to_airport, departure_date,
+                COALESCE(AVG(volatility / NULLIF(avg_price, 0)), 0)
+                    + COALESCE(STDDEV(avg_price) / NULLIF(AVG(avg_price), 0), 0),
+                COALESCE(AVG(swing / NULLIF(avg_price, 0)), 0)
+            FROM daily
+            GROUP BY from_airport, to_airport, departure_date
+        """, params)
+        for origin, destination, day, volatility, swing in cur.fetchall():
+            stats[(origin, destination, day)] = PollStats(float(volatility), float(swing))
+
+        cur.execute("""
+            SELECT from_airport, to_airport, departure_date, MAX(query_time)
+            FROM search_outcomes
+            WHERE (from_airport, to_airport) IN %(routes)s
+              AND departure_date BETWEEN %(first)s AND %(last)s
+            GROUP BY from_airport, to_airport, departure_date
+        """, params)
+        for origin, destination, day, last_polled in cur.fetchall():
+            stats.setdefault((origin, destination, day), PollStats()).last_polled = last_polled
+    conn.rollback()
+    return stats
+
+def plan_polls(configs: Iterable[FlightConfiguration], budget: int,
+               now: Optional[datetime] = None,
+               stats: Optional[Dict[RouteDay, PollStats]] = None) -> List[FlightConfiguration]:
+    """
+    Choose at most `budget` configurations to fetch now.
+
+    Every configuration gets a due time of its last poll plus
+    poll_interval(); never-polled ones are due immediately. Due
+    configurations come off a priority queue most-overdue first (relative
+    to their interval), so a fixed budget goes to the departures most
+    likely to have changed. Configurations not yet due are left for a
+    later run.
+    """
+    now = now or datetime.now()
+    configs = list(configs)
+    if stats is None:
+        # Imported here so planning with given stats works without psycopg2
+        from .database_connection import get_connection
+        from .flight_database import ensure_flights_table
+        route_days = {(c.from_airport, c.to_airport, date.fromisoformat(c.date)) for c in configs}
+        with get_connection() as conn:
+            ensure_flights_table(conn)
+            stats = load_poll_stats(conn, route_days)
+
+    queue = []
+    for index, config in enumerate(configs):
+        departure = date.fromisoformat(config.date)
+        observed = stats.get((config.from_airport, config.to_airport, departure), PollStats())
+        interval = poll_interval((departure - now.date()).days, observed.volatility, observed.swing)
+        if observed.last_polled is None:
+            overdue = float('inf')
+        else:
+            due = observed.last_polled + interval
+            if due > now:
+                continue
+            overdue = (now - due) / interval
+        # Ties (e.g. never polled) go to the nearest departure first
+        heapq.heappush(queue, (-overdue, departure, index, config))
+
+    return [heapq.heappop(queue)[-1] for _ in range(min(budget, len(queue)))]
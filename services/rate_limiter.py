@@ -0,0 +1,37 @@
+import threading
+import time
+from typing import Optional
+
+__all__ = ['RateLimiter']
+
+class RateLimiter:
+    """
+    Thread-safe global requests-per-second cap.
+
+    Each call to acquire() reserves the next free slot on a fixed interval
+    and sleeps until that slot arrives, so callers on any number of threads
+    never exceed `requests_per_second` combined.
+    """
+
+    def __init__(self, requests_per_second: Optional[float] = None):
+        if requests_per_second is not None and requests_per_second <= 0:
+            raise ValueError("requests_per_second must be positive")
+        self.requests_per_second = requests_per_second
+        self._interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def acquire(self, stop: Optional[threading.Event] = None):
+        """Block until the caller may issue its next request, or `stop` is set"""
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        wait = slot - now
+        if wait > 0:
+            if stop is not None:
+                stop.wait(wait)
+            else:
+                time.sleep(wait)
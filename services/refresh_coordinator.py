@@ -0,0 +1,162 @@
+import atexit
+import os
+import threading
+from typing import List, Optional
+from .analysis_views import ANALYSIS_VIEWS, ViewRefreshResult, refresh_analysis_views
+from .database_connection import create_connection
+from .rollup_tables import rollup_generation
+
+__all__ = ['RefreshCoordinator', 'get_refresh_coordinator']
+
+# Key for the session-level advisory lock that serializes refreshes
+# across every process sharing the database
+REFRESH_LOCK_KEY = 7_140_211
+
+class RefreshCoordinator:
+    """
+    Refresh the analysis views only when there is something new to show.
+
+    New rows are first folded into the rollup tables, which bumps the
+    rollup generation whenever anything was committed since. Each
+    materialized view records the generation it was refreshed at in
+    view_refresh_state and is skipped until the generation moves on.
+    Refreshes from every process are serialized with an advisory lock held
+    on a dedicated connection, so a caller that waited for another
+    process's refresh usually finds nothing left to do, and waiting never
+    ties up a pooled connection the refresh itself needs.
+
+    request_refresh() additionally merges every request made within
+    `debounce_seconds` (RFB_REFRESH_DEBOUNCE, default 30) into a single
+    refresh, and flush() runs a pending one right away. view_refresh_state
+    is created by create_analysis_views (init-db).
+    """
+
+    def __init__(self, concurrently: bool = True, debounce_seconds: Optional[float] = None):
+        self.concurrently = concurrently
+        self.debounce_seconds = debounce_seconds if debounce_seconds is not None else float(
+            os.getenv('RFB_REFRESH_DEBOUNCE', '30'))
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()  # held while a debounced refresh runs
+        self._timer: Optional[threading.Timer] = None
+        self.last_results: List[ViewRefreshResult] = []
+
+    def refresh_if_needed(self, force: bool = False) -> List[ViewRefreshResult]:
+        """Refresh every view with new rows now (or every view with force)"""
+        conn = create_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_lock(%s)", (REFRESH_LOCK_KEY,))
+            try:
+                results = refresh_analysis_views(conn, views=[])
+                generation = rollup_generation(conn)
+                marks = self._view_marks(conn)
+                conn.commit()
+                stale = [
+                    view for view in ANALYSIS_VIEWS
+                    if force or marks.get(view, -1) < generation
+                ]
+                if stale:
+                    refreshed = refresh_analysis_views(
+                        concurrently=self.concurrently,
+                        views=stale,
+                        rollups=False
+                    )
+                    self._record_marks(conn, [r.view for r in refreshed if r.success], generation)
+                    results += refreshed
+                results += [
+                    ViewRefreshResult(view, True, 0.0, skipped=True)
+                    for view in ANALYSIS_VIEWS if view not in stale
+                ]
+            finally:
+                conn.rollback()
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (REFRESH_LOCK_KEY,))
+                conn.commit()
+        finally:
+            conn.close()
+
+        self.last_results = results
+        return results
+
+    def request_refresh(self):
+        """
+        Ask for a refresh without waiting for it. The first request starts
+        the debounce window; every request made before it closes is served
+        by the same refresh.
+        """
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.debounce_seconds, self._run_pending)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> List[ViewRefreshResult]:
+        """
+        Run a pending debounced refresh now, or wait for one that already
+        started. Returns the results of the refresh run here, if any.
+        """
+        with self._pending_lock:
+            with self._lock:
+                timer, self._timer = self._timer, None
+            if timer is None:
+                return []
+            timer.cancel()
+            return self.refresh_if_needed()
+
+    def _run_pending(self):
+        with self._pending_lock:
+            with self._lock:
+                if self._timer is not threading.current_thread():
+                    return  # flushed in the meantime
+                self._timer = None
+            try:
+                _report_failures(self.refresh_if_needed())
+            except Exception as e:
+                print(f"Error during debounced refresh: {e}")
+
+    @staticmethod
+    def _view_marks(conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT view_name, rollup_generation FROM view_refresh_state")
+            return dict(cur.fetchall())
+
+    @staticmethod
+    def _record_marks(conn, views, generation):
+        if not views:
+            return
+        with conn.cursor() as cur:
+            for view in views:
+                cur.execute("""
+                    INSERT INTO view_refresh_state (view_name, rollup_generation, refreshed_at)
+                    VALUES (%s, %s, CURRENT_TIMESTAMP)
+                    ON CONFLICT (view_name) DO UPDATE SET
+                        rollup_generation = EXCLUDED.rollup_generation,
+                        refreshed_at = EXCLUDED.refreshed_at
+                """, (view, generation))
+        conn.commit()
+
+_coordinator: Optional[RefreshCoordinator] = None
+_coordinator_lock = threading.Lock()
+
+def _report_failures(results: List[ViewRefreshResult]):
+    for result in results:
+        if not result.success:
+            print(f"Error refreshing {result.view}: {result.error}")
+
+def _flush_at_exit(coordinator: RefreshCoordinator):
+    try:
+        _report_failures(coordinator.flush())
+    except Exception as e:
+        print(f"Error during debounced refresh: {e}")
+
+def get_refresh_coordinator() -> RefreshCoordinator:
+    """
+    Return the process-wide coordinator so debounced requests are merged.
+    A refresh still pending at interpreter exit runs before it exits.
+    """
+    global _coordinator
+    with _coordinator_lock:
+        if _coordinator is None:
+            _coordinator = RefreshCoordinator()
+            atexit.register(_flush_at_exit, _coordinator)
+        return _coordinator
@@ -0,0 +1,203 @@
+import os
+import random
+import re
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+__all__ = [
+    'FlightFetchError',
+    'TransientFetchError',
+    'PermanentFetchError',
+    'NoFlightsFound',
+    'FetchCancelled',
+    'classify_error',
+    'CircuitBreaker',
+    'get_circuit_breaker',
+    'call_with_retry'
+]
+
+T = TypeVar('T')
+
+class FlightFetchError(Exception):
+    """A fast_flights call failed; `transient` tells whether retrying can help"""
+    transient = False
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class TransientFetchError(FlightFetchError):
+    """Rate limiting, server errors, timeouts and dropped connections"""
+    transient = True
+
+class PermanentFetchError(FlightFetchError):
+    """Rejected requests and bad input; the same call will fail again"""
+
+class NoFlightsFound(FlightFetchError):
+    """Google Flights answered, but without any itineraries for the search"""
+
+class FetchCancelled(FlightFetchError):
+    """The caller was stopped while waiting to call, or retry, the upstream"""
+
+# fast_flights asserts on the HTTP status with "<status> Result: <body>"
+_STATUS = re.compile(r'^\s*(\d{3})\b')
+_TRANSIENT_MESSAGES = ('timed out', 'timeout', 'connection', 'error sending request',
+                       'temporarily', 'reset by peer')
+
+def classify_error(error: BaseException) -> FlightFetchError:
+    """Map an exception raised by fast_flights onto the FlightFetchError hierarchy"""
+    if isinstance(error, FlightFetchError):
+        return error
+    message = str(error)
+    if isinstance(error, RuntimeError) and 'no flights found' in message.lower():
+        return NoFlightsFound("No flights found")
+    if isinstance(error, AssertionError):
+        match = _STATUS.match(message)
+        if match:
+            status = int(match.group(1))
+            summary = f"Google Flights returned HTTP {status}"
+            if status == 429 or status >= 500:
+                return TransientFetchError(summary, status)
+            return PermanentFetchError(summary, status)
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return TransientFetchError(message or type(error).__name__)
+    if isinstance(error, (TypeError, ValueError)):
+        return PermanentFetchError(message)
+    if any(fragment in message.lower() for fragment in _TRANSIENT_MESSAGES):
+        return TransientFetchError(message)
+    return PermanentFetchError(f"{type(error).__name__}: {message}")
+
+class CircuitBreaker:
+    """
+    Stop calling an upstream that keeps failing.
+
+    After `failure_threshold` consecutive transient failures the circuit
+    opens and before_call() blocks every caller. When `reset_timeout` has
+    passed a single probe call is let through: success closes the circuit
+    and releases everyone, failure reopens it with the timeout doubled (up
+    to `max_reset_timeout`). Shared by all threads, so a whole batch pauses
+    together instead of spending its slots on requests that cannot succeed.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 max_reset_timeout: float = 600.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._condition = threading.Condition()
+        self._failures = 0
+        self._opened_until: Optional[float] = None
+        self._current_timeout = reset_timeout
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._condition:
+            if self._opened_until is None:
+                return 'closed'
+            return 'half-open' if self._probing else 'open'
+
+    def before_call(self, stop: Optional[threading.Event] = None):
+        """
+        Block until the caller may call the upstream. Raises FetchCancelled
+        if `stop` is set while waiting.
+        """
+        with self._condition:
+            while self._opened_until is not None:
+                if stop is not None and stop.is_set():
+                    raise FetchCancelled("Stopped while the circuit breaker was open")
+                remaining = self._opened_until - time.monotonic()
+                if remaining <= 0 and not self._probing:
+                    self._probing = True  # this caller is the probe
+                    return
+                # Wake at least once a second to notice `stop`
+                self._condition.wait(min(remaining, 1.0) if remaining > 0 else 1.0)
+
+    def record_success(self):
+        with self._condition:
+            if self._opened_until is not None:
+                print("Upstream recovered, closing circuit breaker")
+            self._failures = 0
+            self._opened_until = None
+            self._probing = False
+            self._current_timeout = self.reset_timeout
+            self._condition.notify_all()
+
+    def record_failure(self):
+        with self._condition:
+            self._failures += 1
+            if self._probing:
+                self._current_timeout = min(self._current_timeout * 2, self.max_reset_timeout)
+                self._open()
+            elif self._opened_until is None and self._failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self._probing = False
+        self._opened_until = time.monotonic() + self._current_timeout
+        print(f"Circuit breaker open after {self._failures} failures; "
+              f"probing again in {self._current_timeout:.0f}s")
+        self._condition.notify_all()
+
+_breaker: Optional[CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Return the process-wide breaker guarding fast_flights"""
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(
+                failure_threshold=int(os.getenv('RFB_BREAKER_THRESHOLD', '5')),
+                reset_timeout=float(os.getenv('RFB_BREAKER_RESET', '30'))
+            )
+        return _breaker
+
+def call_with_retry(func: Callable[[], T], attempts: int = 4, base_delay: float = 2.0,
+                    max_delay: float = 60.0, breaker: Optional[CircuitBreaker] = None,
+                    before_attempt: Optional[Callable[[], None]] = None,
+                    stop: Optional[threading.Event] = None) -> T:
+    """
+    Call `func`, retrying transient failures with full-jitter exponential
+    backoff (a random wait of up to base_delay * 2**n, capped at max_delay).
+
+    Every attempt first passes the circuit breaker and then
+    `before_attempt` (e.g. a rate limiter's acquire). Errors are raised as
+    FlightFetchError subclasses; NoFlightsFound counts as a healthy answer.
+    Setting `stop` cuts short the breaker wait and the backoff, raising
+    FetchCancelled instead of calling `func` again.
+    """
+    for attempt in range(attempts):
+        if breaker is not None:
+            breaker.before_call(stop)
+        if before_attempt is not None:
+            before_attempt()
+        if stop is not None and stop.is_set():
+            raise FetchCancelled("Stopped before calling the upstream")
+        try:
+            result = func()
+        except (KeyboardInterrupt, SystemExit):
+            if breaker is not None:
+                breaker.record_failure()  # never leave a probe unanswered
+            raise
+        except Exception as e:
+            error = classify_error(e)
+            if breaker is not None:
+                if error.transient:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            if not error.transient or attempt == attempts - 1:
+                raise error from e
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"Transient error ({error}); retrying in {delay:.1f}s "
+                  f"[attempt {attempt + 2}/{attempts}]")
+            if stop is not None:
+                stop.wait(delay)
+            else:
+                time.sleep(delay)
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+__all__ = ['FlightResultCache', 'get_result_cache', 'passenger_counts']
+
+PASSENGER_FIELDS = ('adults', 'children', 'infants_in_seat', 'infants_on_lap')
+
+def passenger_counts(passengers) -> List[int]:
+    """
+    Party size of a fast_flights Passengers as [adults, children,
+    infants_in_seat, infants_on_lap]. fast_flights 2.x keeps the counts
+    only in its `_data` tuple; objects with named counts work too.
+    """
+    data = getattr(passengers, '_data', None)
+    if data is None:
+        data = [getattr(passengers, name, 0) for name in PASSENGER_FIELDS]
+    return [int(count) for count in data]
+
+# Bumped whenever the cached value changes shape, so old entries are ignored
+CACHE_FORMAT = 3
+
+class FlightResultCache:
+    """
+    Disk-backed TTL cache of parsed search results (FlightObservation tuples).
+
+    Entries live in a small SQLite file so the CLI, the dashboard and batch
+    runs share them across processes. Entries expire after `ttl_seconds`,
+    and once more than `max_entries` are stored the least recently used
+    ones are evicted. Hit, miss and eviction counts are kept in the same
+    file.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.path = path or os.getenv('RFB_CACHE_PATH', '.rfb_cache.sqlite3')
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv('RFB_CACHE_TTL', '300'))
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv('RFB_CACHE_MAX_ENTRIES', '1000'))
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)"
+            )
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS inflight (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS stats (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def make_key(flight_data, trip, seat, max_stops, passengers, fetch_mode,
+                 all_options=False) -> str:
+        """
+        Stable key for one search request. Whether every option is stored is
+        part of the key: a hit is never stored again, so an answer whose
+        fetcher kept only the best option must not serve an all-options
+        request.
+        """
+        request = {
+            'flights': [
+                [str(fd.date), str(fd.from_airport), str(fd.to_airport)]
+                for fd in flight_data
+            ],
+            'trip': trip,
+            'seat': seat,
+            'max_stops': max_stops,
+            'passengers': passenger_counts(passengers),
+            'fetch_mode': fetch_mode,
+            'all_options': bool(all_options),
+            'format': CACHE_FORMAT
+        }
+        encoded = json.dumps(request, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key, record_stats: bool = True):
+        """Return (result, fetched_at) for a fresh entry, or None"""
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT value, fetched_at FROM entries WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            if row is None:
+                if record_stats:
+                    self._bump('misses')
+                return None
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            if record_stats:
+                self._bump('hits')
+        return pickle.loads(row[0]), datetime.fromtimestamp(row[1])
+
+    def claim(self, key, lease_seconds: float = 120) -> bool:
+        """
+        Mark `key` as being fetched by this process. Returns False while
+        another process holds an unexpired claim on it; a claim this process
+        already holds is renewed.
+        """
+        now = time.time()
+        owner = str(os.getpid())
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM inflight WHERE key = ? AND expires_at <= ?", (key, now))
+            self._db.execute(
+                "INSERT OR IGNORE INTO inflight (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + lease_seconds)
+            )
+            renewed = self._db.execute(
+                "UPDATE inflight SET expires_at = ? WHERE key = ? AND owner = ?",
+                (now + lease_seconds, key, owner)
+            ).rowcount
+        return renewed == 1
+
+    def release(self, key):
+        """Drop this process's claim on `key`"""
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM inflight WHERE key = ? AND owner = ?", (key, str(os.getpid()))
+            )
+
+    def wait_for(self, key, timeout: float = 120, poll_interval: float = 0.5):
+        """
+        Wait for another process's in-flight fetch of `key` to land in the
+        cache. Returns (result, fetched_at), or None if the claim went away
+        or timed out without a result.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            entry = self.get(key, record_stats=False)
+            if entry is not None:
+                return entry
+            with self._lock:
+                claimed = self._db.execute(
+                    "SELECT 1 FROM inflight WHERE key = ? AND expires_at > ?", (key, time.time())
+                ).fetchone()
+            if not claimed:
+                return self.get(key, record_stats=False)
+            time.sleep(poll_interval)
+        return None
+
+    def set(self, key, result, fetched_at: datetime):
+        """Store a result, evicting expired and least recently used entries"""
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        now = time.time()
+        value = pickle.dumps(result)
+        with self._lock, self._db:
+            self._db.execute("""
+                INSERT OR REPLACE INTO entries (key, value, fetched_at, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?)
+            """, (key, value, fetched_at.timestamp(), now + self.ttl_seconds, now))
+            evicted = self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+            evicted += self._db.execute("""
+                DELETE FROM entries WHERE key IN (
+                    SELECT key FROM entries ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,)).rowcount
+            if evicted:
+                self._bump('evictions', evicted)
+
+    def stats(self) -> dict:
+        """Hit, miss and eviction counts plus the current number of entries"""
+        with self._lock:
+            counts = dict(self._db.execute("SELECT name, value FROM stats").fetchall())
+            size = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        hits, misses = counts.get('hits', 0), counts.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'evictions': counts.get('evictions', 0),
+            'entries': size,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+        }
+
+    def clear(self):
+        """Drop every entry and reset the statistics"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM stats")
+
+    def _bump(self, name, amount=1):
+        self._db.execute("""
+            INSERT INTO stats (name, value) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+        """, (name, amount))
+
+_result_cache: Optional[FlightResultCache] = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache() -> FlightResultCache:
+    """Return the process-wide result cache"""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = FlightResultCache()
+        return _result_cache
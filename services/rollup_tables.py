@@ -0,0 +1,610 @@
+ROLLUP_NAME = 'flight_searches_rollups'
+
+ROLLUP_TABLES = [
+    'route_departure_rollup',
+    'route_dow_rollup',
+    'query_date_rollup',
+    'airline_day_rollup',
+    'departure_hour_rollup'
+]
+
+# Plain views reading the rollup tables
+ROLLUP_VIEWS = [
+    'price_history_rollup',
+    'daily_summary_rollup',
+    'route_analysis_rollup',
+    'price_trends_rollup',
+    'airline_competition_rollup',
+    'departure_time_competition_rollup'
+]
+
+# Columns of flight_searches the rollups are computed from
+OUTBOX_COLUMNS = (
+    'from_airport', 'to_airport', 'airline_name', 'departure', 'price', 'stops',
+    'query_time', 'search_id', 'option_rank'
+)
+
+# Rows of `source` belonging to searches stored with all_options, i.e. that
+# stored an option past rank 0. Best-only searches store just their rank 0
+# option, which says nothing about the competition on a route. A window
+# rather than a semi-join keeps this to one pass over the source.
+MULTI_OPTION_ROWS = """(
+    SELECT * FROM (
+        SELECT *, MAX(option_rank) OVER (PARTITION BY search_id) AS search_max_rank
+        FROM {source}
+    ) ranked
+    WHERE search_max_rank > 0
+) options"""
+
+# Rows the rollups can use: placeholders for empty searches and options
+# whose price could not be parsed carry nothing to aggregate
+ROLLUP_ROW_FILTER = """
+    departure IS NOT NULL
+    AND airline_name IS NOT NULL
+    AND price IS NOT NULL
+"""
+
+def create_rollup_tables(conn):
+    """
+    Create the rollup tables, their state row and the views that read them.
+
+    Each rollup holds mergeable aggregates (min, max, sum, sum of squares,
+    count and the latest observation), so new rows are folded in with an
+    upsert instead of rescanning all history. Standard deviation is derived
+    from exact NUMERIC sums, which avoids floating point cancellation.
+
+    New rows reach the rollups through rollup_outbox, which a statement
+    trigger on flight_searches fills in the inserting transaction. Rollup
+    tables missing from an existing database are filled by a rebuild.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT name FROM UNNEST(%s::TEXT[]) AS name WHERE to_regclass(name) IS NULL",
+            (ROLLUP_TABLES,)
+        )
+        missing = [name for (name,) in cur.fetchall()]
+
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name TEXT PRIMARY KEY,
+            generation BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP
+        );
+
+        ALTER TABLE rollup_state ADD COLUMN IF NOT EXISTS generation BIGINT NOT NULL DEFAULT 0;
+
+        INSERT INTO rollup_state (name) VALUES (%s)
+        ON CONFLICT (name) DO NOTHING;
+        """, (ROLLUP_NAME,))
+
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_outbox (
+            from_airport VARCHAR(3) NOT NULL,
+            to_airport VARCHAR(3) NOT NULL,
+            airline_name VARCHAR(50) NOT NULL,
+            departure TIMESTAMP NOT NULL,
+            price DECIMAL(10,2) NOT NULL,
+            stops INTEGER,
+            query_time TIMESTAMP NOT NULL,
+            search_id UUID,
+            option_rank INTEGER
+        );
+        """)
+
+        # Per (route, departure, airline)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS route_departure_rollup (
+            from_airport VARCHAR(3) NOT NULL,
+            to_airport VARCHAR(3) NOT NULL,
+            airline_name VARCHAR(50) NOT NULL,
+            departure TIMESTAMP NOT NULL,
+            min_price DECIMAL(10,2),
+            max_price DECIMAL(10,2),
+            sum_price NUMERIC NOT NULL DEFAULT 0,
+            sum_price_sq NUMERIC NOT NULL DEFAULT 0,
+            price_count BIGINT NOT NULL DEFAULT 0,
+            first_seen TIMESTAMP,
+            last_seen TIMESTAMP,
+            latest_price DECIMAL(10,2),
+            PRIMARY KEY (from_airport, to_airport, airline_name, departure)
+        );
+        """)
+
+        # Per (route, airline, departure day of week)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS route_dow_rollup (
+            from_airport VARCHAR(3) NOT NULL,
+            to_airport VARCHAR(3) NOT NULL,
+            airline_name VARCHAR(50) NOT NULL,
+            day_of_week SMALLINT NOT NULL,
+            min_price DECIMAL(10,2),
+            max_price DECIMAL(10,2),
+            sum_price NUMERIC NOT NULL DEFAULT 0,
+            sum_price_sq NUMERIC NOT NULL DEFAULT 0,
+            sum_stops BIGINT NOT NULL DEFAULT 0,
+            price_count BIGINT NOT NULL DEFAULT 0,
+            latest_price DECIMAL(10,2),
+            latest_query_time TIMESTAMP,
+            PRIMARY KEY (from_airport, to_airport, airline_name, day_of_week)
+        );
+        """)
+
+        # Per (query date, route, departure date, airline)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS query_date_rollup (
+            query_date DATE NOT NULL,
+            from_airport VARCHAR(3) NOT NULL,
+            to_airport VARCHAR(3) NOT NULL,
+            departure_date DATE NOT NULL,
+            airline_name VARCHAR(50) NOT NULL,
+            min_price DECIMAL(10,2),
+            max_price DECIMAL(10,2),
+            sum_price NUMERIC NOT NULL DEFAULT 0,
+            sum_price_sq NUMERIC NOT NULL DEFAULT 0,
+            price_count BIGINT NOT NULL DEFAULT 0,
+            latest_price DECIMAL(10,2),
+            latest_query_time TIMESTAMP,
+            PRIMARY KEY (query_date, from_airport, to_airport, departure_date, airline_name)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_query_date_rollup_route
+        ON query_date_rollup (from_airport, to_airport, departure_date);
+        """)
+
+        # Options per (query date, route, departure date, airline) of searches
+        # that stored every option (MULTI_OPTION_ROWS). Each search's options
+        # are inserted by one statement, so they reach the rollups together
+        # and per-batch distinct search counts add up exactly.
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS airline_day_rollup (
+            query_date DATE NOT NULL,
+            from_airport VARCHAR(3) NOT NULL,
+            to_airport VARCHAR(3) NOT NULL,
+            departure_date DATE NOT NULL,
+            airline_name VARCHAR(50) NOT NULL,
+            option_count BIGINT NOT NULL DEFAULT 0,
+            min_price DECIMAL(10,2),
+            sum_price NUMERIC NOT NULL DEFAULT 0,
+            best_rank INTEGER,
+            search_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (from_airport, to_airport, departure_date, query_date, airline_name)
+        );
+        """)
+
+        # The same options per departure hour, keeping the airline so the
+        # view can count distinct airlines
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS departure_hour_rollup (
+            query_date DATE NOT NULL,
+            from_airport VARCHAR(3) NOT NULL,
+            to_airport VARCHAR(3) NOT NULL,
+            departure_date DATE NOT NULL,
+            departure_hour SMALLINT NOT NULL,
+            airline_name VARCHAR(50) NOT NULL,
+            option_count BIGINT NOT NULL DEFAULT 0,
+            min_price DECIMAL(10,2),
+            sum_price NUMERIC NOT NULL DEFAULT 0,
+            PRIMARY KEY (from_airport, to_airport, departure_date, query_date,
+                         departure_hour, airline_name)
+        );
+        """)
+
+        # Views exposing the rollups with the same columns as the
+        # materialized views they replace
+        cur.execute("""
+        CREATE OR REPLACE VIEW price_history_rollup AS
+        SELECT
+            from_airport,
+            to_airport,
+            airline_name,
+            departure,
+            min_price as lowest_price,
+            max_price as highest_price,
+            sum_price / price_count as avg_price,
+            CASE WHEN price_count > 1 THEN SQRT(GREATEST(
+                (sum_price_sq - sum_price * sum_price / price_count) / (price_count - 1), 0
+            )) END as price_volatility,
+            price_count as price_points,
+            first_seen,
+            last_seen,
+            latest_price
+        FROM route_departure_rollup;
+        """)
+
+        cur.execute("""
+        CREATE OR REPLACE VIEW daily_summary_rollup AS
+        WITH latest_price AS (
+            SELECT DISTINCT ON (from_airport, to_airport, departure_date, airline_name)
+                from_airport,
+                to_airport,
+                departure_date,
+                airline_name,
+                latest_price as current_price
+            FROM query_date_rollup
+            ORDER BY from_airport, to_airport, departure_date, airline_name,
+                     latest_query_time DESC
+        )
+        SELECT
+            q.query_date as date,
+            q.from_airport,
+            q.to_airport,
+            q.departure_date,
+            q.airline_name,
+            q.min_price as min_daily_price,
+            q.max_price as max_daily_price,
+            q.sum_price / q.price_count as avg_daily_price,
+            CASE WHEN q.price_count > 1 THEN SQRT(GREATEST(
+                (q.sum_price_sq - q.sum_price * q.sum_price / q.price_count) / (q.price_count - 1), 0
+            )) END as price_volatility,
+            q.price_count as daily_checks,
+            q.max_price - q.min_price as daily_price_swing,
+            lp.current_price as latest_price
+        FROM query_date_rollup q
+        LEFT JOIN latest_price lp USING (from_airport, to_airport, departure_date, airline_name);
+        """)
+
+        cur.execute("""
+        CREATE OR REPLACE VIEW route_analysis_rollup AS
+        WITH latest_prices AS (
+            SELECT DISTINCT ON (from_airport, to_airport, day_of_week)
+                from_airport,
+                to_airport,
+                day_of_week,
+                latest_price
+            FROM route_dow_rollup
+            ORDER BY from_airport, to_airport, day_of_week, latest_query_time DESC
+        ),
+        days_tracked AS (
+            SELECT
+                from_airport,
+                to_airport,
+                airline_name,
+                EXTRACT(DOW FROM departure)::SMALLINT as day_of_week,
+                COUNT(DISTINCT DATE(departure)) as days_tracked
+            FROM route_departure_rollup
+            GROUP BY from_airport, to_airport, airline_name, EXTRACT(DOW FROM departure)
+        )
+        SELECT
+            r.from_airport,
+            r.to_airport,
+            r.airline_name,
+            r.day_of_week,
+            r.min_price as historical_low,
+            r.max_price as historical_high,
+            lp.latest_price,
+            r.sum_stops::NUMERIC / r.price_count as avg_stops,
+            d.days_tracked,
+            r.price_count as total_searches
+        FROM route_dow_rollup r
+        LEFT JOIN latest_prices lp USING (from_airport, to_airport, day_of_week)
+        LEFT JOIN days_tracked d USING (from_airport, to_airport, airline_name, day_of_week);
+        """)
+
+        cur.execute("""
+        CREATE OR REPLACE VIEW price_trends_rollup AS
+        SELECT
+            query_date,
+            departure_date,
+            from_airport,
+            to_airport,
+            airline_name,
+            min_price
+        FROM query_date_rollup;
+        """)
+
+        cur.execute("""
+        CREATE OR REPLACE VIEW airline_competition_rollup AS
+        SELECT
+            from_airport,
+            to_airport,
+            departure_date,
+            query_date,
+            airline_name,
+            option_count as options_offered,
+            min_price,
+            sum_price / option_count as avg_price,
+            best_rank,
+            search_count as searches
+        FROM airline_day_rollup;
+        """)
+
+        cur.execute("""
+        CREATE OR REPLACE VIEW departure_time_competition_rollup AS
+        SELECT
+            from_airport,
+            to_airport,
+            departure_date,
+            query_date,
+            departure_hour,
+            COUNT(*) as airlines,
+            SUM(option_count)::BIGINT as options_offered,
+            MIN(min_price) as min_price,
+            SUM(sum_price) / SUM(option_count) as avg_price
+        FROM departure_hour_rollup
+        GROUP BY from_airport, to_airport, departure_date, query_date, departure_hour;
+        """)
+
+        _install_outbox_trigger(cur)
+    conn.commit()
+
+    if missing:
+        with conn.cursor() as cur:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM flight_searches)")
+            has_rows = cur.fetchone()[0]
+        conn.rollback()
+        if has_rows:
+            print(f"Filling new rollup tables: {', '.join(missing)}")
+            rebuild_rollups(conn)
+
+def _install_outbox_trigger(cur):
+    """
+    Queue every usable row inserted into flight_searches in rollup_outbox.
+
+    The trigger writes in the inserting transaction, so a row reaches the
+    outbox exactly when it commits, however late that is relative to rows
+    with higher ids. Databases that tracked progress with the old id
+    high-water mark get the rows above it queued once.
+    """
+    cur.execute("""
+    CREATE OR REPLACE FUNCTION queue_rollup_rows() RETURNS TRIGGER
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO rollup_outbox ({columns})
+        SELECT {columns} FROM new_rows
+        WHERE {row_filter};
+        RETURN NULL;
+    END
+    $$;
+    """.format(columns=', '.join(OUTBOX_COLUMNS), row_filter=ROLLUP_ROW_FILTER))
+
+    cur.execute("""
+        SELECT 1 FROM pg_trigger
+        WHERE tgrelid = 'flight_searches'::regclass AND tgname = 'flight_searches_rollup_outbox'
+    """)
+    if cur.fetchone():
+        return
+
+    # No insert may slip in between queueing the backlog and the trigger
+    cur.execute("LOCK TABLE flight_searches IN SHARE ROW EXCLUSIVE MODE")
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'rollup_state' AND column_name = 'last_id'
+    """)
+    if cur.fetchone():
+        cur.execute(f"""
+            INSERT INTO rollup_outbox ({', '.join(OUTBOX_COLUMNS)})
+            SELECT {', '.join(OUTBOX_COLUMNS)} FROM flight_searches
+            WHERE id > (SELECT last_id FROM rollup_state WHERE name = %s)
+                AND {ROLLUP_ROW_FILTER}
+        """, (ROLLUP_NAME,))
+        cur.execute("ALTER TABLE rollup_state DROP COLUMN last_id")
+
+    cur.execute("""
+        CREATE TRIGGER flight_searches_rollup_outbox
+        AFTER INSERT ON flight_searches
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION queue_rollup_rows()
+    """)
+
+def update_rollups(conn):
+    """
+    Fold every flight_searches row committed since the last update into
+    the rollup tables, so the cost follows the delta rather than the history.
+
+    The queued rows are deleted from rollup_outbox and merged in the same
+    transaction, so each row is counted exactly once even with concurrent
+    writers; the state row lock serializes concurrent callers.
+    Returns the number of new rows merged.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT 1 FROM rollup_state WHERE name = %s FOR UPDATE",
+            (ROLLUP_NAME,)
+        )
+        cur.execute(
+            "CREATE TEMPORARY TABLE rollup_delta ON COMMIT DROP AS "
+            "SELECT * FROM rollup_outbox WITH NO DATA"
+        )
+        cur.execute(f"""
+            WITH drained AS (
+                DELETE FROM rollup_outbox RETURNING {', '.join(OUTBOX_COLUMNS)}
+            )
+            INSERT INTO rollup_delta SELECT * FROM drained
+        """)
+        new_rows = cur.rowcount
+        if not new_rows:
+            conn.commit()
+            return 0
+
+        cur.execute("ANALYZE rollup_delta")
+        _merge(cur, "rollup_delta")
+        _bump_generation(cur)
+        conn.commit()
+        return new_rows
+
+def rebuild_rollups(conn):
+    """Empty the rollup tables and fold in the complete history again"""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT 1 FROM rollup_state WHERE name = %s FOR UPDATE",
+            (ROLLUP_NAME,)
+        )
+        # TRUNCATE locks the outbox, so rows committed while the history is
+        # read are queued afterwards rather than counted twice or lost
+        cur.execute(f"TRUNCATE rollup_outbox, {', '.join(ROLLUP_TABLES)}")
+        cur.execute(f"SELECT COUNT(*) FROM flight_searches WHERE {ROLLUP_ROW_FILTER}")
+        rows = cur.fetchone()[0]
+        _merge(cur, f"(SELECT * FROM flight_searches WHERE {ROLLUP_ROW_FILTER}) history")
+        _bump_generation(cur)
+    conn.commit()
+    return rows
+
+def rollup_generation(conn) -> int:
+    """
+    Counter bumped by every update that merged rows. Rows reach the rollups
+    in commit order, so anything built from flight_searches is stale when
+    the counter has moved past the value it was built at.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT generation FROM rollup_state WHERE name = %s", (ROLLUP_NAME,))
+        row = cur.fetchone()
+    return row[0] if row else 0
+
+def _bump_generation(cur):
+    cur.execute("""
+        UPDATE rollup_state
+        SET generation = generation + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = %s
+    """, (ROLLUP_NAME,))
+
+def _merge(cur, source):
+    """Upsert the aggregates of the rows in relation `source` into every rollup"""
+    multi_option = MULTI_OPTION_ROWS.format(source=source)
+    cur.execute(f"""
+    INSERT INTO route_departure_rollup AS r (
+        from_airport, to_airport, airline_name, departure,
+        min_price, max_price, sum_price, sum_price_sq, price_count,
+        first_seen, last_seen, latest_price
+    )
+    SELECT
+        from_airport,
+        to_airport,
+        airline_name,
+        departure,
+        MIN(price),
+        MAX(price),
+        SUM(price),
+        SUM(price * price),
+        COUNT(*),
+        MIN(query_time),
+        MAX(query_time),
+        (ARRAY_AGG(price ORDER BY query_time DESC))[1]
+    FROM {source}
+    GROUP BY from_airport, to_airport, airline_name, departure
+    ON CONFLICT (from_airport, to_airport, airline_name, departure) DO UPDATE SET
+        min_price = LEAST(r.min_price, EXCLUDED.min_price),
+        max_price = GREATEST(r.max_price, EXCLUDED.max_price),
+        sum_price = r.sum_price + EXCLUDED.sum_price,
+        sum_price_sq = r.sum_price_sq + EXCLUDED.sum_price_sq,
+        price_count = r.price_count + EXCLUDED.price_count,
+        first_seen = LEAST(r.first_seen, EXCLUDED.first_seen),
+        last_seen = GREATEST(r.last_seen, EXCLUDED.last_seen),
+        latest_price = CASE WHEN EXCLUDED.last_seen >= r.last_seen
+                            THEN EXCLUDED.latest_price ELSE r.latest_price END
+    """)
+
+    cur.execute(f"""
+    INSERT INTO route_dow_rollup AS r (
+        from_airport, to_airport, airline_name, day_of_week,
+        min_price, max_price, sum_price, sum_price_sq, sum_stops, price_count,
+        latest_price, latest_query_time
+    )
+    SELECT
+        from_airport,
+        to_airport,
+        airline_name,
+        EXTRACT(DOW FROM departure)::SMALLINT,
+        MIN(price),
+        MAX(price),
+        SUM(price),
+        SUM(price * price),
+        COALESCE(SUM(stops), 0),
+        COUNT(*),
+        (ARRAY_AGG(price ORDER BY query_time DESC))[1],
+        MAX(query_time)
+    FROM {source}
+    GROUP BY from_airport, to_airport, airline_name, EXTRACT(DOW FROM departure)
+    ON CONFLICT (from_airport, to_airport, airline_name, day_of_week) DO UPDATE SET
+        min_price = LEAST(r.min_price, EXCLUDED.min_price),
+        max_price = GREATEST(r.max_price, EXCLUDED.max_price),
+        sum_price = r.sum_price + EXCLUDED.sum_price,
+        sum_price_sq = r.sum_price_sq + EXCLUDED.sum_price_sq,
+        sum_stops = r.sum_stops + EXCLUDED.sum_stops,
+        price_count = r.price_count + EXCLUDED.price_count,
+        latest_price = CASE WHEN EXCLUDED.latest_query_time >= r.latest_query_time
+                            THEN EXCLUDED.latest_price ELSE r.latest_price END,
+        latest_query_time = GREATEST(r.latest_query_time, EXCLUDED.latest_query_time)
+    """)
+
+    cur.execute(f"""
+    INSERT INTO query_date_rollup AS r (
+        query_date, from_airport, to_airport, departure_date, airline_name,
+        min_price, max_price, sum_price, sum_price_sq, price_count,
+        latest_price, latest_query_time
+    )
+    SELECT
+        DATE(query_time),
+        from_airport,
+        to_airport,
+        DATE(departure),
+        airline_name,
+        MIN(price),
+        MAX(price),
+        SUM(price),
+        SUM(price * price),
+        COUNT(*),
+        (ARRAY_AGG(price ORDER BY query_time DESC))[1],
+        MAX(query_time)
+    FROM {source}
+    GROUP BY DATE(query_time), from_airport, to_airport, DATE(departure), airline_name
+    ON CONFLICT (query_date, from_airport, to_airport, departure_date, airline_name) DO UPDATE SET
+        min_price = LEAST(r.min_price, EXCLUDED.min_price),
+        max_price = GREATEST(r.max_price, EXCLUDED.max_price),
+        sum_price = r.sum_price + EXCLUDED.sum_price,
+        sum_price_sq = r.sum_price_sq + EXCLUDED.sum_price_sq,
+        price_count = r.price_count + EXCLUDED.price_count,
+        latest_price = CASE WHEN EXCLUDED.latest_query_time >= r.latest_query_time
+                            THEN EXCLUDED.latest_price ELSE r.latest_price END,
+        latest_query_time = GREATEST(r.latest_query_time, EXCLUDED.latest_query_time)
+    """)
+
+    cur.execute(f"""
+    INSERT INTO airline_day_rollup AS r (
+        query_date, from_airport, to_airport, departure_date, airline_name,
+        option_count, min_price, sum_price, best_rank, search_count
+    )
+    SELECT
+        DATE(query_time),
+        from_airport,
+        to_airport,
+        DATE(departure),
+        airline_name,
+        COUNT(*),
+        MIN(price),
+        SUM(price),
+        MIN(option_rank),
+        COUNT(DISTINCT search_id)
+    FROM {multi_option}
+    GROUP BY DATE(query_time), from_airport, to_airport, DATE(departure), airline_name
+    ON CONFLICT (from_airport, to_airport, departure_date, query_date, airline_name) DO UPDATE SET
+        option_count = r.option_count + EXCLUDED.option_count,
+        min_price = LEAST(r.min_price, EXCLUDED.min_price),
+        sum_price = r.sum_price + EXCLUDED.sum_price,
+        best_rank = LEAST(r.best_rank, EXCLUDED.best_rank),
+        search_count = r.search_count + EXCLUDED.search_count
+    """)
+
+    cur.execute(f"""
+    INSERT INTO departure_hour_rollup AS r (
+        query_date, from_airport, to_airport, departure_date, departure_hour, airline_name,
+        option_count, min_price, sum_price
+    )
+    SELECT
+        DATE(query_time),
+        from_airport,
+        to_airport,
+        DATE(departure),
+        EXTRACT(HOUR FROM departure)::SMALLINT,
+        airline_name,
+        COUNT(*),
+        MIN(price),
+        SUM(price)
+    FROM {multi_option}
+    GROUP BY DATE(query_time), from_airport, to_airport, DATE(departure),
+             EXTRACT(HOUR FROM departure), airline_name
+    ON CONFLICT (from_airport, to_airport, departure_date, query_date,
+                 departure_hour, airline_name) DO UPDATE SET
+        option_count = r.option_count + EXCLUDED.option_count,
+        min_price = LEAST(r.min_price, EXCLUDED.min_price),
+        sum_price = r.sum_price + EXCLUDED.sum_price
+    """)
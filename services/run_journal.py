@@ -0,0 +1,220 @@
+import json
+import threading
+import uuid
+from dataclasses import asdict
+from typing import Iterable, Iterator, List, Optional, Sequence
+from .configuration_service import FlightConfiguration, configuration_key
+from .database_connection import get_connection
+
+__all__ = ['RunJournal', 'create_run_journal_tables']
+
+def create_run_journal_tables(conn):
+    """Create the tables recording batch runs and the state of each configuration"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS batch_runs (
+                run_id UUID PRIMARY KEY,
+                label TEXT,
+                sources JSONB NOT NULL DEFAULT '[]',
+                status TEXT NOT NULL DEFAULT 'running',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS batch_run_items (
+                run_id UUID NOT NULL REFERENCES batch_runs (run_id) ON DELETE CASCADE,
+                config_key TEXT NOT NULL,
+                config JSONB NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                started_at TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (run_id, config_key)
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_batch_runs_label_status
+            ON batch_runs (label, status, created_at);
+        """)
+    conn.commit()
+
+class RunJournal:
+    """
+    Persistent record of one batch run, so it can be resumed after a crash.
+
+    Each configuration is journaled as pending when it is dispatched,
+    failed when its fetch raises, and done once its rows are committed.
+    Rows buffered in a FlightBatchWriter are only marked done after a
+    checkpoint has flushed the writer, so a crash can cause a search to run
+    twice but never lose one. Resuming a run re-streams its sources and
+    skips every configuration already done.
+    """
+
+    def __init__(self, run_id: str, sources: Sequence[str], label: Optional[str] = None,
+                 done_keys: Optional[set] = None, checkpoint_every: int = 20):
+        self.run_id = run_id
+        self.sources = list(sources)
+        self.label = label
+        self.checkpoint_every = checkpoint_every
+        self._done_keys = done_keys or set()
+        self._fetched: List[FlightConfiguration] = []
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+
+    @classmethod
+    def start(cls, sources: Sequence[str], label: Optional[str] = None) -> 'RunJournal':
+        """Open a new run reading from the given configuration files"""
+        run_id = str(uuid.uuid4())
+        with get_connection() as conn:
+            create_run_journal_tables(conn)
+            with conn.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO batch_runs (run_id, label, sources) VALUES (%s, %s, %s)",
+                    (run_id, label, json.dumps(list(sources)))
+                )
+            conn.commit()
+        return cls(run_id, sources, label)
+
+    @classmethod
+    def resume(cls, run_id: str) -> 'RunJournal':
+        """Reopen an existing run, remembering which configurations are done"""
+        with get_connection() as conn:
+            create_run_journal_tables(conn)
+            with conn.cursor() as cur:
+                cur.execute("SELECT sources, label FROM batch_runs WHERE run_id = %s", (run_id,))
+                row = cur.fetchone()
+                if row is None:
+                    raise ValueError(f"No batch run with id {run_id}")
+                sources, label = row
+                cur.execute(
+                    "SELECT config_key FROM batch_run_items WHERE run_id = %s AND status = 'done'",
+                    (run_id,)
+                )
+                done_keys = {key for (key,) in cur.fetchall()}
+                cur.execute("""
+                    UPDATE batch_runs SET status = 'running', finished_at = NULL,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE run_id = %s
+                """, (run_id,))
+            conn.commit()
+        return cls(run_id, sources, label, done_keys)
+
+    @staticmethod
+    def latest_unfinished(label: str) -> Optional[str]:
+        """Id of the newest run with this label that never finished, if any"""
+        with get_connection() as conn:
+            create_run_journal_tables(conn)
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT run_id FROM batch_runs
+                    WHERE label = %s AND status = 'running'
+                    ORDER BY created_at DESC LIMIT 1
+                """, (label,))
+                row = cur.fetchone()
+            conn.rollback()
+        return str(row[0]) if row else None
+
+    def skip_done(self, configs: Iterable[FlightConfiguration]) -> Iterator[FlightConfiguration]:
+        """Stream only the configurations this run has not completed yet"""
+        for config in configs:
+            if self._key(config) not in self._done_keys:
+                yield config
+
+    @property
+    def done_count(self) -> int:
+        return len(self._done_keys)
+
+    def record_pending(self, config: FlightConfiguration):
+        """Journal that a configuration is about to be fetched"""
+        self._upsert([config], 'pending', attempt=True)
+
+    def record_failed(self, config: FlightConfiguration, error: str):
+        self._upsert([config], 'failed', error=error)
+
+    def record_fetched(self, config: FlightConfiguration, writer=None):
+        """
+        Journal a successful fetch. Without a writer its rows are already
+        committed, so it is done now; otherwise it is done at the next
+        checkpoint.
+        """
+        if writer is None:
+            self._mark_done([config])
+            return
+        with self._lock:
+            self._fetched.append(config)
+            due = len(self._fetched) >= self.checkpoint_every
+        if due:
+            self.checkpoint(writer)
+
+    def checkpoint(self, writer):
+        """Flush the writer and mark every configuration fetched before it done"""
+        with self._checkpoint_lock:
+            with self._lock:
+                fetched, self._fetched = self._fetched, []
+            if not fetched:
+                return
+            writer.flush()
+            if writer.last_error is not None:
+                # Rows are still buffered; try again at the next checkpoint
+                with self._lock:
+                    self._fetched[:0] = fetched
+                return
+            self._mark_done(fetched)
+
+    def finish(self, writer=None):
+        """Checkpoint and close the run; it stays resumable if anything failed"""
+        if writer is not None:
+            self.checkpoint(writer)
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE batch_runs SET
+                        status = CASE WHEN EXISTS (
+                            SELECT 1 FROM batch_run_items
+                            WHERE run_id = %(run_id)s AND status <> 'done'
+                        ) THEN 'incomplete' ELSE 'completed' END,
+                        finished_at = CURRENT_TIMESTAMP,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE run_id = %(run_id)s
+                    RETURNING status
+                """, {'run_id': self.run_id})
+                status = cur.fetchone()[0]
+            conn.commit()
+        return status
+
+    def _mark_done(self, configs: List[FlightConfiguration]):
+        self._upsert(configs, 'done')
+        with self._lock:
+            self._done_keys.update(self._key(config) for config in configs)
+
+    def _upsert(self, configs: List[FlightConfiguration], status: str,
+                error: Optional[str] = None, attempt: bool = False):
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                for config in configs:
+                    cur.execute("""
+                        INSERT INTO batch_run_items
+                            (run_id, config_key, config, status, attempts, error, started_at)
+                        VALUES (%(run_id)s, %(key)s, %(config)s, %(status)s, %(attempts)s,
+                                %(error)s, CASE WHEN %(attempt)s THEN CURRENT_TIMESTAMP END)
+                        ON CONFLICT (run_id, config_key) DO UPDATE SET
+                            status = EXCLUDED.status,
+                            attempts = batch_run_items.attempts + EXCLUDED.attempts,
+                            error = EXCLUDED.error,
+                            started_at = COALESCE(EXCLUDED.started_at, batch_run_items.started_at),
+                            updated_at = CURRENT_TIMESTAMP
+                    """, {
+                        'run_id': self.run_id,
+                        'key': self._key(config),
+                        'config': json.dumps(asdict(config)),
+                        'status': status,
+                        'attempts': 1 if attempt else 0,
+                        'error': error,
+                        'attempt': attempt
+                    })
+            conn.commit()
+
+    @staticmethod
+    def _key(config: FlightConfiguration) -> str:
+        return json.dumps(configuration_key(config))
@@ -0,0 +1,169 @@
+import json
+import os
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+from typing import Optional
+from . import metrics
+from .batch_processor import process_configuration
+from .configuration_service import FlightSearchSpec, iter_unique_configurations
+from .database_connection import close_pool, get_connection
+from .flight_database import create_flights_table
+from .flight_writer import get_flight_writer
+from .polling_planner import plan_polls
+from .rate_limiter import RateLimiter
+from .refresh_coordinator import get_refresh_coordinator
+
+__all__ = ['SchedulerDaemon', 'load_watched_routes']
+
+def load_watched_routes(filename: str, today: Optional[date] = None) -> FlightSearchSpec:
+    """
+    Read a watched-routes file into a spec covering today through
+    `horizon_days` (default 180) ahead, e.g.
+
+        {"routes": [["SEA", "MKE"], ["SEA", "ORD"]], "horizon_days": 120,
+         "outbound_days": [3], "return_days": [6], "seat_classes": ["economy"]}
+
+    Any other FlightSearchSpec field may be given; the dates are not.
+    """
+    with open(filename, 'r') as f:
+        data = json.load(f)
+    today = today or date.today()
+    horizon = int(data.pop('horizon_days', 180))
+    data['start_date'] = today.isoformat()
+    data['end_date'] = (today + timedelta(days=horizon)).isoformat()
+    return FlightSearchSpec.from_dict(data)
+
+class SchedulerDaemon:
+    """
+    Fetch and refresh cycles for every watched route in one long-lived process.
+
+    The connection pool, result cache, flight writer and worker threads are
+    set up once and reused by every cycle. HTTP sessions are not: fast_flights
+    opens a new client inside every get_flights call and offers no way to
+    pass one in. Each cycle the polling planner
+    spends one shared `budget` of searches across all routes, subject to a
+    single `requests_per_second` limit; the views are refreshed at most
+    every `refresh_seconds`. The routes file is re-read when it changes.
+    SIGTERM and SIGINT stop the daemon after the searches in progress,
+    flushing buffered rows before exit; searches still waiting on the
+    circuit breaker, the rate limit or a retry backoff give up at once.
+    """
+
+    def __init__(self, routes_file: str, budget: int = 50, cycle_seconds: float = 900,
+                 refresh_seconds: float = 3600, requests_per_second: float = 0.2,
+                 max_workers: int = 2, all_options: bool = False):
+        self.routes_file = routes_file
+        self.budget = budget
+        self.cycle_seconds = cycle_seconds
+        self.refresh_seconds = refresh_seconds
+        self.max_workers = max_workers
+        self.all_options = all_options
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self._stop = threading.Event()
+        self._spec: Optional[FlightSearchSpec] = None
+        self._spec_key = None
+        self._partitions_checked: Optional[date] = None
+        self._last_refresh: Optional[float] = None
+        self._unrefreshed = False  # rows written since the last refresh
+
+    def run(self):
+        """Run cycles until stop() or a termination signal"""
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+        writer = get_flight_writer()
+        print(f"Scheduler daemon started, watching {self.routes_file}")
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers,
+                                    thread_name_prefix='rfb-daemon') as executor:
+                while not self._stop.is_set():
+                    started = time.monotonic()
+                    try:
+                        with metrics.timer('daemon_cycle_seconds', 'Daemon cycles, including refreshes'):
+                            self.run_cycle(executor, writer)
+                    except Exception as e:
+                        print(f"Error during scheduler cycle: {e}")
+                    self._write_metrics()
+                    self._stop.wait(max(self.cycle_seconds - (time.monotonic() - started), 0))
+        finally:
+            writer.flush()
+            if self._unrefreshed:
+                self._refresh_views()
+            self._write_metrics()
+            close_pool()
+            print("Scheduler daemon stopped")
+
+    def stop(self):
+        """Ask the daemon to finish its current searches and exit"""
+        self._stop.set()
+
+    def run_cycle(self, executor, writer) -> int:
+        """Fetch the due searches of every watched route once. Returns how many ran."""
+        spec = self._load_spec()
+        self._ensure_partitions()
+
+        configs = plan_polls(iter_unique_configurations(spec.expand()), self.budget)
+        print(f"Cycle: {len(configs)} searches due across {len(spec.routes)} routes")
+
+        submitted = 0
+        pending = set()
+        for config in configs:
+            if self._stop.is_set():
+                break
+            if len(pending) >= self.max_workers * 2:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            pending.add(executor.submit(
+                process_configuration, config, self.rate_limiter, writer, self.all_options,
+                stop=self._stop
+            ))
+            submitted += 1
+        wait(pending)
+        writer.flush()
+
+        self._unrefreshed = self._unrefreshed or submitted > 0
+        if self._unrefreshed and (
+            self._last_refresh is None
+            or time.monotonic() - self._last_refresh >= self.refresh_seconds
+        ):
+            self._refresh_views()
+        return submitted
+
+    def _write_metrics(self):
+        """Save the metrics gathered so far, overwriting the previous cycle's"""
+        try:
+            metrics.write_snapshot()
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+    def _load_spec(self) -> FlightSearchSpec:
+        """Re-read the routes file when it, or the date, has changed"""
+        key = (os.path.getmtime(self.routes_file), date.today())
+        if key != self._spec_key:
+            self._spec = load_watched_routes(self.routes_file)
+            self._spec_key = key
+            print(f"Loaded {len(self._spec.routes)} watched routes")
+        return self._spec
+
+    def _ensure_partitions(self):
+        """Create upcoming flight_searches partitions once a day"""
+        today = date.today()
+        if self._partitions_checked == today:
+            return
+        with get_connection() as conn:
+            create_flights_table(conn)
+        self._partitions_checked = today
+
+    def _refresh_views(self):
+        self._last_refresh = time.monotonic()
+        self._unrefreshed = False
+        for result in get_refresh_coordinator().refresh_if_needed():
+            if result.success and not result.skipped:
+                print(f"Refreshed {result.view} in {result.duration:.2f}s")
+            elif not result.success:
+                print(f"Error refreshing {result.view}: {result.error}")
+
+    def _handle_signal(self, signum, frame):
+        print(f"Received signal {signum}, stopping after current searches")
+        self.stop()
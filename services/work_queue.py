@@ -0,0 +1,325 @@
+import json
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+from psycopg2.extras import execute_values
+from .batch_processor import fetch_configuration
+from .configuration_service import FlightConfiguration, configuration_key, iter_unique_configurations
+from .database_connection import get_connection
+from .flight_writer import FlightBatchWriter
+from .job_batches import collect_results, needs_refresh, queue_drained, settle_batch
+from .rate_limiter import RateLimiter
+from .refresh_coordinator import get_refresh_coordinator
+from .resilience import FlightFetchError
+
+__all__ = [
+    'create_job_tables',
+    'enqueue_configurations',
+    'queue_counts',
+    'QueueWorker'
+]
+
+ENQUEUE_PAGE_SIZE = 500
+
+def create_job_tables(conn):
+    """Create the flight_jobs queue table"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS flight_jobs (
+                job_id BIGSERIAL PRIMARY KEY,
+                config_key TEXT NOT NULL,
+                config JSONB NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                priority INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                available_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                lease_owner TEXT,
+                lease_expires_at TIMESTAMP,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            );
+
+            -- A search is queued at most once while it is waiting or running
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_flight_jobs_active_config
+            ON flight_jobs (config_key) WHERE status IN ('queued', 'running');
+
+            CREATE INDEX IF NOT EXISTS idx_flight_jobs_claim
+            ON flight_jobs (priority DESC, job_id) WHERE status = 'queued';
+
+            CREATE INDEX IF NOT EXISTS idx_flight_jobs_lease
+            ON flight_jobs (lease_expires_at) WHERE status = 'running';
+        """)
+    conn.commit()
+
+def enqueue_configurations(configs: Iterable[FlightConfiguration], priority: int = 0,
+                           max_attempts: int = 3) -> int:
+    """
+    Add configurations to the queue in pages, skipping searches that are
+    already queued or running. Returns the number of jobs added.
+    """
+    configs = iter_unique_configurations(configs)
+    added = 0
+    with get_connection() as conn:
+        create_job_tables(conn)
+        while True:
+            page = list(islice(configs, ENQUEUE_PAGE_SIZE))
+            if not page:
+                break
+            with conn.cursor() as cur:
+                inserted = execute_values(cur, """
+                    INSERT INTO flight_jobs (config_key, config, priority, max_attempts)
+                    VALUES %s
+                    ON CONFLICT (config_key) WHERE status IN ('queued', 'running') DO NOTHING
+                    RETURNING job_id
+                """, [
+                    (json.dumps(configuration_key(config)), json.dumps(asdict(config)),
+                     priority, max_attempts)
+                    for config in page
+                ], page_size=len(page), fetch=True)
+            conn.commit()
+            added += len(inserted)
+    return added
+
+def queue_counts(conn) -> Dict[str, int]:
+    """Number of jobs in each status"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT status, COUNT(*) FROM flight_jobs GROUP BY status")
+        counts = dict(cur.fetchall())
+    conn.rollback()
+    return counts
+
+def reclaim_expired_leases(conn) -> int:
+    """Requeue running jobs whose worker stopped renewing its lease"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE flight_jobs SET
+                status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                last_error = COALESCE(last_error, 'lease expired'),
+                lease_owner = NULL,
+                lease_expires_at = NULL,
+                updated_at = CURRENT_TIMESTAMP,
+                finished_at = CASE WHEN attempts >= max_attempts THEN CURRENT_TIMESTAMP END
+            WHERE status = 'running' AND lease_expires_at < CURRENT_TIMESTAMP
+        """)
+        reclaimed = cur.rowcount
+    conn.commit()
+    return reclaimed
+
+def claim_jobs(conn, worker_id: str, limit: int,
+               lease_seconds: float) -> List[Tuple[int, FlightConfiguration, int]]:
+    """
+    Lease up to `limit` queued jobs to this worker, as (job_id, config,
+    attempts) with this attempt counted. SKIP LOCKED lets any number of
+    workers claim at once without waiting on each other's rows.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE flight_jobs SET
+                status = 'running',
+                lease_owner = %(worker)s,
+                lease_expires_at = CURRENT_TIMESTAMP + %(lease)s * INTERVAL '1 second',
+                attempts = attempts + 1,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE job_id IN (
+                SELECT job_id FROM flight_jobs
+                WHERE status = 'queued' AND available_at <= CURRENT_TIMESTAMP
+                ORDER BY priority DESC, job_id
+                LIMIT %(limit)s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING job_id, config, attempts
+        """, {'worker': worker_id, 'lease': lease_seconds, 'limit': limit})
+        jobs = [
+            (job_id, FlightConfiguration(**config), attempts)
+            for job_id, config, attempts in cur.fetchall()
+        ]
+    conn.commit()
+    return jobs
+
+def renew_leases(conn, worker_id: str, job_ids: List[int], lease_seconds: float):
+    """Heartbeat: extend the leases this worker still holds"""
+    if not job_ids:
+        return
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE flight_jobs SET
+                lease_expires_at = CURRENT_TIMESTAMP + %s * INTERVAL '1 second',
+                updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = ANY(%s) AND lease_owner = %s AND status = 'running'
+        """, (lease_seconds, job_ids, worker_id))
+    conn.commit()
+
+def complete_jobs(conn, worker_id: str, job_ids: List[int]):
+    if not job_ids:
+        return
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE flight_jobs SET
+                status = 'done', lease_owner = NULL, lease_expires_at = NULL,
+                last_error = NULL, updated_at = CURRENT_TIMESTAMP, finished_at = CURRENT_TIMESTAMP
+            WHERE job_id = ANY(%s) AND lease_owner = %s
+        """, (job_ids, worker_id))
+    conn.commit()
+
+def fail_job(conn, worker_id: str, job_id: int, error: FlightFetchError, retry_delay: float = 60):
+    """Requeue a transient failure after `retry_delay`, or give up on the job"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE flight_jobs SET
+                status = CASE WHEN %(transient)s AND attempts < max_attempts
+                              THEN 'queued' ELSE 'failed' END,
+                available_at = CURRENT_TIMESTAMP + %(delay)s * INTERVAL '1 second',
+                last_error = %(error)s,
+                lease_owner = NULL,
+                lease_expires_at = NULL,
+                updated_at = CURRENT_TIMESTAMP,
+                finished_at = CASE WHEN %(transient)s AND attempts < max_attempts
+                                   THEN NULL ELSE CURRENT_TIMESTAMP END
+            WHERE job_id = %(job_id)s AND lease_owner = %(worker)s
+        """, {'transient': error.transient, 'delay': retry_delay, 'error': str(error),
+              'job_id': job_id, 'worker': worker_id})
+    conn.commit()
+
+class QueueWorker:
+    """
+    Claim flight_jobs and fetch them until stopped.
+
+    Start one per host (each with its own egress IP); they share nothing but
+    the database. Jobs are leased in small batches and a heartbeat thread
+    renews the leases while they run, so jobs of a worker that dies are
+    reclaimed by the others once its leases lapse. Jobs are only marked
+    done after their rows are flushed; when the flush fails their rows are
+    dropped and the jobs requeued. Retried jobs bypass the result cache and
+    fetch again. A worker started as `coordinator` also refreshes the
+    analysis views whenever the queue drains after any worker finished
+    jobs.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, max_workers: int = 2,
+                 requests_per_second: Optional[float] = 0.2, lease_seconds: float = 300,
+                 poll_interval: float = 10, all_options: bool = False,
+                 coordinator: bool = False, exit_when_empty: bool = False):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.all_options = all_options
+        self.coordinator = coordinator
+        self.exit_when_empty = exit_when_empty
+        self._stop = threading.Event()
+        self._held: List[int] = []
+        self._held_lock = threading.Lock()
+        self._refreshed_through: Optional[int] = None  # done jobs at the last refresh
+
+    def run(self):
+        """Process jobs until stop(), a termination signal or (optionally) an empty queue"""
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+        with get_connection() as conn:
+            create_job_tables(conn)
+        heartbeat = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+        heartbeat.start()
+        print(f"Worker {self.worker_id} started")
+        try:
+            with FlightBatchWriter() as writer, \
+                    ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while not self._stop.is_set():
+                    try:
+                        processed = self.run_once(executor, writer)
+                    except Exception as e:
+                        print(f"Error in worker loop: {e}")
+                        processed = 0
+                    if processed:
+                        continue
+                    drained = self._maybe_refresh()
+                    if drained and self.exit_when_empty:
+                        break
+                    self._stop.wait(self.poll_interval)
+        finally:
+            self._stop.set()
+            heartbeat.join()
+            print(f"Worker {self.worker_id} stopped")
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self, executor, writer) -> int:
+        """Claim one batch of jobs and run it. Returns the number of jobs claimed."""
+        with get_connection() as conn:
+            reclaimed = reclaim_expired_leases(conn)
+            if reclaimed:
+                print(f"Reclaimed {reclaimed} jobs with expired leases")
+            jobs = claim_jobs(conn, self.worker_id, self.max_workers * 2, self.lease_seconds)
+        if not jobs:
+            return 0
+        with self._held_lock:
+            self._held = [job_id for job_id, _, _ in jobs]
+
+        # A retry must store what an earlier attempt could not, so it
+        # fetches again instead of taking a cached answer
+        futures = {
+            job_id: executor.submit(
+                fetch_configuration, config, self.rate_limiter, writer, self.all_options,
+                use_cache=attempts <= 1
+            )
+            for job_id, config, attempts in jobs
+        }
+        succeeded, failed = collect_results(futures)
+
+        writer.flush()
+        flush_error = writer.last_error
+        if flush_error is not None:
+            # Everything still buffered belongs to this batch. Drop it and
+            # requeue the jobs, so a later flush cannot write rows that the
+            # retried jobs write again
+            dropped = writer.discard()
+            print(f"Dropped {dropped} unwritten rows, requeueing {len(succeeded)} jobs")
+        completed, failed = settle_batch(succeeded, failed, flush_error)
+        with get_connection() as conn:
+            complete_jobs(conn, self.worker_id, completed)
+            for job_id, error in failed:
+                fail_job(conn, self.worker_id, job_id, error)
+        with self._held_lock:
+            self._held = []
+        return len(jobs)
+
+    def _maybe_refresh(self) -> bool:
+        """
+        Whether the queue is drained. The coordinator refreshes the views
+        when it is and jobs were done, by any worker, since its last refresh.
+        """
+        with get_connection() as conn:
+            counts = queue_counts(conn)
+        if self.coordinator and needs_refresh(counts, self._refreshed_through):
+            print("Queue drained, refreshing analysis views")
+            for result in get_refresh_coordinator().refresh_if_needed():
+                if not result.success:
+                    print(f"Error refreshing {result.view}: {result.error}")
+            self._refreshed_through = counts.get('done', 0)
+        return queue_drained(counts)
+
+    def _heartbeat(self):
+        interval = max(self.lease_seconds / 3, 1)
+        while not self._stop.wait(interval):
+            with self._held_lock:
+                held = list(self._held)
+            if not held:
+                continue
+            try:
+                with get_connection() as conn:
+                    renew_leases(conn, self.worker_id, held, self.lease_seconds)
+            except Exception as e:
+                print(f"Error renewing job leases: {e}")
+
+    def _handle_signal(self, signum, frame):
+        print(f"Received signal {signum}, stopping after the current jobs")
+        self.stop()
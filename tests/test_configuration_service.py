@@ -0,0 +1,76 @@
+import pytest
+
+from services.configuration_service import FlightConfiguration, FlightSearchSpec
+
+
+def spec(**overrides):
+    # 2026-12-01 is a Tuesday and 2026-12-14 a Monday
+    fields = dict(
+        routes=[('SEA', 'MKE')],
+        start_date='2026-12-01',
+        end_date='2026-12-14',
+        outbound_days=[0],
+        return_days=[4]
+    )
+    fields.update(overrides)
+    return FlightSearchSpec(**fields)
+
+
+def test_expand_yields_outbound_then_return_legs():
+    configs = list(spec().expand())
+
+    assert [(c.from_airport, c.to_airport, c.date) for c in configs] == [
+        ('SEA', 'MKE', '2026-12-07'),
+        ('SEA', 'MKE', '2026-12-14'),
+        ('MKE', 'SEA', '2026-12-04'),
+        ('MKE', 'SEA', '2026-12-11'),
+    ]
+
+
+def test_expand_carries_search_options():
+    configs = list(spec(trip_type='round-trip', num_adults=2, fetch_mode='fallback').expand())
+
+    assert configs[0] == FlightConfiguration(
+        from_airport='SEA', to_airport='MKE', date='2026-12-07', trip_type='round-trip',
+        seat_class='economy', max_stops=0, num_adults=2, fetch_mode='fallback'
+    )
+
+
+def test_expand_is_lazy():
+    configs = spec(end_date='2036-12-31').expand()
+
+    assert next(configs).date == '2026-12-07'
+
+
+def test_no_return_days_means_no_return_legs():
+    configs = list(spec(return_days=[]).expand())
+
+    assert {(c.from_airport, c.to_airport) for c in configs} == {('SEA', 'MKE')}
+
+
+@pytest.mark.parametrize('overrides', [
+    {},
+    {'return_days': []},
+    {'outbound_days': [0, 2, 4], 'return_days': [5, 6]},
+    {'routes': [('SEA', 'MKE'), ('LAX', 'JFK'), ('ORD', 'DEN')]},
+    {'seat_classes': ['economy', 'business'], 'max_stops': [0, 1, 2]},
+    {'start_date': '2026-12-01', 'end_date': '2027-11-30', 'outbound_days': [1, 3]},
+    {'start_date': '2026-12-05', 'end_date': '2026-12-05', 'outbound_days': [5]},
+    {'start_date': '2026-12-06', 'end_date': '2026-12-01'},
+])
+def test_count_matches_expand(overrides):
+    search = spec(**overrides)
+
+    assert search.count() == len(list(search.expand()))
+
+
+def test_from_dict_accepts_json_routes():
+    search = FlightSearchSpec.from_dict({
+        'routes': [['SEA', 'MKE']],
+        'start_date': '2026-12-01',
+        'end_date': '2026-12-14',
+        'outbound_days': [0]
+    })
+
+    assert search.routes == [('SEA', 'MKE')]
+    assert search.count() == 2
@@ -0,0 +1,140 @@
+import threading
+
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+from psycopg2 import extensions
+
+from services import database_connection
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class FakePool:
+    """Stands in for psycopg2's ThreadedConnectionPool"""
+
+    def __init__(self, minconn, maxconn, **settings):
+        self.closed = False
+        self.idle = []
+        self.put = []
+
+    def getconn(self):
+        return self.idle.pop() if self.idle else FakeConnection()
+
+    def putconn(self, conn, close=False):
+        self.put.append((conn, close))
+        if not close:
+            self.idle.append(conn)
+
+    def closeall(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_pool(monkeypatch):
+    monkeypatch.setattr(database_connection.pool, 'ThreadedConnectionPool', FakePool)
+    monkeypatch.setattr(database_connection, '_settings', {})
+    monkeypatch.setenv('DB_POOL_MAX', '2')
+    database_connection.close_pool()
+    yield
+    database_connection.close_pool()
+
+
+def test_connections_are_reused():
+    with database_connection.get_connection() as first:
+        pass
+    with database_connection.get_connection() as second:
+        pass
+
+    assert first is second
+    assert database_connection.get_pool().put == [(first, False), (first, False)]
+
+
+def test_error_rolls_back_before_returning_the_connection():
+    with pytest.raises(ValueError):
+        with database_connection.get_connection() as conn:
+            conn.status = extensions.TRANSACTION_STATUS_INTRANS
+            raise ValueError()
+
+    assert conn.rollbacks == 1
+    assert database_connection.get_pool().put == [(conn, False)]
+
+
+def test_open_transaction_is_rolled_back_on_release():
+    with database_connection.get_connection() as conn:
+        conn.status = extensions.TRANSACTION_STATUS_INERROR
+
+    assert conn.rollbacks == 1
+
+
+def test_broken_connections_are_discarded():
+    with database_connection.get_connection() as conn:
+        conn.closed = 2
+
+    assert database_connection.get_pool().put == [(conn, True)]
+    with database_connection.get_connection() as fresh:
+        assert fresh is not conn
+
+
+def test_borrowers_wait_for_a_free_connection():
+    first = database_connection.acquire_connection()
+    second = database_connection.acquire_connection()
+    borrowed = threading.Event()
+
+    def borrow():
+        conn = database_connection.acquire_connection()
+        borrowed.set()
+        database_connection.release_connection(conn)
+
+    waiter = threading.Thread(target=borrow)
+    waiter.start()
+    assert not borrowed.wait(0.1)
+
+    database_connection.release_connection(first)
+    assert borrowed.wait(1)
+    waiter.join()
+    database_connection.release_connection(second)
+
+
+def test_release_after_close_pool_closes_the_connection():
+    conn = database_connection.acquire_connection()
+    old_pool = database_connection.get_pool()
+    database_connection.close_pool()
+
+    database_connection.release_connection(conn)
+
+    assert conn.closed
+    assert old_pool.put == []
+
+
+def test_release_goes_back_to_the_pool_it_came_from():
+    conn = database_connection.acquire_connection()
+    old_pool = database_connection.get_pool()
+    database_connection.close_pool()
+    new_pool = database_connection.get_pool()
+    old_pool.closed = False  # as if closing it had not finished yet
+
+    database_connection.release_connection(conn)
+
+    assert old_pool.put == [(conn, False)]
+    assert new_pool.put == []
+    # Both of the new pool's slots are still free
+    held = [database_connection.acquire_connection() for _ in range(2)]
+    for c in held:
+        database_connection.release_connection(c)
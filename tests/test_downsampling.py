@@ -0,0 +1,74 @@
+import math
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from services.downsampling import downsample_indices, envelope_indices, lttb_indices
+
+
+def wave(n):
+    return [100 + 20 * math.sin(i / 7) + (i % 5) for i in range(n)]
+
+
+@pytest.mark.parametrize('n, threshold', [(10, 10), (10, 50), (10, 2), (0, 5)])
+def test_lttb_keeps_short_series(n, threshold):
+    assert lttb_indices(list(range(n)), wave(n), threshold) == list(range(n))
+
+
+@pytest.mark.parametrize('n, threshold', [(1000, 100), (101, 3), (500, 499), (97, 10)])
+def test_lttb_keeps_threshold_points_in_order(n, threshold):
+    kept = lttb_indices(list(range(n)), wave(n), threshold)
+
+    assert len(kept) == threshold
+    assert kept[0] == 0 and kept[-1] == n - 1
+    assert kept == sorted(set(kept))
+
+
+def test_lttb_keeps_spikes():
+    ys = [100.0] * 1000
+    ys[333] = 400.0
+    ys[777] = 10.0
+
+    kept = lttb_indices(list(range(1000)), ys, 20)
+
+    assert 333 in kept and 777 in kept
+
+
+def test_lttb_accepts_dates_and_datetimes():
+    ys = wave(200)
+    days = [date(2026, 1, 1) + timedelta(days=i) for i in range(200)]
+    times = [datetime(2026, 1, 1) + timedelta(hours=i) for i in range(200)]
+
+    assert lttb_indices(days, ys, 30) == lttb_indices(list(range(200)), ys, 30)
+    assert lttb_indices(times, ys, 30) == lttb_indices(list(range(200)), ys, 30)
+
+
+@pytest.mark.parametrize('n, threshold', [(10, 10), (10, 50), (10, 1)])
+def test_envelope_keeps_short_series(n, threshold):
+    assert envelope_indices(wave(n), threshold) == list(range(n))
+
+
+def test_envelope_keeps_every_bucket_extreme():
+    ys = wave(1000)
+
+    kept = envelope_indices(ys, 100)
+
+    assert len(kept) <= 100
+    assert kept == sorted(set(kept))
+    for i in range(50):
+        bucket = ys[i * 20:(i + 1) * 20]
+        values = [ys[j] for j in kept if i * 20 <= j < (i + 1) * 20]
+        assert min(values) == min(bucket) and max(values) == max(bucket)
+
+
+def test_envelope_of_flat_buckets_keeps_one_point_each():
+    assert envelope_indices([5.0] * 100, 20) == list(range(0, 100, 10))
+
+
+def test_downsample_indices_dispatches_on_method():
+    xs, ys = list(range(300)), wave(300)
+
+    assert downsample_indices(xs, ys, 40) == lttb_indices(xs, ys, 40)
+    assert downsample_indices(xs, ys, 40, method='envelope') == envelope_indices(ys, 40)
+    with pytest.raises(ValueError):
+        downsample_indices(xs, ys, 40, method='average')
@@ -0,0 +1,81 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from services.flight_parser import parse_duration, parse_flight_time
+
+
+# A Saturday
+QUERY_DATE = date(2026, 10, 17)
+
+
+@pytest.mark.parametrize('text, reference, expected', [
+    # Later this year
+    ('8:05 PM on Sat, Dec 5', QUERY_DATE, datetime(2026, 12, 5, 20, 5)),
+    # A month already past this year is next year's
+    ('10:30 AM on Sat, Mar 6', QUERY_DATE, datetime(2027, 3, 6, 10, 30)),
+    # Year-end rollover
+    ('6:00 AM on Fri, Jan 1', date(2026, 12, 30), datetime(2027, 1, 1, 6, 0)),
+    # One day of slack for time zones between the query and the airport
+    ('11:59 PM on Fri, Oct 16', QUERY_DATE, datetime(2026, 10, 16, 23, 59)),
+    # The weekday picks the year when both are in range
+    ('7:15 AM on Mon, Oct 18', QUERY_DATE, datetime(2027, 10, 18, 7, 15)),
+    # Feb 29 only exists in a leap year
+    ('9:00 AM on Tue, Feb 29', date(2027, 6, 1), datetime(2028, 2, 29, 9, 0)),
+    # A weekday that matches no year falls back to the nearest date
+    ('10:30 AM on Thu, Mar 6', QUERY_DATE, datetime(2027, 3, 6, 10, 30)),
+    # An explicit year wins
+    ('10:30 AM on Fri, Mar 6, 2026', QUERY_DATE, datetime(2026, 3, 6, 10, 30)),
+])
+def test_flight_time_year_inference(text, reference, expected):
+    assert parse_flight_time(text, reference) == expected
+
+
+@pytest.mark.parametrize('text, hour', [
+    ('12:10 AM on Sun, Oct 18', 0),
+    ('12:10 PM on Sun, Oct 18', 12),
+    ('1:10 pm on Sun, Oct 18', 13),
+])
+def test_flight_time_twelve_hour_clock(text, hour):
+    assert parse_flight_time(text, QUERY_DATE).hour == hour
+
+
+def test_flight_time_accepts_datetime_reference():
+    reference = datetime(2026, 10, 17, 23, 30)
+
+    assert parse_flight_time('8:05 PM on Sat, Dec 5', reference) == datetime(2026, 12, 5, 20, 5)
+
+
+@pytest.mark.parametrize('value', [None, ''])
+def test_flight_time_missing(value):
+    assert parse_flight_time(value, QUERY_DATE) is None
+
+
+def test_flight_time_passes_datetimes_through():
+    value = datetime(2026, 12, 5, 20, 5)
+
+    assert parse_flight_time(value, QUERY_DATE) is value
+
+
+def test_flight_time_rejects_unknown_formats():
+    with pytest.raises(ValueError):
+        parse_flight_time('tomorrow morning', QUERY_DATE)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('3 hr 53 min', timedelta(hours=3, minutes=53)),
+    ('10 hr', timedelta(hours=10)),
+    ('1 hrs 5 min', timedelta(hours=1, minutes=5)),
+    ('45 min', timedelta(minutes=45)),
+    ('', None),
+    ('Unknown', None),
+    (None, None),
+])
+def test_duration(text, expected):
+    assert parse_duration(text) == expected
+
+
+def test_duration_passes_timedeltas_through():
+    value = timedelta(hours=2)
+
+    assert parse_duration(value) is value
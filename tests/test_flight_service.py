@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+
+fast_flights = pytest.importorskip('fast_flights')
+pytest.importorskip('psycopg2')
+
+from services import flight_service
+from services.models import FlightObservation
+from services.result_cache import FlightResultCache
+
+
+OBSERVATION = FlightObservation(
+    datetime(2026, 10, 17, 12, 0), 'SEA', 'MKE', 'one-way', 'economy',
+    airline_name='Alaska', departure=datetime(2026, 12, 1, 8, 0), price=199,
+    search_id='search-1', option_rank=0
+)
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """Patches out the download and the database; `fetches` counts downloads"""
+    cache = FlightResultCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=60)
+    fetches = []
+
+    def fetch(*args, **kwargs):
+        fetches.append(args)
+        return (OBSERVATION,)
+
+    monkeypatch.setattr(flight_service, 'get_result_cache', lambda: cache)
+    monkeypatch.setattr(flight_service, '_fetch_observations', fetch)
+    return fetches
+
+
+def search(**kwargs):
+    return flight_service.get_flights_with_additional_info(
+        [fast_flights.FlightData(date='2026-12-01', from_airport='SEA', to_airport='MKE')],
+        'one-way', 'economy', 0, fast_flights.Passengers(adults=1), 'common', **kwargs
+    )
+
+
+class StubWriter:
+    """Holds add_many callbacks until the test settles them"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def add_many(self, rows, outcome=None, on_done=None):
+        self.callbacks.append(on_done)
+
+
+def test_stored_results_are_served_from_the_cache(service, monkeypatch):
+    monkeypatch.setattr(flight_service, 'store_flight_search', lambda row, outcome: 1)
+
+    assert search() == OBSERVATION
+    assert search() == OBSERVATION
+    assert len(service) == 1
+
+
+def test_failed_store_is_not_cached(service, monkeypatch):
+    monkeypatch.setattr(flight_service, 'store_flight_search', lambda row, outcome: None)
+    search()
+
+    monkeypatch.setattr(flight_service, 'store_flight_search', lambda row, outcome: 1)
+    search()
+
+    assert len(service) == 2
+
+
+def test_results_are_cached_only_once_the_writer_commits_them(service):
+    writer = StubWriter()
+    search(writer=writer)
+    search(writer=writer)
+    assert len(service) == 2
+
+    # The first batch was dropped, the second committed
+    writer.callbacks[0](False)
+    writer.callbacks[1](True)
+    search(writer=writer)
+
+    assert len(service) == 2
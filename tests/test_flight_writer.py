@@ -0,0 +1,158 @@
+import time
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip('psycopg2')
+
+from services import flight_writer
+from services.flight_writer import FlightBatchWriter
+
+
+class FakeDatabase:
+    """Records the batches the writer inserts, or fails them while `error` is set"""
+
+    def __init__(self):
+        self.batches = []
+        self.outcomes = []
+        self.error = None
+
+    @contextmanager
+    def connection(self):
+        yield object()
+
+    def insert(self, conn, rows, outcomes=()):
+        if self.error is not None:
+            raise self.error
+        self.batches.append(list(rows))
+        self.outcomes.extend(outcomes)
+        return len(rows)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(flight_writer, 'build_flight_row', lambda flight_data: flight_data)
+    monkeypatch.setattr(flight_writer, 'get_connection', database.connection)
+    monkeypatch.setattr(flight_writer, 'ensure_flights_table', lambda conn: None)
+    monkeypatch.setattr(flight_writer, 'insert_flight_rows', database.insert)
+    return database
+
+
+def test_full_batch_is_written_in_one_insert(database):
+    with FlightBatchWriter(max_batch_size=3, max_age_seconds=60) as writer:
+        writer.add_many(['a', 'b'])
+        assert database.batches == []
+        writer.add('c')
+        assert database.batches == [['a', 'b', 'c']]
+        writer.add('d')
+
+    assert database.batches == [['a', 'b', 'c'], ['d']]
+
+
+def test_outcomes_are_written_with_their_rows(database):
+    with FlightBatchWriter(max_batch_size=100, max_age_seconds=60) as writer:
+        writer.add_many(['a', 'b'], 'search 1')
+        writer.add_many([], 'search 2')
+        writer.flush()
+
+    assert database.batches == [['a', 'b']]
+    assert database.outcomes == ['search 1', 'search 2']
+
+
+def test_aged_rows_are_flushed_in_the_background(database):
+    with FlightBatchWriter(max_batch_size=100, max_age_seconds=0.2) as writer:
+        writer.add('a')
+        deadline = time.monotonic() + 2
+        while not database.batches and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        assert database.batches == [['a']]
+
+
+def test_failed_flush_keeps_rows_for_the_next_one(database):
+    with FlightBatchWriter(max_batch_size=100, max_age_seconds=60) as writer:
+        writer.add('a')
+        database.error = ConnectionError('server closed the connection')
+        assert writer.flush() == 0
+        assert writer.last_error is database.error
+
+        database.error = None
+        writer.add('b')
+        assert writer.flush() == 2
+        assert writer.last_error is None
+
+    assert database.batches == [['a', 'b']]
+
+
+def test_add_after_close_raises(database):
+    writer = FlightBatchWriter()
+    writer.close()
+
+    with pytest.raises(RuntimeError):
+        writer.add('a')
+
+
+def test_close_raises_when_rows_cannot_be_written(database):
+    writer = FlightBatchWriter()
+    writer.add('a')
+    database.error = ConnectionError('server closed the connection')
+
+    with pytest.raises(RuntimeError) as excinfo:
+        writer.close()
+
+    assert excinfo.value.__cause__ is database.error
+
+
+def test_close_raises_for_unwritten_outcomes_alone(database):
+    writer = FlightBatchWriter()
+    writer.add_many([], 'empty search')
+    database.error = ConnectionError('server closed the connection')
+
+    with pytest.raises(RuntimeError):
+        writer.close()
+
+
+def test_discard_drops_buffered_rows_and_outcomes(database):
+    with FlightBatchWriter(max_batch_size=100, max_age_seconds=60) as writer:
+        writer.add_many(['a', 'b'], 'search 1')
+        database.error = ConnectionError('server closed the connection')
+        writer.flush()
+
+        assert writer.discard() == 2
+        assert writer.last_error is None
+        database.error = None
+
+    assert database.batches == []
+    assert database.outcomes == []
+
+
+def test_callbacks_learn_when_rows_are_committed(database):
+    done = []
+    with FlightBatchWriter(max_batch_size=100, max_age_seconds=60) as writer:
+        writer.add_many(['a'], 'search 1', on_done=done.append)
+        database.error = ConnectionError('server closed the connection')
+        writer.flush()
+        assert done == []
+
+        database.error = None
+        writer.flush()
+
+    assert done == [True]
+
+
+def test_callbacks_learn_when_rows_are_dropped(database):
+    done = []
+    with FlightBatchWriter(max_batch_size=100, max_age_seconds=60) as writer:
+        writer.add_many(['a'], 'search 1', on_done=done.append)
+        writer.discard()
+
+    assert done == [False]
+
+    writer = FlightBatchWriter()
+    writer.add_many(['b'], 'search 2', on_done=done.append)
+    database.error = ConnectionError('server closed the connection')
+    with pytest.raises(RuntimeError):
+        writer.close()
+
+    assert done == [False, False]
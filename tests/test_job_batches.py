@@ -0,0 +1,55 @@
+from concurrent.futures import Future
+
+from services.job_batches import collect_results, needs_refresh, queue_drained, settle_batch
+from services.resilience import PermanentFetchError
+
+
+def finished(error=None):
+    future = Future()
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+    return future
+
+
+def test_results_are_split_into_successes_and_classified_failures():
+    succeeded, failed = collect_results({
+        1: finished(),
+        2: finished(TimeoutError('read timed out')),
+        3: finished(ValueError('bad airport')),
+    })
+
+    assert succeeded == [1]
+    assert [(job_id, error.transient) for job_id, error in failed] == [(2, True), (3, False)]
+
+
+def test_a_clean_flush_completes_the_succeeded_jobs():
+    failure = (2, PermanentFetchError('bad airport'))
+
+    assert settle_batch([1, 3], [failure], None) == ([1, 3], [failure])
+
+
+def test_a_failed_flush_requeues_the_succeeded_jobs():
+    failure = (2, PermanentFetchError('bad airport'))
+
+    completed, failed = settle_batch([1, 3], [failure], ConnectionError('server closed'))
+
+    assert completed == []
+    assert failed[0] == failure
+    assert [job_id for job_id, _ in failed[1:]] == [1, 3]
+    assert all(error.transient for _, error in failed[1:])
+
+
+def test_queue_is_drained_without_queued_or_running_jobs():
+    assert queue_drained({})
+    assert queue_drained({'done': 4, 'failed': 1})
+    assert not queue_drained({'queued': 1, 'done': 4})
+    assert not queue_drained({'running': 1})
+
+
+def test_refresh_is_needed_once_per_new_done_count():
+    assert needs_refresh({'done': 2}, None)
+    assert not needs_refresh({'done': 2}, 2)
+    assert needs_refresh({'done': 5}, 2)
+    assert not needs_refresh({'done': 5, 'running': 1}, 2)
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+import pytest
+
+from services.models import FlightObservation, observations_to_frame
+
+
+def test_observations_to_frame_has_one_column_per_field():
+    pytest.importorskip('pandas')
+    observations = [
+        FlightObservation(datetime(2026, 10, 17, 12, 0), 'SEA', 'MKE', 'one-way', 'economy',
+                          airline_name='Alaska', price=199, option_rank=rank)
+        for rank in range(3)
+    ]
+
+    frame = observations_to_frame(observations)
+
+    assert list(frame.columns) == list(FlightObservation._fields)
+    assert frame['option_rank'].tolist() == [0, 1, 2]
+    assert observations_to_frame([]).empty
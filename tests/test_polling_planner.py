@@ -0,0 +1,88 @@
+from datetime import date, datetime, timedelta
+
+from services.configuration_service import FlightConfiguration
+from services.polling_planner import (
+    HORIZON_DAYS,
+    MAX_INTERVAL,
+    MIN_INTERVAL,
+    PollStats,
+    plan_polls,
+    poll_interval
+)
+
+
+NOW = datetime(2026, 10, 17, 12, 0)
+
+
+def config(days_out, origin='SEA', destination='MKE'):
+    day = NOW.date() + timedelta(days=days_out)
+    return FlightConfiguration(from_airport=origin, to_airport=destination, date=day.isoformat())
+
+
+def key(c):
+    return (c.from_airport, c.to_airport, date.fromisoformat(c.date))
+
+
+def test_interval_grows_with_days_to_departure():
+    assert poll_interval(0) == MIN_INTERVAL
+    assert poll_interval(HORIZON_DAYS) == MAX_INTERVAL
+    assert poll_interval(HORIZON_DAYS * 2) == MAX_INTERVAL
+    assert poll_interval(-3) == MIN_INTERVAL
+    assert MIN_INTERVAL < poll_interval(30) < poll_interval(90) < MAX_INTERVAL
+
+
+def test_price_movement_shortens_interval_down_to_minimum():
+    quiet = poll_interval(90)
+
+    assert poll_interval(90, volatility=0.05, swing=0.05) == quiet / 2
+    assert poll_interval(90, volatility=-1.0) == quiet
+    assert poll_interval(90, volatility=100.0) == MIN_INTERVAL
+
+
+def test_never_polled_come_first_nearest_departure_first():
+    configs = [config(60), config(5), config(20)]
+    stats = {key(configs[1]): PollStats(last_polled=NOW - timedelta(days=30))}
+
+    planned = plan_polls(configs, 3, now=NOW, stats=stats)
+
+    assert planned == [configs[2], configs[0], configs[1]]
+
+
+def test_budget_limits_the_plan():
+    configs = [config(days) for days in range(1, 31)]
+
+    planned = plan_polls(configs, 5, now=NOW, stats={})
+
+    assert planned == configs[:5]
+    assert plan_polls(configs, 0, now=NOW, stats={}) == []
+
+
+def test_departures_not_yet_due_are_skipped():
+    recent, stale = config(90), config(91)
+    stats = {
+        key(recent): PollStats(last_polled=NOW - timedelta(hours=1)),
+        key(stale): PollStats(last_polled=NOW - timedelta(days=10)),
+    }
+
+    assert plan_polls([recent, stale], 10, now=NOW, stats=stats) == [stale]
+
+
+def test_most_overdue_relative_to_interval_first():
+    # Both were polled a week ago, but the near departure's interval is
+    # much shorter, so it is further overdue
+    near, far = config(3), config(150)
+    polled = PollStats(last_polled=NOW - timedelta(days=7))
+    stats = {key(near): polled, key(far): polled}
+
+    assert plan_polls([far, near], 2, now=NOW, stats=stats) == [near, far]
+
+
+def test_moving_prices_are_due_sooner():
+    quiet, moving = config(120, destination='MKE'), config(120, destination='ORD')
+    last_polled = NOW - timedelta(days=3)
+    stats = {
+        key(quiet): PollStats(last_polled=last_polled),
+        key(moving): PollStats(volatility=0.2, swing=0.1, last_polled=last_polled),
+    }
+
+    assert plan_polls([quiet, moving], 10, now=NOW, stats=stats) == [moving]
@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+pytest.importorskip('psycopg2')
+
+from services.refresh_coordinator import RefreshCoordinator
+
+
+class CountingCoordinator(RefreshCoordinator):
+    """Counts refreshes instead of touching the database"""
+
+    def __init__(self, debounce_seconds):
+        super().__init__(debounce_seconds=debounce_seconds)
+        self.refreshes = 0
+        self.refreshed = threading.Event()
+
+    def refresh_if_needed(self, force=False):
+        self.refreshes += 1
+        self.refreshed.set()
+        return ['refreshed']
+
+
+def test_requests_within_the_window_share_one_refresh():
+    coordinator = CountingCoordinator(debounce_seconds=0.1)
+    for _ in range(5):
+        coordinator.request_refresh()
+
+    assert coordinator.refreshed.wait(2)
+    assert coordinator.flush() == []
+    assert coordinator.refreshes == 1
+
+
+def test_flush_runs_a_pending_refresh_once():
+    coordinator = CountingCoordinator(debounce_seconds=60)
+    coordinator.request_refresh()
+    coordinator.request_refresh()
+
+    assert coordinator.flush() == ['refreshed']
+    assert coordinator.flush() == []
+    assert coordinator.refreshes == 1
+
+
+def test_a_request_after_the_refresh_opens_a_new_window():
+    coordinator = CountingCoordinator(debounce_seconds=60)
+    coordinator.request_refresh()
+    coordinator.flush()
+    coordinator.request_refresh()
+
+    assert coordinator.flush() == ['refreshed']
+    assert coordinator.refreshes == 2
@@ -0,0 +1,41 @@
+import threading
+import time
+
+import pytest
+
+from services.resilience import CircuitBreaker, FetchCancelled, TransientFetchError, call_with_retry
+
+
+def open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    return breaker
+
+
+def test_stop_releases_callers_waiting_on_an_open_breaker():
+    breaker = open_breaker()
+    stop = threading.Event()
+    threading.Timer(0.1, stop.set).start()
+
+    started = time.monotonic()
+    with pytest.raises(FetchCancelled):
+        call_with_retry(lambda: 'never called', breaker=breaker, stop=stop)
+
+    assert time.monotonic() - started < 5
+    assert breaker.state == 'open'
+
+
+def test_stop_cuts_the_backoff_short():
+    stop = threading.Event()
+    calls = []
+
+    def fail():
+        calls.append(1)
+        stop.set()
+        raise TransientFetchError("HTTP 503", 503)
+
+    with pytest.raises(FetchCancelled):
+        call_with_retry(fail, base_delay=60, max_delay=60, stop=stop)
+
+    assert len(calls) == 1
@@ -0,0 +1,138 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from services import result_cache
+from services.result_cache import FlightResultCache, passenger_counts
+
+
+def flight(day='2026-12-01'):
+    return SimpleNamespace(date=day, from_airport='SEA', to_airport='MKE')
+
+
+def party(adults=1, children=0, infants_in_seat=0, infants_on_lap=0):
+    # fast_flights 2.x keeps the counts only in this tuple
+    return SimpleNamespace(_data=(adults, children, infants_in_seat, infants_on_lap))
+
+
+def make_key(**overrides):
+    request = dict(
+        flight_data=[flight()],
+        trip='one-way',
+        seat='economy',
+        max_stops=0,
+        passengers=party(),
+        fetch_mode='common'
+    )
+    request.update(overrides)
+    return FlightResultCache.make_key(**request)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FlightResultCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=60, max_entries=3)
+
+
+def test_key_is_stable_for_equal_requests():
+    assert make_key() == make_key()
+
+
+@pytest.mark.parametrize('overrides', [
+    {'seat': 'business'},
+    {'max_stops': 1},
+    {'trip': 'round-trip'},
+    {'fetch_mode': 'fallback'},
+    {'flight_data': [flight('2026-12-02')]},
+    {'passengers': party(adults=2)},
+    {'passengers': party(children=1)},
+    {'passengers': party(infants_on_lap=1)},
+    {'all_options': True},
+])
+def test_key_differs_for_different_requests(overrides):
+    assert make_key() != make_key(**overrides)
+
+
+def test_passenger_counts_read_fast_flights_passengers():
+    fast_flights = pytest.importorskip('fast_flights')
+
+    passengers = fast_flights.Passengers(adults=2, children=1)
+
+    assert passenger_counts(passengers) == [2, 1, 0, 0]
+    assert make_key(passengers=passengers) == make_key(passengers=party(adults=2, children=1))
+
+
+def test_get_returns_stored_result(cache):
+    fetched_at = datetime(2026, 10, 17, 12, 0)
+    cache.set('a', ('result',), fetched_at)
+
+    assert cache.get('a') == (('result',), fetched_at)
+    assert cache.get('b') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = FlightResultCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=1e-9)
+    cache.set('a', ('result',), datetime.now())
+
+    assert cache.get('a') is None
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    now = datetime.now()
+    for key in 'abc':
+        cache.set(key, key, now)
+    cache.get('a')
+    cache.set('d', 'd', now)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_zero_ttl_disables_the_cache(tmp_path):
+    cache = FlightResultCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=0)
+    cache.set('a', 'a', datetime.now())
+
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
+
+
+def claim_elsewhere(cache, monkeypatch, key, **kwargs):
+    """Claim `key` as if from another process"""
+    with monkeypatch.context() as patch:
+        patch.setattr(result_cache.os, 'getpid', lambda: -1)
+        return cache.claim(key, **kwargs)
+
+
+def test_claims_are_exclusive_until_released(cache, monkeypatch):
+    assert claim_elsewhere(cache, monkeypatch, 'a')
+    assert not cache.claim('a')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(result_cache.os, 'getpid', lambda: -1)
+        cache.release('a')
+
+    assert cache.claim('a')
+
+
+def test_this_process_renews_its_own_claim(cache, monkeypatch):
+    assert cache.claim('a')
+
+    assert cache.claim('a')
+    assert not claim_elsewhere(cache, monkeypatch, 'a')
+
+
+def test_expired_claims_can_be_taken_over(cache, monkeypatch):
+    assert claim_elsewhere(cache, monkeypatch, 'a', lease_seconds=1e-9)
+
+    assert cache.claim('a')
+
+
+def test_wait_for_returns_the_claimed_result(cache):
+    fetched_at = datetime(2026, 10, 17, 12, 0)
+    cache.claim('a')
+    cache.set('a', 'result', fetched_at)
+    cache.release('a')
+
+    assert cache.wait_for('a', timeout=1, poll_interval=0.01) == ('result', fetched_at)
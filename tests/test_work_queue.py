@@ -0,0 +1,159 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip('psycopg2')
+pytest.importorskip('fast_flights')
+
+from services import work_queue
+from services.configuration_service import FlightConfiguration
+from services.work_queue import QueueWorker
+
+
+@pytest.fixture
+def db(mocker):
+    """Replace every database call the worker makes"""
+    mocker.patch.object(work_queue, 'get_connection')
+    mocker.patch.object(work_queue, 'create_job_tables')
+    mocker.patch.object(work_queue, 'reclaim_expired_leases', return_value=0)
+    return mocker.MagicMock(
+        claim_jobs=mocker.patch.object(work_queue, 'claim_jobs', return_value=[]),
+        complete_jobs=mocker.patch.object(work_queue, 'complete_jobs'),
+        fail_job=mocker.patch.object(work_queue, 'fail_job'),
+        queue_counts=mocker.patch.object(work_queue, 'queue_counts', return_value={'done': 2})
+    )
+
+
+@pytest.fixture
+def refresh(mocker):
+    coordinator = mocker.Mock()
+    coordinator.refresh_if_needed.return_value = []
+    mocker.patch.object(work_queue, 'get_refresh_coordinator', return_value=coordinator)
+    return coordinator.refresh_if_needed
+
+
+@pytest.fixture
+def writer(mocker):
+    return mocker.Mock(last_error=None)
+
+
+def config(day='2026-12-01'):
+    return FlightConfiguration(from_airport='SEA', to_airport='MKE', date=day)
+
+
+def run_batch(worker, writer):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        return worker.run_once(executor, writer)
+
+
+def test_empty_queue_claims_nothing(db, writer):
+    assert run_batch(QueueWorker(worker_id='test'), writer) == 0
+    writer.flush.assert_not_called()
+
+
+def test_jobs_are_completed_after_the_flush(db, writer, mocker):
+    fetch = mocker.patch.object(work_queue, 'fetch_configuration')
+    db.claim_jobs.return_value = [(1, config(), 1), (2, config('2026-12-02'), 1)]
+
+    assert run_batch(QueueWorker(worker_id='test'), writer) == 2
+
+    assert fetch.call_count == 2
+    assert all(call.kwargs['use_cache'] for call in fetch.call_args_list)
+    writer.flush.assert_called_once_with()
+    db.complete_jobs.assert_called_once_with(mocker.ANY, 'test', [1, 2])
+    db.fail_job.assert_not_called()
+
+
+def test_failed_jobs_are_reported_with_their_classification(db, writer, mocker):
+    def fetch(config, *args, **kwargs):
+        if config.date == '2026-12-02':
+            raise TimeoutError('read timed out')
+
+    mocker.patch.object(work_queue, 'fetch_configuration', side_effect=fetch)
+    db.claim_jobs.return_value = [(1, config(), 1), (2, config('2026-12-02'), 1)]
+
+    run_batch(QueueWorker(worker_id='test'), writer)
+
+    db.complete_jobs.assert_called_once_with(mocker.ANY, 'test', [1])
+    (_, worker_id, job_id, error), _ = db.fail_job.call_args
+    assert (worker_id, job_id) == ('test', 2)
+    assert error.transient
+
+
+def test_failed_flush_drops_rows_and_requeues_jobs(db, writer, mocker):
+    mocker.patch.object(work_queue, 'fetch_configuration')
+    writer.last_error = ConnectionError('server closed the connection')
+    db.claim_jobs.return_value = [(1, config(), 1), (2, config('2026-12-02'), 1)]
+
+    run_batch(QueueWorker(worker_id='test'), writer)
+
+    writer.discard.assert_called_once_with()
+    db.complete_jobs.assert_called_once_with(mocker.ANY, 'test', [])
+    requeued = sorted(call.args[2] for call in db.fail_job.call_args_list)
+    assert requeued == [1, 2]
+    assert all(call.args[3].transient for call in db.fail_job.call_args_list)
+
+
+def test_retried_jobs_bypass_the_result_cache(db, writer, mocker):
+    fetch = mocker.patch.object(work_queue, 'fetch_configuration')
+    db.claim_jobs.return_value = [(1, config(), 1), (2, config('2026-12-02'), 2)]
+
+    run_batch(QueueWorker(worker_id='test'), writer)
+
+    use_cache = {call.args[0].date: call.kwargs['use_cache'] for call in fetch.call_args_list}
+    assert use_cache == {'2026-12-01': True, '2026-12-02': False}
+
+
+def test_coordinator_refreshes_once_when_queue_drains(db, refresh):
+    worker = QueueWorker(worker_id='test', coordinator=True)
+
+    assert worker._maybe_refresh()
+    assert worker._maybe_refresh()
+
+    refresh.assert_called_once_with()
+
+
+def test_jobs_done_by_any_worker_trigger_the_next_refresh(db, refresh):
+    worker = QueueWorker(worker_id='test', coordinator=True)
+    worker._maybe_refresh()
+
+    # Another worker finished a job while this one sat idle
+    db.queue_counts.return_value = {'done': 3}
+    worker._maybe_refresh()
+
+    assert refresh.call_count == 2
+
+
+def test_failed_jobs_do_not_trigger_a_refresh(db, refresh):
+    worker = QueueWorker(worker_id='test', coordinator=True)
+    worker._maybe_refresh()
+
+    db.queue_counts.return_value = {'done': 2, 'failed': 1}
+    worker._maybe_refresh()
+
+    refresh.assert_called_once_with()
+
+
+def test_no_refresh_while_jobs_remain(db, refresh):
+    db.queue_counts.return_value = {'queued': 3, 'done': 2}
+    worker = QueueWorker(worker_id='test', coordinator=True)
+
+    assert not worker._maybe_refresh()
+    refresh.assert_not_called()
+
+
+def test_only_the_coordinator_refreshes(db, refresh):
+    worker = QueueWorker(worker_id='test')
+
+    assert worker._maybe_refresh()
+    refresh.assert_not_called()
+
+
+def test_run_refreshes_and_exits_when_empty(db, refresh, mocker):
+    mocker.patch.object(work_queue.signal, 'signal')
+    mocker.patch.object(work_queue, 'FlightBatchWriter')
+    worker = QueueWorker(worker_id='test', coordinator=True, exit_when_empty=True)
+
+    worker.run()
+
+    refresh.assert_called_once_with()